@@ -12,5 +12,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# exam-taking views use the async ORM when served by an ASGI server, e.g.
+#   uvicorn config.asgi:application --workers 4
+os.environ.setdefault('EXAMS_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
@@ -0,0 +1,95 @@
+"""
+Read-replica routing.
+
+Views that set ``read_replica = True`` (list and result pages) read the LMS
+apps' tables from settings.READ_REPLICA_ALIAS. Writes always go to the
+primary. After any POST (saving answers, submitting, ...) the user is pinned
+to the primary for REPLICA_PIN_SECONDS, so they read their own writes even
+if the replica lags behind.
+"""
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+PIN_COOKIE = "pin_primary"
+
+
+class _Routing:
+    """Per-request routing state, set by the middleware for the request's context."""
+    use_replica = False
+
+
+_routing = ContextVar("replica_routing", default=None)
+
+
+class ReplicaRouter:
+    route_app_labels = {"courses", "enrollments", "exams"}
+
+    def db_for_read(self, model, **hints):
+        alias = getattr(settings, "READ_REPLICA_ALIAS", None)
+        use_replica = getattr(_routing.get(), "use_replica", False)
+        if alias and use_replica and model._meta.app_label in self.route_app_labels:
+            return alias
+        return None
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replica holds the same rows as the primary
+        return True
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = _routing.set(_Routing())
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self.pin(request, response)
+
+    async def __acall__(self, request):
+        token = _routing.set(_Routing())
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self.pin(request, response)
+
+    def pin(self, request, response):
+        if request.method not in ("GET", "HEAD", "OPTIONS"):
+            response.set_cookie(
+                PIN_COOKIE,
+                "1",
+                max_age=getattr(settings, "REPLICA_PIN_SECONDS", 10),
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, "view_class", None)
+        routing = _routing.get()
+        if (
+            routing is not None
+            and request.method in ("GET", "HEAD")
+            and getattr(view_class, "read_replica", False)
+            and PIN_COOKIE not in request.COOKIES
+        ):
+            # flagged on the object set in __call__, not by setting the
+            # context var: under ASGI this hook runs in a sync_to_async thread
+            routing.use_replica = True
+        return None
@@ -0,0 +1,247 @@
+"""
+Per-request instrumentation.
+
+RequestMetricsMiddleware records, per resolved URL name, the number of SQL
+queries, SQL time, template render time and total latency. It sends them
+back in a Server-Timing header and folds them into in-process histograms
+that metrics_view serves in the Prometheus text format, to staff and to
+scrapers sending settings.METRICS_TOKEN as a bearer token.
+
+Template time is measured by the DjangoTemplates backend subclass below,
+configured in settings.TEMPLATES.
+
+Query budgets (settings.QUERY_BUDGET / QUERY_BUDGETS) log or raise when a
+view runs more queries than allowed, so N+1 regressions show up early.
+"""
+import hmac
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.template.backends import django as django_backend
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_current = ContextVar("request_metrics", default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestTimings:
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_time += time.perf_counter() - started
+
+
+def _execute_wrapper(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    return timings.execute(execute, sql, params, many, context)
+
+
+def _install(connection):
+    if _execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_execute_wrapper)
+
+
+@receiver(connection_created)
+def install_execute_wrapper(sender, connection, **kwargs):
+    _install(connection)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    METRICS = (
+        ("request_duration_seconds", "Total request latency.", LATENCY_BUCKETS),
+        ("request_db_seconds", "Time spent in SQL per request.", LATENCY_BUCKETS),
+        ("request_template_seconds", "Template render time per request.", LATENCY_BUCKETS),
+        ("request_queries", "SQL queries per request.", QUERY_BUCKETS),
+    )
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def observe(self, view_name, total, timings):
+        values = (total, timings.sql_time, timings.template_time, timings.queries)
+        with self.lock:
+            histograms = self.views.get(view_name)
+            if histograms is None:
+                histograms = [Histogram(buckets) for _, _, buckets in self.METRICS]
+                self.views[view_name] = histograms
+            for histogram, value in zip(histograms, values):
+                histogram.observe(value)
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for index, (name, help_text, buckets) in enumerate(self.METRICS):
+                metric = f"lms_{name}"
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} histogram")
+                for view_name, histograms in sorted(self.views.items()):
+                    histogram = histograms[index]
+                    label = f'view="{view_name}"'
+                    cumulative = 0
+                    for bound, count in zip((*buckets, "+Inf"), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{metric}_bucket{{{label},le="{bound}"}} {cumulative}')
+                    lines.append(f"{metric}_sum{{{label}}} {histogram.sum:.6f}")
+                    lines.append(f"{metric}_count{{{label}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+
+
+registry = MetricsRegistry()
+
+
+def query_budget(view_name):
+    budgets = getattr(settings, "QUERY_BUDGETS", {})
+    return budgets.get(view_name, getattr(settings, "QUERY_BUDGET", None))
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        timings, token, started = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings, started)
+
+    async def __acall__(self, request):
+        timings, token, started = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings, started)
+
+    def start(self):
+        # connections opened before this module was imported missed the signal
+        for connection in connections.all(initialized_only=True):
+            _install(connection)
+
+        # a mutable object in the context var, so queries run by sync views
+        # in sync_to_async threads are counted on this request
+        timings = RequestTimings()
+        return timings, _current.set(timings), time.perf_counter()
+
+    def finish(self, request, response, timings, started):
+        total = time.perf_counter() - started
+
+        match = getattr(request, "resolver_match", None)
+        view_name = match.view_name if match else "<unresolved>"
+
+        response["Server-Timing"] = ", ".join([
+            f'db;dur={timings.sql_time * 1000:.1f};desc="{timings.queries} queries"',
+            f"tpl;dur={timings.template_time * 1000:.1f}",
+            f"total;dur={total * 1000:.1f}",
+        ])
+        registry.observe(view_name, total, timings)
+
+        budget = query_budget(view_name)
+        if budget is not None and timings.queries > budget:
+            message = f"{view_name} ran {timings.queries} queries (budget {budget})"
+            if getattr(settings, "QUERY_BUDGET_MODE", "log") == "raise":
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+        return response
+
+
+class TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            timings = _current.get()
+            if timings is not None:
+                timings.template_time += time.perf_counter() - started
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """The stock backend, with top-level template renders timed per request."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+def has_metrics_token(request):
+    token = getattr(settings, "METRICS_TOKEN", None)
+    if not token:
+        return False
+    scheme, _, value = request.headers.get("Authorization", "").partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(value.encode(), token.encode())
+
+
+def metrics_view(request):
+    # staff or the scraper's bearer token only: behind a reverse proxy every
+    # request comes from the proxy's address, so addresses prove nothing
+    if not (request.user.is_staff or has_metrics_token(request)):
+        raise PermissionDenied
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -40,6 +41,7 @@ INSTALLED_APPS = [
     'courses',
     'enrollments',
     'exams',
+    'search',
     'tinymce',
     'django_extensions',
 ]
@@ -47,11 +49,13 @@ INSTALLED_APPS = [
 STATIC_URL = "static/"
 
 MIDDLEWARE = [
+    'config.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'config.db_router.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -60,7 +64,8 @@ ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # stock DjangoTemplates with render time reported to config.metrics
+        'BACKEND': 'config.metrics.DjangoTemplates',
         "DIRS": [BASE_DIR / "templates"],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -83,9 +88,21 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    # Read replica for list and result pages (config.db_router). Routing is
+    # only enabled when REPLICA_DB_NAME is set; tests use a second SQLite file.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('REPLICA_DB_NAME', BASE_DIR / 'db.sqlite3'),
+        'TEST': {'NAME': BASE_DIR / 'test_replica.sqlite3'},
+    },
 }
 
+DATABASE_ROUTERS = ['config.db_router.ReplicaRouter']
+READ_REPLICA_ALIAS = 'replica' if os.environ.get('REPLICA_DB_NAME') else None
+# seconds a user stays on the primary after a POST (read-your-writes)
+REPLICA_PIN_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -127,4 +144,16 @@ LOGIN_URL = "/login/"
 LOGIN_REDIRECT_URL = "/exams/"
 LOGOUT_REDIRECT_URL = "/login/"
 
+# Serve the exam-taking views (start/take/submit/result) from exams.async_views.
+# config/asgi.py turns this on; WSGI deployments keep the sync views.
+EXAMS_ASYNC_VIEWS = os.environ.get("EXAMS_ASYNC_VIEWS") == "1"
+
+# Request metrics (config.metrics). The /metrics/ endpoint is open to staff
+# users and to scrapers sending "Authorization: Bearer <METRICS_TOKEN>".
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
 
+# Query budget: max SQL queries per request, by URL name with a global default
+# (None disables). "log" warns, "raise" fails the request.
+QUERY_BUDGET = None
+QUERY_BUDGETS = {}
+QUERY_BUDGET_MODE = "raise" if DEBUG else "log"
@@ -0,0 +1,52 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from courses.models import Course
+from exams.models import Exam
+
+from .metrics import QueryBudgetExceeded, registry
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        Exam.objects.create(course=Course.objects.create(name="Course", grade=1), title="Exam")
+        self.user = User.objects.create_user("staff", is_staff=True)
+        self.client.force_login(self.user)
+
+    def histogram_count(self, view_name):
+        return registry.views[view_name][0].count
+
+    def test_server_timing_and_histograms(self):
+        response = self.client.get(reverse("exams:exam_list"))
+        self.assertRegex(response["Server-Timing"], r'^db;dur=[\d.]+;desc="[1-9]\d* queries", tpl;dur=[\d.]+, total')
+        self.assertEqual(self.histogram_count("exams:exam_list"), 1)
+
+        text = self.client.get(reverse("metrics")).content.decode()
+        self.assertIn('lms_request_queries_count{view="exams:exam_list"} 1', text)
+
+    async def test_async_requests_are_measured(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse("exams:exam_list"))
+        self.assertRegex(response["Server-Timing"], r'desc="[1-9]\d* queries"')
+        self.assertEqual(self.histogram_count("exams:exam_list"), 1)
+
+    @override_settings(QUERY_BUDGETS={"exams:exam_list": 0}, QUERY_BUDGET_MODE="raise")
+    def test_query_budget(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse("exams:exam_list"))
+
+    @override_settings(METRICS_TOKEN="s3cret")
+    def test_metrics_endpoint_needs_staff_or_token(self):
+        self.client.logout()
+        url = reverse("metrics")
+        # the test client's REMOTE_ADDR is 127.0.0.1, as behind a local proxy
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(self.client.get(url, headers={"Authorization": "Bearer wrong"}).status_code, 403)
+        self.assertEqual(self.client.get(url, headers={"Authorization": "Bearer s3cret"}).status_code, 200)
+
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url).status_code, 200)
@@ -0,0 +1,177 @@
+"""
+Query-plan regression tests for the exam-day hot paths.
+
+Every query a hot view runs is captured and fed back through SQLite's
+EXPLAIN QUERY PLAN. A full scan of one of the large tables, or a temp
+B-tree built to sort rows read from one, means an index went missing or
+stopped matching the query, which is only noticed under load otherwise.
+"""
+import re
+from datetime import timedelta
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from courses.models import Course, Unit, Lesson
+from enrollments.models import Enrollment
+from exams.deadlines import sweep_expired
+from exams.models import Exam, Question, AnswerChoice, ExamAttempt
+
+# tables that grow with students/content; small lookup tables may be scanned
+LARGE_TABLES = {
+    "courses_unit",
+    "courses_lesson",
+    "enrollments_enrollment",
+    "exams_question",
+    "exams_answerchoice",
+    "exams_examattempt",
+    "exams_attemptanswer",
+}
+
+
+ALIAS_RE = re.compile(r'"(\w+)" (U\d+|T\d+)\b')
+
+
+def query_plan(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_problems(plan, sql=""):
+    """
+    Steps of ``plan`` that read a large table without a bounded lookup. Only
+    SEARCH steps are; any SCAN of a large table is a problem, including a
+    SCAN ... USING (COVERING) INDEX, which walks the whole index.
+    """
+    # Django aliases subquery tables (U0, T3...), and the plan uses the alias
+    aliases = {alias: table for table, alias in ALIAS_RE.findall(sql)}
+    problems = []
+    driving_table = None
+    for step in plan:
+        words = step.split()
+        if words[0] in ("SCAN", "SEARCH"):
+            table = aliases.get(words[1], words[1])
+            driving_table = driving_table or table
+            if words[0] == "SCAN" and table in LARGE_TABLES:
+                problems.append(step)
+        # sorting a page of courses/exams is cheap, sorting questions or attempts is not;
+        # "RIGHT PART OF ORDER BY" (sorting within index-ordered groups) is fine too
+        if step.startswith("USE TEMP B-TREE FOR ORDER BY") and driving_table in LARGE_TABLES:
+            problems.append(step)
+    return problems
+
+
+@skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN output is SQLite specific")
+class HotQueryPlanTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.course = Course.objects.create(name="Course", grade=1)
+        unit = Unit.objects.create(course=self.course, title="Unit", order=1)
+        Lesson.objects.create(unit=unit, title="Lesson", order=1, content="<p>text</p>")
+        self.unit = unit
+
+        self.exam = Exam.objects.create(course=self.course, title="Exam")
+        self.questions = []
+        for order in (1, 2):
+            question = Question.objects.create(exam=self.exam, text=f"Q{order}", mark=1, order=order)
+            AnswerChoice.objects.create(question=question, text="right", is_correct=True)
+            AnswerChoice.objects.create(question=question, text="wrong")
+            self.questions.append(question)
+
+        self.user = User.objects.create_user("student", password="pw")
+        Enrollment.objects.create(user=self.user, course=self.course)
+        self.client.force_login(self.user)
+
+    def assertIndexedPlans(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as captured:
+            response = getattr(self.client, method)(url, data)
+        self.assertLess(response.status_code, 400, url)
+
+        for query in captured.captured_queries:
+            sql = query["sql"]
+            if not sql.startswith("SELECT"):
+                continue
+            problems = plan_problems(query_plan(sql), sql)
+            self.assertFalse(problems, f"{method.upper()} {url} runs an unindexed query:\n{sql}\n{problems}")
+
+    def start_attempt(self):
+        self.client.get(reverse("exams:attempt_start", args=[self.exam.pk]))
+        return ExamAttempt.objects.get(user=self.user, exam=self.exam)
+
+    def answers(self):
+        return {f"q_{q.pk}": str(q.choices.first().pk) for q in self.questions}
+
+    def test_course_pages(self):
+        self.assertIndexedPlans("get", reverse("courses:course-list"))
+        self.assertIndexedPlans("get", reverse("courses:unit-list", args=[self.course.pk]))
+        self.assertIndexedPlans("get", reverse("courses:lesson-list", args=[self.unit.pk]))
+        self.assertIndexedPlans("get", reverse("courses:course-outline", args=[self.course.pk]))
+
+    def test_exam_pages(self):
+        self.assertIndexedPlans("get", reverse("exams:exam_list"))
+        self.assertIndexedPlans("get", reverse("exams:exam_detail", args=[self.exam.pk]))
+        self.assertIndexedPlans("get", reverse("exams:exam_leaderboard", args=[self.exam.pk]))
+
+    def test_start_new_and_existing_attempt(self):
+        self.assertIndexedPlans("get", reverse("exams:attempt_start", args=[self.exam.pk]))
+        self.assertIndexedPlans("get", reverse("exams:attempt_start", args=[self.exam.pk]))
+
+    def test_take_and_save(self):
+        attempt = self.start_attempt()
+        take_url = reverse("exams:attempt_take", args=[attempt.pk])
+
+        self.assertIndexedPlans("get", take_url)
+        self.assertIndexedPlans("post", take_url, self.answers())
+        self.assertIndexedPlans("post", reverse("exams:attempt_answer", args=[attempt.pk]), {
+            "question": self.questions[0].pk,
+            "choice": self.questions[0].choices.last().pk,
+        })
+
+    def test_submit_and_result(self):
+        attempt = self.start_attempt()
+        self.client.post(reverse("exams:attempt_take", args=[attempt.pk]), self.answers())
+
+        self.assertIndexedPlans("post", reverse("exams:attempt_submit", args=[attempt.pk]))
+        self.assertIndexedPlans("get", reverse("exams:attempt_result", args=[attempt.pk]))
+
+    def test_expired_attempt_sweep(self):
+        Exam.objects.filter(pk=self.exam.pk).update(duration=timedelta(minutes=30))
+        ExamAttempt.objects.create(
+            user=self.user, exam=self.exam, full_mark=2,
+            started_at=timezone.now() - timedelta(hours=1),
+        )
+
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(sweep_expired(), 1)
+        for query in captured.captured_queries:
+            if query["sql"].startswith("SELECT"):
+                self.assertFalse(plan_problems(query_plan(query["sql"]), query["sql"]), query["sql"])
+
+    def test_plan_check_catches_a_full_scan(self):
+        plan = query_plan('SELECT * FROM "exams_question" WHERE "text" = \'x\'')
+        self.assertTrue(plan_problems(plan))
+
+    def test_plan_check_catches_a_full_index_scan(self):
+        # walks all of question_exam_order: an index is named, but nothing bounds it
+        sql = 'SELECT "exam_id", "order" FROM "exams_question" ORDER BY "exam_id", "order"'
+        plan = query_plan(sql)
+        self.assertIn("USING COVERING INDEX", plan[0])
+        self.assertTrue(plan_problems(plan, sql))
+
+        self.assertEqual(plan_problems(["SCAN exams_examattempt USING INDEX attempt_leaderboard"]), [
+            "SCAN exams_examattempt USING INDEX attempt_leaderboard",
+        ])
+
+    def test_plan_check_resolves_subquery_aliases(self):
+        sql = (
+            'SELECT "id" FROM "exams_exam" WHERE "id" IN '
+            '(SELECT U0."exam_id" FROM "exams_question" U0 WHERE U0."text" = \'x\')'
+        )
+        self.assertTrue(plan_problems(query_plan(sql), sql))
@@ -3,12 +3,17 @@ from django.shortcuts import redirect
 from django.urls import path, include
 from django.contrib.auth import views as auth_views
 
+from .metrics import metrics_view
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("courses/", include("courses.urls")),
     path("exams/", include("exams.urls")),
+    path("search/", include("search.urls")),
+    path("enrollments/", include("enrollments.urls")),
 
     path("login/", auth_views.LoginView.as_view(), name="login"),
     path("logout/", auth_views.LogoutView.as_view(), name="logout"),
+    path("metrics/", metrics_view, name="metrics"),
     path("", lambda request: redirect("/courses/")),
 ]
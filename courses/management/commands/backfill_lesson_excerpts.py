@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from courses.models import Lesson, build_excerpt
+
+
+class Command(BaseCommand):
+    help = "Generate the plain-text excerpt of lessons that do not have one yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Regenerate every excerpt.")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        lessons = Lesson.objects.only("id", "content").order_by("id")
+        if not options["all"]:
+            lessons = lessons.filter(excerpt="")
+
+        batch = []
+        updated = 0
+        for lesson in lessons.iterator(chunk_size=batch_size):
+            lesson.excerpt = build_excerpt(lesson.content)
+            # drop the HTML body as soon as the excerpt is built
+            lesson.content = None
+            batch.append(lesson)
+
+            if len(batch) >= batch_size:
+                Lesson.objects.bulk_update(batch, ["excerpt"])
+                updated += len(batch)
+                batch = []
+
+        if batch:
+            Lesson.objects.bulk_update(batch, ["excerpt"])
+            updated += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Updated {updated} lesson excerpt(s)."))
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 20:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0002_alter_lesson_content'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=120),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-18 20:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_lesson_excerpt'),
+    ]
+
+    operations = [
+        # create the composite indexes before dropping the FK indexes they replace
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(fields=['unit', 'order'], name='lesson_unit_order'),
+        ),
+        migrations.AddIndex(
+            model_name='unit',
+            index=models.Index(fields=['course', 'order'], name='unit_course_order'),
+        ),
+        migrations.AlterField(
+            model_name='lesson',
+            name='unit',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='lessons', to='courses.unit'),
+        ),
+        migrations.AlterField(
+            model_name='unit',
+            name='course',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='units', to='courses.course'),
+        ),
+    ]
@@ -1,6 +1,21 @@
+from html import unescape
+
 from django.db import models
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
 from tinymce.models import HTMLField
 
+EXCERPT_LENGTH = 120
+
+
+def html_to_text(html):
+    """Plain text of an HTML fragment with whitespace collapsed."""
+    return " ".join(unescape(strip_tags(html or "")).split())
+
+
+def build_excerpt(html):
+    return Truncator(html_to_text(html)).chars(EXCERPT_LENGTH)
+
 
 class Course(models.Model):
     name = models.CharField(max_length=200)
@@ -11,25 +26,45 @@ class Course(models.Model):
 
 
 class Unit(models.Model):
-    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="units")
+    # indexed by unit_course_order
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="units", db_index=False)
     title = models.CharField(max_length=200)
     order = models.PositiveSmallIntegerField()
 
     class Meta:
         ordering = ["order"]
+        indexes = [
+            models.Index(fields=["course", "order"], name="unit_course_order"),
+        ]
 
     def __str__(self):
         return f"Unit {self.order}: {self.title}"
 
 
 class Lesson(models.Model):
-    unit = models.ForeignKey(Unit, on_delete=models.CASCADE, related_name="lessons")
+    # indexed by lesson_unit_order
+    unit = models.ForeignKey(Unit, on_delete=models.CASCADE, related_name="lessons", db_index=False)
     title = models.CharField(max_length=200)
     order = models.PositiveSmallIntegerField()
     content = HTMLField()
+    # plain-text preview of content, kept in sync on save
+    excerpt = models.CharField(max_length=EXCERPT_LENGTH, blank=True, editable=False)
 
     class Meta:
         ordering = ["order"]
+        indexes = [
+            models.Index(fields=["unit", "order"], name="lesson_unit_order"),
+        ]
 
     def __str__(self):
         return f"Lesson {self.order}: {self.title}"
+
+    def save(self, *args, **kwargs):
+        if "content" not in self.get_deferred_fields():
+            self.excerpt = build_excerpt(self.content)
+
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None and "content" in update_fields:
+                kwargs["update_fields"] = {*update_fields, "excerpt"}
+
+        super().save(*args, **kwargs)
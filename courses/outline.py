@@ -0,0 +1,60 @@
+from django.core.cache import cache
+from django.urls import reverse
+
+from .models import Course, Unit, Lesson
+
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def cache_key(course_id):
+    return f"courses:outline:{course_id}"
+
+
+def build_outline(course_id):
+    """
+    Course -> units -> lessons as plain dicts (titles and orders only), in
+    three queries whatever the size of the course. None if there is no such
+    course.
+    """
+    course = Course.objects.filter(pk=course_id).values("id", "name", "grade").first()
+    if course is None:
+        return None
+
+    units = {}
+    for unit_id, title, order in (
+        Unit.objects.filter(course_id=course_id).order_by("order", "id").values_list("id", "title", "order")
+    ):
+        units[unit_id] = {
+            "id": unit_id,
+            "title": title,
+            "order": order,
+            "url": reverse("courses:lesson-list", args=[unit_id]),
+            "lessons": [],
+        }
+
+    for lesson_id, unit_id, title, order in (
+        Lesson.objects
+        .filter(unit__course_id=course_id)
+        # unit by unit, so both (course, order) and (unit, order) indexes are walked in order
+        .order_by("unit__order", "unit_id", "order", "id")
+        .values_list("id", "unit_id", "title", "order")
+    ):
+        units[unit_id]["lessons"].append({"id": lesson_id, "title": title, "order": order})
+
+    course["url"] = reverse("courses:unit-list", args=[course_id])
+    course["units"] = list(units.values())
+    return course
+
+
+def get_outline(course_id):
+    key = cache_key(course_id)
+    outline = cache.get(key)
+    if outline is None:
+        outline = build_outline(course_id)
+        if outline is not None:
+            cache.set(key, outline, CACHE_TIMEOUT)
+    return outline
+
+
+def invalidate_outline(course_id):
+    cache.delete(cache_key(course_id))
@@ -0,0 +1,95 @@
+from django.db.models import Q
+from django.http import Http404
+
+
+class KeysetPage:
+    def __init__(self, object_list, has_next, has_previous, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginationMixin:
+    """
+    ListView mixin that pages with a seek on ``keyset_fields`` (?after= / ?before=)
+    instead of OFFSET, so deep pages cost the same as the first one.
+
+    The last keyset field must be unique (usually "id"). Prefix the fields with
+    "-" for a descending list; all fields must share the same direction.
+    """
+    paginate_by = 50
+    keyset_fields = ("id",)
+
+    def _keyset(self):
+        names = [f.lstrip("-") for f in self.keyset_fields]
+        descending = self.keyset_fields[0].startswith("-")
+        return names, descending
+
+    def _parse_cursor(self, raw, size):
+        try:
+            values = [int(v) for v in raw.split(",")]
+        except ValueError:
+            raise Http404("Invalid page cursor.")
+        if len(values) != size:
+            raise Http404("Invalid page cursor.")
+        return values
+
+    def _seek(self, queryset, names, values, lookup):
+        # (a, b) > (x, y)  ->  a >= x AND (a > x OR (a = x AND b > y))
+        condition = Q()
+        for i, name in enumerate(names):
+            step = Q(**{f"{name}__{lookup}": values[i]})
+            for prev_name, prev_value in zip(names[:i], values[:i]):
+                step &= Q(**{prev_name: prev_value})
+            condition |= step
+        leading = Q(**{f"{names[0]}__{lookup}e": values[0]})
+        return queryset.filter(leading & condition)
+
+    def paginate_queryset(self, queryset, page_size):
+        names, descending = self._keyset()
+        after = self.request.GET.get("after")
+        before = self.request.GET.get("before")
+        forward = not before
+
+        ordering = [f"-{n}" if descending == forward else n for n in names]
+        queryset = queryset.order_by(*ordering)
+
+        raw = after if forward else before
+        if raw:
+            values = self._parse_cursor(raw, len(names))
+            # moving forward through a descending list means smaller values
+            lookup = "lt" if descending == forward else "gt"
+            queryset = self._seek(queryset, names, values, lookup)
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+
+        if forward:
+            has_next, has_previous = has_more, bool(raw)
+        else:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+
+        def cursor(obj):
+            return ",".join(str(getattr(obj, n)) for n in names)
+
+        page = KeysetPage(
+            rows,
+            has_next=has_next and bool(rows),
+            has_previous=has_previous and bool(rows),
+            next_cursor=cursor(rows[-1]) if rows else None,
+            previous_cursor=cursor(rows[0]) if rows else None,
+        )
+        return None, page, rows, page.has_other_pages()
@@ -0,0 +1,57 @@
+import json
+
+from django.db import transaction
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views import View
+
+from enrollments.access import StaffRequiredMixin
+
+
+class ReorderView(StaffRequiredMixin, View):
+    """
+    POST {"order": [id, ...]} listing every item of a container (the units
+    of a course, the lessons of a unit...) in their new order. Items are
+    renumbered 1..n and the changed ones written with one bulk_update.
+
+    bulk_update sends no signals, so subclasses refresh whatever caches the
+    order feeds in reordered().
+    """
+    model = None
+    container_model = None
+    container_field = None
+    container_kwarg = None
+
+    def reordered(self, container, items):
+        pass
+
+    def post(self, request, **kwargs):
+        container = get_object_or_404(self.container_model, pk=kwargs[self.container_kwarg])
+        try:
+            ids = [int(pk) for pk in json.loads(request.body)["order"]]
+        except (ValueError, KeyError, TypeError):
+            return JsonResponse({"error": 'Expected {"order": [id, ...]}.'}, status=400)
+
+        with transaction.atomic():
+            items = {
+                item.pk: item
+                for item in self.model.objects
+                .select_for_update()
+                .filter(**{self.container_field: container.pk})
+                .only("id", "order")
+            }
+            if len(ids) != len(items) or set(ids) != set(items):
+                return JsonResponse({"error": "The order must list every item exactly once."}, status=400)
+
+            changed = []
+            for position, pk in enumerate(ids, start=1):
+                item = items[pk]
+                if item.order != position:
+                    item.order = position
+                    changed.append(item)
+
+            if changed:
+                self.model.objects.bulk_update(changed, ["order"])
+                self.reordered(container, changed)
+
+        return JsonResponse({"order": ids, "updated": len(changed)})
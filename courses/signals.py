@@ -0,0 +1,22 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Course, Unit, Lesson
+from .outline import invalidate_outline
+
+
+@receiver([post_save, post_delete], sender=Course)
+def course_changed(sender, instance, **kwargs):
+    invalidate_outline(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Unit)
+def unit_changed(sender, instance, **kwargs):
+    invalidate_outline(instance.course_id)
+
+
+@receiver([post_save, post_delete], sender=Lesson)
+def lesson_changed(sender, instance, **kwargs):
+    course_id = Unit.objects.filter(pk=instance.unit_id).values_list("course_id", flat=True).first()
+    if course_id is not None:
+        invalidate_outline(course_id)
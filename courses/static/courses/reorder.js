@@ -0,0 +1,64 @@
+// Drag-and-drop reordering. An element with data-reorder-url holds items
+// marked with data-reorder-id; after a drop the full list of ids is POSTed
+// as {"order": [...]} and the data-reorder-label numbers are refreshed.
+(function () {
+  const csrf = document.querySelector("[name=csrfmiddlewaretoken]");
+
+  document.querySelectorAll("[data-reorder-url]").forEach(function (container) {
+    const status = container.querySelector("[data-reorder-status]");
+    const items = () => Array.from(container.querySelectorAll("[data-reorder-id]"));
+    const ids = () => items().map((item) => Number(item.dataset.reorderId));
+    let saved = ids();
+    let dragged = null;
+
+    items().forEach(function (item) {
+      item.draggable = true;
+      item.classList.add("reorder-item");
+    });
+
+    container.addEventListener("dragstart", function (e) {
+      dragged = e.target.closest("[data-reorder-id]");
+      if (!dragged) return;
+      e.dataTransfer.effectAllowed = "move";
+      dragged.classList.add("dragging");
+    });
+
+    container.addEventListener("dragover", function (e) {
+      if (!dragged) return;
+      e.preventDefault();
+      const target = e.target.closest("[data-reorder-id]");
+      if (!target || target === dragged || target.parentNode !== dragged.parentNode) return;
+      const box = target.getBoundingClientRect();
+      const after = e.clientY > box.top + box.height / 2;
+      target.parentNode.insertBefore(dragged, after ? target.nextSibling : target);
+    });
+
+    container.addEventListener("dragend", function () {
+      if (!dragged) return;
+      dragged.classList.remove("dragging");
+      dragged = null;
+
+      const order = ids();
+      if (order.join() === saved.join()) return;
+      if (status) status.textContent = "Saving…";
+
+      fetch(container.dataset.reorderUrl, {
+        method: "POST",
+        headers: {"Content-Type": "application/json", "X-CSRFToken": csrf ? csrf.value : ""},
+        body: JSON.stringify({order: order}),
+      })
+        .then((response) => (response.ok ? response.json() : Promise.reject(response)))
+        .then(function () {
+          saved = order;
+          items().forEach(function (item, index) {
+            const label = item.querySelector("[data-reorder-label]");
+            if (label) label.textContent = index + 1;
+          });
+          if (status) status.textContent = "Order saved.";
+        })
+        .catch(function () {
+          if (status) status.textContent = "Could not save the new order, reload the page and try again.";
+        });
+    });
+  });
+})();
@@ -0,0 +1,15 @@
+from django import template
+
+from ..outline import get_outline
+
+register = template.Library()
+
+
+@register.inclusion_tag("courses/_outline.html", takes_context=True)
+def course_outline(context, course_id):
+    """Sidebar tree of the given course, served from the outline cache."""
+    current_unit = context.get("unit")
+    return {
+        "outline": get_outline(course_id),
+        "current_unit_id": current_unit.pk if current_unit else None,
+    }
@@ -1,3 +1,184 @@
+import json
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+
+from enrollments.models import Enrollment
+from exams.models import Exam
+from exams.views import ExamListView
+
+from . import views
+from .models import Course, Unit, Lesson
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.course = Course.objects.create(name="Course", grade=1)
+        # two units share an order, so the id breaks the tie
+        self.units = [
+            Unit.objects.create(course=self.course, title=f"Unit {i}", order=order)
+            for i, order in enumerate([1, 2, 2, 3, 4])
+        ]
+        for unit, lessons in zip(self.units, [2, 0, 1, 0, 3]):
+            for order in range(lessons):
+                Lesson.objects.create(unit=unit, title="L", order=order, content="")
+        self.client.force_login(User.objects.create_user("staff", is_staff=True))
+
+    def page(self, url, **params):
+        response = self.client.get(url, params)
+        return response.context["page_obj"], response
+
+    def test_walks_forward_and_back_on_order_and_id(self):
+        url = reverse("courses:unit-list", args=[self.course.pk])
+        with mock.patch.object(views.UnitListView, "paginate_by", 2):
+            first, response = self.page(url)
+            self.assertEqual([u.pk for u in first], [u.pk for u in self.units[:2]])
+            self.assertEqual([u.lessons_count for u in first], [2, 0])
+            self.assertEqual((first.has_previous, first.has_next), (False, True))
+
+            second, _ = self.page(url, after=first.next_cursor)
+            self.assertEqual([u.pk for u in second], [u.pk for u in self.units[2:4]])
+            third, _ = self.page(url, after=second.next_cursor)
+            self.assertEqual([u.pk for u in third], [self.units[4].pk])
+            self.assertEqual((third.has_previous, third.has_next), (True, False))
+
+            back, _ = self.page(url, before=third.previous_cursor)
+            self.assertEqual([u.pk for u in back], [u.pk for u in self.units[2:4]])
+            self.assertEqual((back.has_previous, back.has_next), (True, True))
+
+    def test_descending_exam_list(self):
+        exams = [Exam.objects.create(course=self.course, title=f"Exam {i}") for i in range(3)]
+        with mock.patch.object(ExamListView, "paginate_by", 2):
+            first, _ = self.page(reverse("exams:exam_list"))
+            second, _ = self.page(reverse("exams:exam_list"), after=first.next_cursor)
+        self.assertEqual([e.pk for e in first] + [e.pk for e in second], [e.pk for e in reversed(exams)])
+
+    def test_course_list_counts_units(self):
+        response = self.client.get(reverse("courses:course-list"))
+        self.assertEqual([c.units_count for c in response.context["courses"]], [5])
+
+    def test_invalid_cursor(self):
+        url = reverse("courses:unit-list", args=[self.course.pk])
+        self.assertEqual(self.client.get(url, {"after": "x"}).status_code, 404)
+        self.assertEqual(self.client.get(url, {"after": "1"}).status_code, 404)
+
+
+class LessonExcerptTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.unit = Unit.objects.create(course=Course.objects.create(name="Course", grade=1), title="U", order=1)
+
+    def test_excerpt_is_plain_text_kept_in_sync(self):
+        lesson = Lesson.objects.create(
+            unit=self.unit, title="L", order=1, content="<p>Fish &amp; <b>chips</b></p>\n<p>" + "word " * 50 + "</p>",
+        )
+        self.assertTrue(lesson.excerpt.startswith("Fish & chips word word"))
+        self.assertEqual(len(lesson.excerpt), 120)
+        self.assertTrue(lesson.excerpt.endswith("…"))
+
+        lesson.content = "<p>Short</p>"
+        lesson.save(update_fields=["content"])
+        self.assertEqual(Lesson.objects.get(pk=lesson.pk).excerpt, "Short")
+
+        # saving a copy loaded without its content leaves the excerpt alone
+        partial = Lesson.objects.defer("content").get(pk=lesson.pk)
+        partial.title = "Renamed"
+        partial.save()
+        self.assertEqual(Lesson.objects.get(pk=lesson.pk).excerpt, "Short")
+
+    def test_list_shows_excerpts_without_loading_content(self):
+        Lesson.objects.create(unit=self.unit, title="L", order=1, content="<p>The <i>excerpt</i></p>")
+        self.client.force_login(User.objects.create_user("staff", is_staff=True))
+
+        response = self.client.get(reverse("courses:lesson-list", args=[self.unit.pk]))
+        self.assertContains(response, "The excerpt")
+        self.assertEqual([lesson.get_deferred_fields() for lesson in response.context["lessons"]], [{"content"}])
+
+
+class CourseOutlineTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.course = Course.objects.create(name="Biology", grade=1)
+        self.units = [Unit.objects.create(course=self.course, title=f"Unit {o}", order=o) for o in (2, 1)]
+        self.lesson = Lesson.objects.create(unit=self.units[0], title="Cells", order=1, content="<p>long body</p>")
+        self.user = User.objects.create_user("student")
+        Enrollment.objects.create(user=self.user, course=self.course)
+        self.client.force_login(self.user)
+        self.url = reverse("courses:course-outline-json", args=[self.course.pk])
+
+    def test_json_tree_is_cached(self):
+        outline = self.client.get(self.url).json()
+        self.assertEqual([unit["title"] for unit in outline["units"]], ["Unit 1", "Unit 2"])
+        self.assertEqual(outline["units"][1]["lessons"], [{"id": self.lesson.pk, "title": "Cells", "order": 1}])
+
+        # session and user only
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+        self.assertContains(self.client.get(reverse("courses:course-outline", args=[self.course.pk])), "Cells")
+
+    def test_writes_drop_the_cached_tree(self):
+        self.client.get(self.url)
+        self.lesson.title = "Mitochondria"
+        self.lesson.save()
+        Unit.objects.create(course=self.course, title="Unit 3", order=3)
+
+        outline = self.client.get(self.url).json()
+        self.assertEqual(outline["units"][1]["lessons"][0]["title"], "Mitochondria")
+        self.assertEqual(len(outline["units"]), 3)
+
+    def test_access(self):
+        other = Course.objects.create(name="Other", grade=1)
+        self.assertEqual(self.client.get(reverse("courses:course-outline-json", args=[other.pk])).status_code, 403)
+
+        self.client.force_login(User.objects.create_user("staff", is_staff=True))
+        self.assertEqual(self.client.get(reverse("courses:course-outline-json", args=[999])).status_code, 404)
+
+
+class ReorderTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.course = Course.objects.create(name="Course", grade=1)
+        self.units = [Unit.objects.create(course=self.course, title=f"Unit {o}", order=o) for o in (1, 2, 3)]
+        self.url = reverse("courses:unit-reorder", args=[self.course.pk])
+        self.client.force_login(User.objects.create_user("staff", is_staff=True))
+
+    def post(self, payload):
+        return self.client.post(self.url, json.dumps(payload), content_type="application/json")
+
+    def test_renumbers_and_refreshes_the_outline(self):
+        first, second, third = (unit.pk for unit in self.units)
+        outline_url = reverse("courses:course-outline-json", args=[self.course.pk])
+        self.client.get(outline_url)
+
+        response = self.post({"order": [third, first, second]})
+        self.assertEqual(response.json(), {"order": [third, first, second], "updated": 3})
+        self.assertEqual(list(Unit.objects.filter(course=self.course).values_list("pk", flat=True)), [third, first, second])
+        self.assertEqual([unit["id"] for unit in self.client.get(outline_url).json()["units"]], [third, first, second])
+
+        # only rows whose position changed are written
+        self.assertEqual(self.post({"order": [third, second, first]}).json()["updated"], 2)
+
+    def test_lessons(self):
+        lessons = [Lesson.objects.create(unit=self.units[0], title="L", order=o, content="") for o in (1, 2)]
+        response = self.client.post(
+            reverse("courses:lesson-reorder", args=[self.units[0].pk]),
+            json.dumps({"order": [lessons[1].pk, lessons[0].pk]}), content_type="application/json",
+        )
+        self.assertEqual(response.json()["updated"], 2)
+        self.assertEqual(list(self.units[0].lessons.values_list("pk", flat=True)), [lessons[1].pk, lessons[0].pk])
+
+    def test_rejects_partial_or_malformed_orders(self):
+        other = Unit.objects.create(course=Course.objects.create(name="Other", grade=1), title="U", order=1)
+        ids = [unit.pk for unit in self.units]
+        for payload in ({"order": ids[:2]}, {"order": ids + ids[:1]}, {"order": ids[:2] + [other.pk]}, {"order": "x"}, []):
+            with self.subTest(payload=payload):
+                self.assertEqual(self.post(payload).status_code, 400)
+        self.assertEqual(list(Unit.objects.filter(course=self.course).values_list("order", flat=True)), [1, 2, 3])
 
-# Create your tests here.
+    def test_requires_staff(self):
+        self.client.force_login(User.objects.create_user("student"))
+        self.assertEqual(self.post({"order": []}).status_code, 403)
@@ -7,14 +7,18 @@ urlpatterns = [
     # courses
     path("", views.CourseListView.as_view(), name="course-list"),
     path("create/", views.CourseCreateView.as_view(), name="course-create"),
+    path("<int:course_id>/outline/", views.CourseOutlineView.as_view(), name="course-outline"),
+    path("<int:course_id>/outline.json", views.CourseOutlineJSONView.as_view(), name="course-outline-json"),
 
     # units (inside course)
     path("<int:course_id>/units/", views.UnitListView.as_view(), name="unit-list"),
     path("<int:course_id>/units/create/", views.UnitCreateView.as_view(), name="unit-create"),
+    path("<int:course_id>/units/reorder/", views.UnitReorderView.as_view(), name="unit-reorder"),
 
     # lessons (inside unit)
     path("units/<int:unit_id>/lessons/", views.LessonListView.as_view(), name="lesson-list"),
     path("units/<int:unit_id>/lessons/create/", views.LessonCreateView.as_view(), name="lesson-create"),
+    path("units/<int:unit_id>/lessons/reorder/", views.LessonReorderView.as_view(), name="lesson-reorder"),
 
     path("tinymce/", include("tinymce.urls")),
 ]
@@ -1,18 +1,31 @@
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
-from django.views.generic import ListView, CreateView
+from django.views import View
+from django.views.generic import ListView, CreateView, TemplateView
+
+from enrollments.access import EnrollmentRequiredMixin, StaffRequiredMixin
 
 from .models import Course, Unit, Lesson
 from .forms import CourseForm, UnitForm, LessonForm
+from .outline import get_outline, invalidate_outline
+from .pagination import KeysetPaginationMixin
+from .reorder import ReorderView
 
 
-class CourseListView(ListView):
+class CourseListView(EnrollmentRequiredMixin, KeysetPaginationMixin, ListView):
     model = Course
+    read_replica = True
     template_name = "courses/course_list.html"
     context_object_name = "courses"
 
+    def get_queryset(self):
+        return self.limit_to_enrolled(Course.objects.annotate(units_count=Count("units")), "pk")
+
 
-class CourseCreateView(CreateView):
+class CourseCreateView(StaffRequiredMixin, CreateView):
     model = Course
     form_class = CourseForm
     template_name = "courses/course_form.html"
@@ -21,14 +34,30 @@ class CourseCreateView(CreateView):
         return reverse("courses:course-list")
 
 
-class UnitListView(ListView):
+class UnitListView(EnrollmentRequiredMixin, KeysetPaginationMixin, ListView):
     model = Unit
     template_name = "courses/unit_list.html"
     context_object_name = "units"
+    keyset_fields = ("order", "id")
 
     def get_queryset(self):
         self.course = get_object_or_404(Course, id=self.kwargs["course_id"])
-        return Unit.objects.filter(course=self.course).order_by("order")
+        self.check_enrollment(self.course.pk)
+        # a correlated count instead of JOIN + GROUP BY keeps the
+        # (course, order) index order, so the page needs no sort
+        lessons_count = (
+            Lesson.objects
+            .filter(unit=OuterRef("pk"))
+            .order_by()
+            .values("unit")
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        return (
+            Unit.objects
+            .filter(course=self.course)
+            .annotate(lessons_count=Coalesce(Subquery(lessons_count), 0))
+        )
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
@@ -36,7 +65,7 @@ class UnitListView(ListView):
         return ctx
 
 
-class UnitCreateView(CreateView):
+class UnitCreateView(StaffRequiredMixin, CreateView):
     model = Unit
     form_class = UnitForm
     template_name = "courses/unit_form.html"
@@ -59,14 +88,27 @@ class UnitCreateView(CreateView):
         return ctx
 
 
-class LessonListView(ListView):
+class UnitReorderView(ReorderView):
+    model = Unit
+    container_model = Course
+    container_field = "course_id"
+    container_kwarg = "course_id"
+
+    def reordered(self, container, items):
+        invalidate_outline(container.pk)
+
+
+class LessonListView(EnrollmentRequiredMixin, KeysetPaginationMixin, ListView):
     model = Lesson
     template_name = "courses/lesson_list.html"
     context_object_name = "lessons"
+    keyset_fields = ("order", "id")
 
     def get_queryset(self):
-        self.unit = get_object_or_404(Unit, id=self.kwargs["unit_id"])
-        return Lesson.objects.filter(unit=self.unit).order_by("order")
+        self.unit = get_object_or_404(Unit.objects.select_related("course"), id=self.kwargs["unit_id"])
+        self.check_enrollment(self.unit.course_id)
+        # the list only shows the excerpt, never load the HTML body
+        return Lesson.objects.filter(unit=self.unit).defer("content")
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
@@ -75,7 +117,7 @@ class LessonListView(ListView):
         return ctx
 
 
-class LessonCreateView(CreateView):
+class LessonCreateView(StaffRequiredMixin, CreateView):
     model = Lesson
     form_class = LessonForm
     template_name = "courses/lesson_form.html"
@@ -97,3 +139,37 @@ class LessonCreateView(CreateView):
         ctx["course"] = self.unit.course
         ctx["cancel_url"] = reverse("courses:lesson-list", args=[self.unit.id])
         return ctx
+
+
+def get_outline_or_404(course_id):
+    outline = get_outline(course_id)
+    if outline is None:
+        raise Http404("No Course matches the given query.")
+    return outline
+
+
+class LessonReorderView(ReorderView):
+    model = Lesson
+    container_model = Unit
+    container_field = "unit_id"
+    container_kwarg = "unit_id"
+
+    def reordered(self, container, items):
+        invalidate_outline(container.course_id)
+
+
+class CourseOutlineView(EnrollmentRequiredMixin, TemplateView):
+    template_name = "courses/course_outline.html"
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        self.check_enrollment(self.kwargs["course_id"])
+        # the cached tree doubles as "course" for the breadcrumbs and sidebar
+        ctx["course"] = ctx["outline"] = get_outline_or_404(self.kwargs["course_id"])
+        return ctx
+
+
+class CourseOutlineJSONView(EnrollmentRequiredMixin, View):
+    def get(self, request, course_id):
+        self.check_enrollment(course_id)
+        return JsonResponse(get_outline_or_404(course_id))
@@ -0,0 +1,109 @@
+"""
+Enrollment-based access to course content.
+
+Each user's enrolled course ids are loaded once (a single index-only query
+on the (user, course) unique index), cached per user and memoized on the
+request's user object, so checking access costs nothing per view after the
+first hit. Enrollment saves/deletes drop the cached set (see signals.py);
+bulk writes must call invalidate_enrollments() themselves.
+
+Staff are not restricted.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.db import router, transaction
+
+from .models import Enrollment
+
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def cache_key(user_id):
+    return f"enrollments:courses:{user_id}"
+
+
+def _load_course_ids(user_id):
+    # always from the primary: a stale replica read would be cached for a day
+    return frozenset(
+        Enrollment.objects
+        .using(router.db_for_write(Enrollment))
+        .filter(user_id=user_id)
+        .values_list("course_id", flat=True)
+    )
+
+
+def enrolled_course_ids(user):
+    """Course ids ``user`` may access, or None when unrestricted (staff)."""
+    if user.is_staff:
+        return None
+
+    course_ids = getattr(user, "_enrolled_course_ids", None)
+    if course_ids is None:
+        key = cache_key(user.pk)
+        course_ids = cache.get(key)
+        if course_ids is None:
+            course_ids = _load_course_ids(user.pk)
+            cache.set(key, course_ids, CACHE_TIMEOUT)
+        user._enrolled_course_ids = course_ids
+    return course_ids
+
+
+async def aenrolled_course_ids(user):
+    if user.is_staff:
+        return None
+
+    course_ids = getattr(user, "_enrolled_course_ids", None)
+    if course_ids is None:
+        key = cache_key(user.pk)
+        course_ids = await cache.aget(key)
+        if course_ids is None:
+            course_ids = await sync_to_async(_load_course_ids)(user.pk)
+            await cache.aset(key, course_ids, CACHE_TIMEOUT)
+        user._enrolled_course_ids = course_ids
+    return course_ids
+
+
+def has_course_access(user, course_id):
+    course_ids = enrolled_course_ids(user)
+    return course_ids is None or course_id in course_ids
+
+
+def check_course_access(user, course_id):
+    if not has_course_access(user, course_id):
+        raise PermissionDenied("You are not enrolled in this course.")
+
+
+async def acheck_course_access(user, course_id):
+    course_ids = await aenrolled_course_ids(user)
+    if course_ids is not None and course_id not in course_ids:
+        raise PermissionDenied("You are not enrolled in this course.")
+
+
+def invalidate_enrollments(user_ids):
+    keys = [cache_key(user_id) for user_id in user_ids]
+    cache.delete_many(keys)
+    # and again once committed, in case a request re-cached the old set meanwhile
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+class EnrollmentRequiredMixin(LoginRequiredMixin):
+    """Course content views: students only see the courses they are enrolled in."""
+
+    def enrolled_course_ids(self):
+        return enrolled_course_ids(self.request.user)
+
+    def limit_to_enrolled(self, queryset, field="course_id"):
+        course_ids = self.enrolled_course_ids()
+        if course_ids is None:
+            return queryset
+        return queryset.filter(**{f"{field}__in": course_ids})
+
+    def check_enrollment(self, course_id):
+        check_course_access(self.request.user, course_id)
+
+
+class StaffRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
+    def test_func(self):
+        return self.request.user.is_staff
@@ -0,0 +1,167 @@
+"""
+Bulk enrollment from a CSV of (user, course) rows.
+
+The file is read lazily and handled in batches: users are resolved with one
+in_bulk() (usernames) or email lookup per batch, unknown courses are dropped
+with one id lookup, pairs that already exist are skipped with one query and
+the rest go in with bulk_create(ignore_conflicts=True), so re-running the
+same file is harmless and memory stays bounded by the batch size. A file
+that is not UTF-8 or not valid CSV stops the import with BulkEnrollmentError;
+batches before the bad line stay enrolled.
+
+Accepted columns: "username" or "email" (or "user", matched against both),
+and "course" or "course_id".
+"""
+import csv
+import io
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from courses.models import Course
+
+from .access import invalidate_enrollments
+from .models import Enrollment
+
+BATCH_SIZE = 2000
+MAX_ERRORS = 20
+USER_COLUMNS = ("username", "email", "user")
+COURSE_COLUMNS = ("course", "course_id")
+
+
+class BulkEnrollmentError(ValueError):
+    pass
+
+
+class EnrollmentReport:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.skipped = 0
+        self.unknown_users = 0
+        self.unknown_courses = 0
+        self.invalid = 0
+        self.errors = []
+
+    def error(self, line, message):
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(f"Line {line}: {message}")
+
+    def __str__(self):
+        return (
+            f"{self.rows} row(s): {self.created} enrolled, {self.skipped} already enrolled, "
+            f"{self.unknown_users} unknown user(s), {self.unknown_courses} unknown course(s), "
+            f"{self.invalid} invalid"
+        )
+
+
+def _column(fieldnames, candidates):
+    for name in candidates:
+        if name in fieldnames:
+            return name
+    return None
+
+
+def _batches(reader, size):
+    batch = []
+    for row in reader:
+        batch.append((reader.line_num, row))
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def enroll_from_csv(fh, batch_size=BATCH_SIZE):
+    if not isinstance(fh, io.TextIOBase):
+        fh = io.TextIOWrapper(fh, encoding="utf-8-sig", newline="")
+    reader = csv.DictReader(fh)
+    try:
+        fieldnames = [name.strip().lower() for name in reader.fieldnames or ()]
+        reader.fieldnames = fieldnames
+
+        user_column = _column(fieldnames, USER_COLUMNS)
+        course_column = _column(fieldnames, COURSE_COLUMNS)
+        if user_column is None or course_column is None:
+            raise BulkEnrollmentError(
+                "The CSV needs a username/email/user column and a course/course_id column."
+            )
+
+        report = EnrollmentReport()
+        for batch in _batches(reader, batch_size):
+            _enroll_batch(batch, user_column, course_column, report)
+    except UnicodeDecodeError:
+        raise BulkEnrollmentError("The file is not UTF-8 encoded.")
+    except csv.Error as exc:
+        raise BulkEnrollmentError(f"Line {reader.line_num}: malformed CSV ({exc}).")
+    return report
+
+
+def _resolve_users(identifiers, column):
+    User = get_user_model()
+    users = {}
+    if column in ("username", "user"):
+        found = User.objects.only("pk", "username").in_bulk(identifiers, field_name="username")
+        users.update((username, user.pk) for username, user in found.items())
+    if column in ("email", "user"):
+        missing = [identifier for identifier in identifiers if identifier not in users and "@" in identifier]
+        for email, user_id in User.objects.filter(email__in=missing).values_list("email", "pk"):
+            users.setdefault(email, user_id)
+    return users
+
+
+def _enroll_batch(batch, user_column, course_column, report):
+    rows = []
+    for line, row in batch:
+        report.rows += 1
+        identifier = (row.get(user_column) or "").strip()
+        try:
+            course_id = int(row.get(course_column) or "")
+        except ValueError:
+            course_id = None
+        if not identifier or course_id is None:
+            report.invalid += 1
+            report.error(line, "a user and a numeric course id are required.")
+            continue
+        rows.append((line, identifier, course_id))
+
+    users = _resolve_users({identifier for _, identifier, _ in rows}, user_column)
+    course_ids = set(
+        Course.objects.filter(pk__in={course_id for _, _, course_id in rows}).values_list("pk", flat=True)
+    )
+
+    pairs = set()
+    for line, identifier, course_id in rows:
+        user_id = users.get(identifier)
+        if user_id is None:
+            report.unknown_users += 1
+            report.error(line, f"unknown user {identifier!r}.")
+        elif course_id not in course_ids:
+            report.unknown_courses += 1
+            report.error(line, f"unknown course {course_id}.")
+        elif (user_id, course_id) in pairs:
+            report.skipped += 1
+        else:
+            pairs.add((user_id, course_id))
+
+    if not pairs:
+        return
+
+    user_ids = {user_id for user_id, _ in pairs}
+    with transaction.atomic():
+        existing = set(
+            Enrollment.objects
+            .filter(user_id__in=user_ids, course_id__in={course_id for _, course_id in pairs})
+            .values_list("user_id", "course_id")
+        )
+        new = pairs - existing
+        # a concurrent import of the same rows loses to the unique constraint
+        Enrollment.objects.bulk_create(
+            [Enrollment(user_id=user_id, course_id=course_id) for user_id, course_id in new],
+            ignore_conflicts=True,
+        )
+        invalidate_enrollments(user_ids)
+
+    report.created += len(new)
+    report.skipped += len(pairs) - len(new)
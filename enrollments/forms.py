@@ -0,0 +1,9 @@
+from django import forms
+
+
+class BulkEnrollmentForm(forms.Form):
+    file = forms.FileField(help_text="CSV with a username or email column and a course id column.")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["file"].widget.attrs["class"] = "form-control"
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from enrollments.bulk import BATCH_SIZE, BulkEnrollmentError, enroll_from_csv
+
+
+class Command(BaseCommand):
+    help = "Enroll users in courses from a CSV with username/email and course id columns."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, path, batch_size, **options):
+        try:
+            with open(path, "rb") as fh:
+                report = enroll_from_csv(fh, batch_size=batch_size)
+        except BulkEnrollmentError as exc:
+            raise CommandError(str(exc))
+
+        for error in report.errors:
+            self.stderr.write(error)
+        self.stdout.write(self.style.SUCCESS(str(report)))
@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-18 20:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def remove_duplicate_enrollments(apps, schema_editor):
+    Enrollment = apps.get_model("enrollments", "Enrollment")
+    keep = (
+        Enrollment.objects
+        .values("user", "course")
+        .annotate(first_id=models.Min("id"))
+        .values("first_id")
+    )
+    Enrollment.objects.exclude(id__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_lesson_excerpt'),
+        ('enrollments', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_enrollments, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='enrollment',
+            constraint=models.UniqueConstraint(fields=('user', 'course'), name='unique_enrollment_per_user_course'),
+        ),
+    ]
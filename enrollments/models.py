@@ -14,5 +14,14 @@ class Enrollment(models.Model):
         related_name="enrollments"
     )
 
+    class Meta:
+        constraints = [
+            # also the (user, course) index behind the access checks
+            models.UniqueConstraint(
+                fields=["user", "course"],
+                name="unique_enrollment_per_user_course",
+            ),
+        ]
+
     def __str__(self):
         return f"{self.user} enrolled in {self.course}"
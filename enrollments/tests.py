@@ -1,3 +1,79 @@
+import io
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase
+from django.urls import reverse
+
+from courses.models import Course
+
+from .access import enrolled_course_ids
+from .bulk import enroll_from_csv
+from .models import Enrollment
+
+
+class BulkEnrollmentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.courses = [Course.objects.create(name=f"Course {i}", grade=1) for i in (1, 2)]
+        self.ann = User.objects.create_user("ann", email="ann@example.com")
+        self.bob = User.objects.create_user("bob", email="bob@example.com")
+        self.client.force_login(User.objects.create_user("staff", is_staff=True))
+
+    def upload(self, content):
+        return self.client.post(reverse("enrollments:bulk"), {"file": SimpleUploadedFile("e.csv", content)})
+
+    def pairs(self):
+        return set(Enrollment.objects.values_list("user__username", "course_id"))
+
+    def test_enrolls_and_reports_every_row(self):
+        first, second = (course.pk for course in self.courses)
+        content = (
+            "User,Course\n"
+            f"ann,{first}\n"
+            f"bob@example.com,{first}\n"
+            f"bob,{second}\n"
+            f"ann,{first}\n"
+            f"nobody,{first}\n"
+            "ann,999\n"
+            "ann,abc\n"
+        ).encode()
+        report = self.upload(content).context["report"]
+
+        self.assertEqual(self.pairs(), {("ann", first), ("bob", first), ("bob", second)})
+        self.assertEqual(
+            (report.rows, report.created, report.skipped, report.unknown_users, report.unknown_courses, report.invalid),
+            (7, 3, 1, 1, 1, 1),
+        )
+        self.assertIn("Line 6: unknown user 'nobody'.", report.errors)
+
+        # running the same file again only skips
+        report = self.upload(content).context["report"]
+        self.assertEqual((report.created, report.skipped), (0, 4))
+
+    def test_batches_and_invalidates_the_cached_courses(self):
+        self.assertEqual(enrolled_course_ids(self.ann), frozenset())
+        lines = [f"ann,{course.pk}" for course in self.courses] + [f"bob,{course.pk}" for course in self.courses]
+        report = enroll_from_csv(io.BytesIO(("username,course_id\n" + "\n".join(lines)).encode()), batch_size=3)
+
+        self.assertEqual(report.created, 4)
+        self.ann = User.objects.get(pk=self.ann.pk)
+        self.assertEqual(enrolled_course_ids(self.ann), {course.pk for course in self.courses})
+
+    def test_bad_files_are_form_errors(self):
+        cases = [
+            (b"name,course\nann,1\n", "needs a username/email/user column"),
+            ("username,course\nRené,1\n".encode("latin-1"), "not UTF-8"),
+            (b"username,course\nann," + b"1" * 200_000 + b"\n", "malformed CSV"),
+        ]
+        for content, error in cases:
+            with self.subTest(error):
+                response = self.upload(content)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn(error, response.context["form"].errors["file"][0])
+        self.assertEqual(self.pairs(), set())
 
-# Create your tests here.
+    def test_requires_staff(self):
+        self.client.force_login(self.ann)
+        self.assertEqual(self.upload(b"username,course\n").status_code, 403)
@@ -0,0 +1,9 @@
+from django.urls import path
+
+from . import views
+
+app_name = "enrollments"
+
+urlpatterns = [
+    path("bulk/", views.BulkEnrollmentView.as_view(), name="bulk"),
+]
@@ -1,3 +1,19 @@
-from django.shortcuts import render
+from django.views.generic import FormView
 
-# Create your views here.
+from .access import StaffRequiredMixin
+from .bulk import BulkEnrollmentError, enroll_from_csv
+from .forms import BulkEnrollmentForm
+
+
+class BulkEnrollmentView(StaffRequiredMixin, FormView):
+    form_class = BulkEnrollmentForm
+    template_name = "enrollments/bulk_enrollment.html"
+
+    def form_valid(self, form):
+        try:
+            report = enroll_from_csv(form.cleaned_data["file"].file)
+        except BulkEnrollmentError as exc:
+            form.add_error("file", str(exc))
+            return self.form_invalid(form)
+        # show the counts on the same page, with a fresh form for the next file
+        return self.render_to_response(self.get_context_data(form=self.form_class(), report=report))
@@ -1,8 +1,34 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from .models import Exam, Question, AnswerChoice, ExamAttempt, AttemptAnswer
+from .provisioning import provision_attempts
+
+
+@admin.register(Exam)
+class ExamAdmin(admin.ModelAdmin):
+    actions = ["provision_attempts"]
+
+    @admin.action(description="Pre-create attempts for enrolled students")
+    def provision_attempts(self, request, queryset):
+        created = sum(provision_attempts(exam) for exam in queryset)
+        self.message_user(request, f"Provisioned {created} attempt(s).", messages.SUCCESS)
+
 
-admin.site.register(Exam)
 admin.site.register(Question)
 admin.site.register(AnswerChoice)
-admin.site.register(ExamAttempt)
-admin.site.register(AttemptAnswer)
+
+
+@admin.register(ExamAttempt)
+class ExamAttemptAdmin(admin.ModelAdmin):
+    list_display = ["__str__", "user_mark", "full_mark", "submitted_at"]
+    list_filter = ["status"]
+    # __str__ shows the user and the exam
+    list_select_related = ["user", "exam"]
+    raw_id_fields = ["user", "exam"]
+
+
+@admin.register(AttemptAnswer)
+class AttemptAnswerAdmin(admin.ModelAdmin):
+    list_display = ["__str__", "is_correct", "earned_mark"]
+    # __str__ shows the attempt (its user and exam) and the question
+    list_select_related = ["attempt__user", "attempt__exam", "question"]
+    raw_id_fields = ["attempt", "question", "selected_choice"]
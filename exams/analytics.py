@@ -0,0 +1,187 @@
+"""
+Item analysis over submitted attempts.
+
+Answers are pulled with values_list(...).iterator() straight into NumPy
+arrays and reduced with bincount/unique into additive sufficient statistics
+(per question: correct count and the sum of total scores of the students who
+got it right; per choice: pick counts; per exam: N, sum and sum of squares of
+scores, score histogram). Those are stored in ExamStatistics.state, so a
+later run only folds in attempts submitted since the previous one.
+
+From them we derive per question:
+  difficulty       p = correct / N
+  discrimination   point-biserial r = (M1 - M0) / s * sqrt(p * (1 - p))
+where M1/M0 are the mean total scores of students who answered right/wrong
+and s is the population standard deviation of total scores.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .compiled import get_compiled_exam
+from .models import ExamAttempt, AttemptAnswer, ExamStatistics
+
+# attempts submitted in the last few seconds may still be committing
+SETTLE_SECONDS = 5
+CHUNK_SIZE = 10000
+
+ANSWER_DTYPE = np.dtype([
+    ("attempt", np.int64),
+    ("question", np.int64),
+    ("choice", np.int64),
+    ("correct", np.bool_),
+    ("earned", np.int64),
+])
+ATTEMPT_DTYPE = np.dtype([("attempt", np.int64), ("score", np.int64)])
+
+
+def empty_state():
+    return {
+        "n": 0,
+        "score_sum": 0,
+        "score_sq_sum": 0,
+        "scores": {},
+        "questions": {},
+        "choices": {},
+    }
+
+
+def load_arrays(exam, since, until):
+    attempts = ExamAttempt.objects.filter(
+        exam=exam,
+        status=ExamAttempt.Status.SUBMITTED,
+        submitted_at__lte=until,
+    )
+    if since is not None:
+        attempts = attempts.filter(submitted_at__gt=since)
+
+    attempt_rows = np.fromiter(
+        attempts.order_by("id").values_list("id", "user_mark").iterator(chunk_size=CHUNK_SIZE),
+        dtype=ATTEMPT_DTYPE,
+    )
+    answer_rows = np.fromiter(
+        AttemptAnswer.objects
+        .filter(attempt__in=attempts)
+        .annotate(choice=Coalesce("selected_choice_id", -1))
+        .values_list("attempt_id", "question_id", "choice", "is_correct", "earned_mark")
+        .iterator(chunk_size=CHUNK_SIZE),
+        dtype=ANSWER_DTYPE,
+    )
+    return attempt_rows, answer_rows
+
+
+def fold(state, attempt_rows, answer_rows):
+    """Add the statistics of a batch of attempts to ``state`` (in place)."""
+    if not len(attempt_rows):
+        return state
+
+    scores = attempt_rows["score"]
+    state["n"] += int(len(scores))
+    state["score_sum"] += int(scores.sum())
+    state["score_sq_sum"] += int((scores * scores).sum())
+
+    marks, counts = np.unique(scores, return_counts=True)
+    for mark, count in zip(marks.tolist(), counts.tolist()):
+        state["scores"][str(mark)] = state["scores"].get(str(mark), 0) + count
+
+    if not len(answer_rows):
+        return state
+
+    # total score of the attempt behind every answer row
+    row_scores = scores[np.searchsorted(attempt_rows["attempt"], answer_rows["attempt"])]
+    correct = answer_rows["correct"]
+
+    question_ids, question_index = np.unique(answer_rows["question"], return_inverse=True)
+    n_correct = np.bincount(question_index, weights=correct)
+    correct_score_sum = np.bincount(question_index, weights=np.where(correct, row_scores, 0))
+
+    for qid, right, right_sum in zip(question_ids.tolist(), n_correct.tolist(), correct_score_sum.tolist()):
+        entry = state["questions"].setdefault(str(qid), [0, 0])
+        entry[0] += int(right)
+        entry[1] += int(right_sum)
+
+    answered = answer_rows[answer_rows["choice"] >= 0]
+    pairs, pair_counts = np.unique(
+        np.stack([answered["question"], answered["choice"]], axis=1),
+        axis=0,
+        return_counts=True,
+    )
+    for (qid, cid), count in zip(pairs.tolist(), pair_counts.tolist()):
+        per_question = state["choices"].setdefault(str(qid), {})
+        per_question[str(cid)] = per_question.get(str(cid), 0) + count
+
+    return state
+
+
+def update_statistics(exam, full=False):
+    """Fold attempts submitted since the last run (or all of them) into the exam's statistics."""
+    until = timezone.now() - timedelta(seconds=SETTLE_SECONDS)
+
+    with transaction.atomic():
+        stats, _ = ExamStatistics.objects.select_for_update().get_or_create(exam=exam)
+        since = None if full else stats.last_submitted_at
+        state = empty_state() if full or not stats.state else stats.state
+
+        attempt_rows, answer_rows = load_arrays(exam, since, until)
+        fold(state, attempt_rows, answer_rows)
+
+        stats.state = state
+        stats.attempts = state["n"]
+        stats.last_submitted_at = until
+        stats.save()
+
+    return stats
+
+
+def item_analysis(exam, stats):
+    """Per-question difficulty, discrimination and choice distribution, plus the score histogram."""
+    state = stats.state or empty_state()
+    compiled = get_compiled_exam(exam)
+    n = state["n"]
+
+    question_ids = np.array(compiled.question_ids, dtype=np.int64)
+    right = np.array([state["questions"].get(str(q), [0, 0])[0] for q in compiled.question_ids], dtype=float)
+    right_sum = np.array([state["questions"].get(str(q), [0, 0])[1] for q in compiled.question_ids], dtype=float)
+
+    mean = state["score_sum"] / n if n else 0.0
+    variance = state["score_sq_sum"] / n - mean * mean if n else 0.0
+    std = float(np.sqrt(max(variance, 0.0)))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = right / n if n else np.full(len(question_ids), np.nan)
+        mean_right = right_sum / right
+        mean_wrong = (state["score_sum"] - right_sum) / (n - right)
+        discrimination = (mean_right - mean_wrong) / std * np.sqrt(p * (1 - p))
+
+    questions = []
+    for i, q in enumerate(compiled.questions):
+        picks = state["choices"].get(str(q.id), {})
+        choices = [
+            {"text": c.text, "is_correct": c.is_correct, "count": picks.get(str(c.id), 0)}
+            for c in q.choices
+        ]
+        questions.append({
+            "id": q.id,
+            "order": q.order,
+            "text": q.text,
+            "difficulty": _number(p[i]),
+            "discrimination": _number(discrimination[i]),
+            "choices": choices,
+            "unanswered": n - sum(picks.values()),
+        })
+
+    histogram = sorted((int(mark), count) for mark, count in state["scores"].items())
+    return {
+        "attempts": n,
+        "mean": round(mean, 3),
+        "std": round(std, 3),
+        "histogram": histogram,
+        "questions": questions,
+    }
+
+
+def _number(value):
+    return None if not np.isfinite(value) else round(float(value), 3)
@@ -0,0 +1,211 @@
+"""
+Async variants of the exam-taking views, wired in exams/urls.py when
+settings.EXAMS_ASYNC_VIEWS is on (the default under config/asgi.py).
+
+Reads use Django's async ORM so a request waiting on the database does not
+hold a worker thread; the transactional writes run behind sync_to_async.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.db import transaction
+from django.db.models import F
+from django.http import Http404
+from django.shortcuts import redirect, render
+from django.utils.cache import get_conditional_response
+from django.views import View
+
+from enrollments.access import acheck_course_access
+
+from .models import Exam, ExamAttempt
+from .compiled import aget_compiled_exam, aget_compiled_page
+from .deadlines import GRACE, astart_clock, seconds_left, time_is_up
+from .grading import grade_answers, store_result, submit_attempt
+from .ranking import astanding
+from .views import page_is_stale, page_number, result_etag, result_response, take_context, take_url
+
+
+async def aget_object_or_404(queryset, **kwargs):
+    try:
+        return await queryset.aget(**kwargs)
+    except queryset.model.DoesNotExist:
+        raise Http404(f"No {queryset.model._meta.object_name} matches the given query.")
+
+
+@sync_to_async
+@transaction.atomic
+def grade_answers_atomic(attempt, key, data):
+    return grade_answers(attempt, key, data)
+
+
+@sync_to_async
+@transaction.atomic
+def submit_attempt_atomic(attempt, key):
+    return submit_attempt(attempt, key)
+
+
+class AsyncLoginRequiredMixin:
+    async def dispatch(self, request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+
+        # resolved once here so nothing touches the lazy sync user later
+        request.user = user
+        return await super().dispatch(request, *args, **kwargs)
+
+
+class StartExamAttemptView(AsyncLoginRequiredMixin, View):
+    async def get(self, request, exam_id):
+        # "SUBMITTED" sorts after "IN_PROGRESS", so a submitted attempt wins
+        attempt = await (
+            ExamAttempt.objects
+            .filter(user=request.user, exam_id=exam_id)
+            .annotate(course_id=F("exam__course_id"))
+            .order_by("-status")
+            .only("id", "status")
+            .afirst()
+        )
+
+        if attempt is None:
+            # not pre-provisioned, create it now
+            exam = await aget_object_or_404(Exam.objects.all(), pk=exam_id)
+            await acheck_course_access(request.user, exam.course_id)
+            attempt, created = await ExamAttempt.objects.aget_or_create(
+                user=request.user,
+                exam=exam,
+                status=ExamAttempt.Status.IN_PROGRESS,
+                defaults={
+                    "full_mark": exam.question_marks_total,
+                    "user_mark": 0,
+                },
+            )
+        else:
+            await acheck_course_access(request.user, attempt.course_id)
+
+        # BLOCK if already submitted
+        if attempt.status == ExamAttempt.Status.SUBMITTED:
+            return redirect("exams:attempt_result", attempt_id=attempt.id)
+
+        return redirect("exams:attempt_take", attempt_id=attempt.id)
+
+
+class TakeExamView(AsyncLoginRequiredMixin, View):
+    template_name = "exams/attempt_take.html"
+
+    async def get(self, request, attempt_id):
+        attempt = await aget_object_or_404(
+            ExamAttempt.objects.select_related("exam"),
+            pk=attempt_id,
+            user=request.user,
+        )
+
+        await acheck_course_access(request.user, attempt.exam.course_id)
+        if attempt.status == ExamAttempt.Status.SUBMITTED:
+            return redirect("exams:attempt_result", attempt_id=attempt.id)
+
+        await astart_clock(attempt)
+        if time_is_up(attempt):
+            key = await aget_compiled_exam(attempt.exam)
+            await submit_attempt_atomic(attempt, key)
+            return redirect("exams:attempt_result", attempt_id=attempt.id)
+
+        if attempt.exam.questions_per_page:
+            key = await aget_compiled_page(attempt.exam, page_number(request.GET.get("page")))
+        else:
+            key = await aget_compiled_exam(attempt.exam)
+        return await self.render_page(request, attempt, key)
+
+    async def render_page(self, request, attempt, key, stale=False):
+        answers = attempt.answers.all()
+        if key.partial:
+            answers = answers.filter(question_id__in=key.question_ids)
+        answers_map = {
+            question_id: choice_id
+            async for question_id, choice_id
+            in answers.values_list("question_id", "selected_choice_id")
+        }
+        return render(request, self.template_name, take_context(attempt, key, answers_map, stale),
+                      status=409 if stale else 200)
+
+    async def post(self, request, attempt_id):
+        attempt = await aget_object_or_404(
+            ExamAttempt.objects.select_related("exam"),
+            pk=attempt_id,
+            user=request.user,
+        )
+
+        await acheck_course_access(request.user, attempt.exam.course_id)
+        if attempt.status == ExamAttempt.Status.SUBMITTED:
+            return redirect("exams:attempt_result", attempt_id=attempt.id)
+
+        await astart_clock(attempt)
+        if time_is_up(attempt, grace=GRACE):
+            key = await aget_compiled_exam(attempt.exam)
+            await submit_attempt_atomic(attempt, key)
+            return redirect("exams:attempt_result", attempt_id=attempt.id)
+
+        if attempt.exam.questions_per_page:
+            key = await aget_compiled_page(attempt.exam, page_number(request.POST.get("page")))
+            if page_is_stale(key, request.POST):
+                if time_is_up(attempt):
+                    await submit_attempt_atomic(attempt, await aget_compiled_exam(attempt.exam))
+                    return redirect("exams:attempt_result", attempt_id=attempt.id)
+                return await self.render_page(request, attempt, key, stale=True)
+            await grade_answers_atomic(attempt, key, request.POST)
+            next_url = take_url(attempt, page_number(request.POST.get("goto") or key.number))
+        else:
+            key = await aget_compiled_exam(attempt.exam)
+            await grade_answers_atomic(attempt, key, request.POST)
+            next_url = take_url(attempt)
+
+        if time_is_up(attempt):
+            key = await aget_compiled_exam(attempt.exam)
+            await submit_attempt_atomic(attempt, key)
+            return redirect("exams:attempt_result", attempt_id=attempt.id)
+
+        return redirect(next_url)
+
+
+class SubmitAttemptView(AsyncLoginRequiredMixin, View):
+    async def post(self, request, attempt_id):
+        attempt = await aget_object_or_404(
+            ExamAttempt.objects.select_related("exam"),
+            pk=attempt_id,
+            user=request.user,
+        )
+
+        await acheck_course_access(request.user, attempt.exam.course_id)
+        if attempt.status != ExamAttempt.Status.SUBMITTED:
+            key = await aget_compiled_exam(attempt.exam)
+            await submit_attempt_atomic(attempt, key)
+
+        return redirect("exams:attempt_result", attempt_id=attempt.id)
+
+
+class AttemptResultView(AsyncLoginRequiredMixin, View):
+    read_replica = True
+    template_name = "exams/attempt_result.html"
+
+    async def get(self, request, attempt_id):
+        attempt = await aget_object_or_404(
+            ExamAttempt.objects.select_related("exam"),
+            pk=attempt_id,
+            user=request.user,
+        )
+
+        if attempt.status != ExamAttempt.Status.SUBMITTED:
+            return redirect("exams:attempt_take", attempt_id=attempt.id)
+
+        standing = await astanding(attempt.exam_id, attempt.user_mark)
+        etag = result_etag(request, attempt, standing)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            not_modified["ETag"] = etag
+            return not_modified
+
+        if attempt.result is None:
+            # submitted by the expiry sweep, or before snapshots existed
+            key = await aget_compiled_exam(attempt.exam)
+            await sync_to_async(store_result)(attempt, key)
+
+        return result_response(request, self.template_name, attempt, standing, etag)
@@ -0,0 +1,222 @@
+from math import ceil
+from typing import NamedTuple
+
+from django.core.cache import cache
+
+from .models import Question, AnswerChoice
+
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+class CompiledChoice(NamedTuple):
+    id: int
+    text: str
+    is_correct: bool
+
+
+class CompiledQuestion(NamedTuple):
+    id: int
+    order: int
+    text: str
+    mark: int
+    choices: tuple
+    correct_choice_id: int = None
+
+    def choice(self, choice_id):
+        for c in self.choices:
+            if c.id == choice_id:
+                return c
+        return None
+
+    @property
+    def correct_choice(self):
+        return self.choice(self.correct_choice_id)
+
+
+class CompiledExam:
+    """
+    Immutable snapshot of an exam's question and choice tree.
+
+    It is cached per (exam, content_version), so it is built once per version
+    and shared by every request until a Question or AnswerChoice changes.
+    """
+
+    # True when only some of the exam's questions are covered, see CompiledPage
+    partial = False
+
+    def __init__(self, exam_id, version, questions):
+        self.exam_id = exam_id
+        self.version = version
+        self.questions = tuple(questions)
+        self.question_ids = tuple(q.id for q in self.questions)
+        self.marks = {q.id: q.mark for q in self.questions}
+        self.choices = {q.id: {c.id: c.is_correct for c in q.choices} for q in self.questions}
+        self.correct = {q.id: q.correct_choice_id for q in self.questions}
+        self.full_mark = sum(self.marks.values())
+        self._by_id = {q.id: q for q in self.questions}
+
+    def question(self, question_id):
+        return self._by_id.get(question_id)
+
+    @classmethod
+    def from_rows(cls, exam_id, version, question_rows, choice_rows):
+        choices = {}
+        for choice_id, question_id, text, is_correct in choice_rows:
+            choices.setdefault(question_id, []).append(
+                CompiledChoice(choice_id, text, is_correct)
+            )
+
+        questions = []
+        for question_id, order, text, mark in question_rows:
+            q_choices = tuple(choices.get(question_id, ()))
+            correct = next((c.id for c in q_choices if c.is_correct), None)
+            questions.append(CompiledQuestion(question_id, order, text, mark, q_choices, correct))
+
+        return cls(exam_id, version, questions)
+
+    @classmethod
+    def build(cls, exam_id, version):
+        return cls.from_rows(
+            exam_id,
+            version,
+            question_rows(exam_id),
+            choice_rows(exam_id),
+        )
+
+    @classmethod
+    async def abuild(cls, exam_id, version):
+        return cls.from_rows(
+            exam_id,
+            version,
+            [row async for row in question_rows(exam_id)],
+            [row async for row in choice_rows(exam_id)],
+        )
+
+
+class CompiledPage(CompiledExam):
+    """
+    One page of an exam delivered ``questions_per_page`` at a time: the same
+    lookups as CompiledExam, over that page's questions and choices only.
+    """
+
+    partial = True
+
+    def __init__(self, exam_id, version, questions, number, num_pages):
+        super().__init__(exam_id, version, questions)
+        self.number = number
+        self.num_pages = num_pages
+
+    @property
+    def has_previous(self):
+        return self.number > 1
+
+    @property
+    def has_next(self):
+        return self.number < self.num_pages
+
+    @property
+    def page_range(self):
+        return range(1, self.num_pages + 1)
+
+    @classmethod
+    def build(cls, exam_id, version, number, per_page):
+        num_pages = max(1, ceil(Question.objects.filter(exam_id=exam_id).count() / per_page))
+        number = min(max(number, 1), num_pages)
+        rows = list(page_question_rows(exam_id, number, per_page))
+        return cls.from_page_rows(exam_id, version, number, num_pages, rows, page_choice_rows(rows))
+
+    @classmethod
+    async def abuild(cls, exam_id, version, number, per_page):
+        num_pages = max(1, ceil(await Question.objects.filter(exam_id=exam_id).acount() / per_page))
+        number = min(max(number, 1), num_pages)
+        rows = [row async for row in page_question_rows(exam_id, number, per_page)]
+        choices = [row async for row in page_choice_rows(rows)]
+        return cls.from_page_rows(exam_id, version, number, num_pages, rows, choices)
+
+    @classmethod
+    def from_page_rows(cls, exam_id, version, number, num_pages, question_rows, choice_rows):
+        compiled = CompiledExam.from_rows(exam_id, version, question_rows, choice_rows)
+        return cls(exam_id, version, compiled.questions, number, num_pages)
+
+
+def question_rows(exam_id):
+    return (
+        Question.objects
+        .filter(exam_id=exam_id)
+        .order_by("order", "id")
+        .values_list("id", "order", "text", "mark")
+    )
+
+
+def choice_rows(exam_id):
+    return (
+        AnswerChoice.objects
+        .filter(question__exam_id=exam_id)
+        # walks question_exam_order, so only each question's choices get sorted
+        .order_by("question__order", "question_id", "id")
+        .values_list("id", "question_id", "text", "is_correct")
+    )
+
+
+def page_question_rows(exam_id, number, per_page):
+    offset = (number - 1) * per_page
+    return question_rows(exam_id)[offset:offset + per_page]
+
+
+def page_choice_rows(question_rows):
+    return (
+        AnswerChoice.objects
+        .filter(question_id__in=[row[0] for row in question_rows])
+        .order_by("question_id", "id")
+        .values_list("id", "question_id", "text", "is_correct")
+    )
+
+
+def cache_key(exam_id, version):
+    return f"exams:compiled:{exam_id}:v{version}"
+
+
+def page_cache_key(exam_id, version, per_page, number):
+    return f"exams:compiled:{exam_id}:v{version}:p{per_page}:{number}"
+
+
+def get_compiled_exam(exam):
+    key = cache_key(exam.pk, exam.content_version)
+    compiled = cache.get(key)
+    if compiled is None:
+        compiled = CompiledExam.build(exam.pk, exam.content_version)
+        cache.set(key, compiled, CACHE_TIMEOUT)
+    return compiled
+
+
+async def aget_compiled_exam(exam):
+    key = cache_key(exam.pk, exam.content_version)
+    compiled = await cache.aget(key)
+    if compiled is None:
+        compiled = await CompiledExam.abuild(exam.pk, exam.content_version)
+        await cache.aset(key, compiled, CACHE_TIMEOUT)
+    return compiled
+
+
+def get_compiled_page(exam, number):
+    """Page ``number`` of a paged exam, clamped to the existing pages."""
+    per_page = exam.questions_per_page
+    key = page_cache_key(exam.pk, exam.content_version, per_page, number)
+    page = cache.get(key)
+    if page is None:
+        page = CompiledPage.build(exam.pk, exam.content_version, number, per_page)
+        # out-of-range numbers are served the clamped page but not cached
+        if page.number == number:
+            cache.set(key, page, CACHE_TIMEOUT)
+    return page
+
+
+async def aget_compiled_page(exam, number):
+    per_page = exam.questions_per_page
+    key = page_cache_key(exam.pk, exam.content_version, per_page, number)
+    page = await cache.aget(key)
+    if page is None:
+        page = await CompiledPage.abuild(exam.pk, exam.content_version, number, per_page)
+        if page.number == number:
+            await cache.aset(key, page, CACHE_TIMEOUT)
+    return page
@@ -0,0 +1,26 @@
+"""
+Helpers for CSV written a line at a time, e.g. into a StreamingHttpResponse.
+
+csv.writer(Echo()).writerow(row) returns the formatted line instead of
+writing it anywhere, so a generator can yield it.
+
+Files meant to be opened in a spreadsheet go through safe_row(): text cells
+starting with a formula character are prefixed with a quote, so a username
+like "=HYPERLINK(...)" is shown as text instead of evaluated.
+"""
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def escape_formula(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def safe_row(row):
+    return [escape_formula(value) for value in row]
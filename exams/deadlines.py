@@ -0,0 +1,121 @@
+"""
+Deadlines of timed exams (Exam.duration).
+
+An attempt's clock starts when it is first opened: provisioned attempts are
+created with started_at = None, so pre-creating them does not eat into the
+student's time. Once started_at + duration has passed, the take views
+finalize the attempt instead of showing it. Answers posted within GRACE of
+the deadline (the page's own timer posts the form at zero) are still saved.
+
+Attempts nobody comes back to are finalized by the sweep_expired_attempts
+command, a batch at a time with set-based UPDATEs; their result snapshot is
+built lazily by the result view.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import DateTimeField, ExpressionWrapper, F, Min, Value
+from django.utils import timezone
+
+from .grading import earned_total
+from .models import Exam, ExamAttempt
+from .ranking import record_attempts
+
+GRACE = timedelta(seconds=30)
+BATCH_SIZE = 500
+
+
+def deadline(attempt):
+    duration = attempt.exam.duration
+    if duration is None or attempt.started_at is None:
+        return None
+    return attempt.started_at + duration
+
+
+def time_is_up(attempt, now=None, grace=timedelta(0)):
+    end = deadline(attempt)
+    return end is not None and (now or timezone.now()) >= end + grace
+
+
+def seconds_left(attempt, now=None):
+    end = deadline(attempt)
+    if end is None:
+        return None
+    return max(0, int((end - (now or timezone.now())).total_seconds()))
+
+
+def start_clock(attempt):
+    """Start the clock of an attempt opened for the first time."""
+    if attempt.started_at is None:
+        attempt.started_at = timezone.now()
+        # whoever opens it first wins
+        ExamAttempt.objects.filter(pk=attempt.pk, started_at__isnull=True).update(started_at=attempt.started_at)
+
+
+async def astart_clock(attempt):
+    if attempt.started_at is None:
+        attempt.started_at = timezone.now()
+        await ExamAttempt.objects.filter(pk=attempt.pk, started_at__isnull=True).aupdate(
+            started_at=attempt.started_at,
+        )
+
+
+def expired_attempts(now=None):
+    """In-progress attempts of timed exams whose deadline (plus GRACE) has passed."""
+    now = now or timezone.now()
+    shortest = Exam.objects.filter(duration__isnull=False).aggregate(shortest=Min("duration"))["shortest"]
+    if shortest is None:
+        return ExamAttempt.objects.none()
+
+    closes_at = ExpressionWrapper(
+        F("started_at") + F("exam__duration") + Value(GRACE),
+        output_field=DateTimeField(),
+    )
+    return (
+        ExamAttempt.objects
+        # a constant bound, so attempt_status_started is range-scanned
+        # before each row is checked against its own exam's duration
+        .filter(status=ExamAttempt.Status.IN_PROGRESS, started_at__lt=now - shortest - GRACE)
+        .alias(closes_at=closes_at)
+        .filter(exam__duration__isnull=False, closes_at__lt=now)
+    )
+
+
+def finalize_attempts(attempt_ids, now=None):
+    """
+    Submit the given in-progress attempts in one UPDATE: user_mark is the sum
+    of their answers' earned marks. Returns the number of attempts submitted.
+    """
+    with transaction.atomic():
+        # re-checked so an attempt submitted meanwhile is left alone
+        ids = list(
+            ExamAttempt.objects
+            .select_for_update()
+            .filter(pk__in=attempt_ids, status=ExamAttempt.Status.IN_PROGRESS)
+            .values_list("id", flat=True)
+        )
+        submitted = ExamAttempt.objects.filter(pk__in=ids).update(
+            user_mark=earned_total(),
+            status=ExamAttempt.Status.SUBMITTED,
+            submitted_at=now or timezone.now(),
+        )
+        record_attempts(ids)
+    return submitted
+
+
+def sweep_expired(batch_size=BATCH_SIZE, now=None):
+    """Finalize every expired attempt, ``batch_size`` per transaction. Returns the count."""
+    now = now or timezone.now()
+    finalized = 0
+    while True:
+        ids = list(
+            expired_attempts(now)
+            .order_by("started_at")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            return finalized
+
+        finalized += finalize_attempts(ids)
+        if len(ids) < batch_size:
+            return finalized
@@ -1,5 +1,6 @@
 from django import forms
 from .models import Exam, Question, AnswerChoice
+from .transfer import FORMATS
 
 class BaseBootstrapModelForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
@@ -14,7 +15,7 @@ class BaseBootstrapModelForm(forms.ModelForm):
 class ExamForm(BaseBootstrapModelForm):
     class Meta:
         model = Exam
-        fields = ["course", "title", "total_marks"]
+        fields = ["course", "title", "total_marks", "duration", "questions_per_page"]
 
 class QuestionForm(BaseBootstrapModelForm):
     class Meta:
@@ -25,3 +26,23 @@ class ChoiceForm(BaseBootstrapModelForm):
     class Meta:
         model = AnswerChoice
         fields = ["text", "is_correct"]
+
+class ExamImportForm(forms.Form):
+    file = forms.FileField(help_text="JSON Lines (.jsonl) or CSV (.csv) question file.")
+    format = forms.ChoiceField(
+        choices=[("", "Detect from file name")] + [(f, f.upper()) for f in FORMATS],
+        required=False,
+    )
+    replace = forms.BooleanField(
+        required=False,
+        label="Replace the existing questions",
+        help_text="Only while nobody has attempted the exam.",
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for field in self.fields.values():
+            if isinstance(field.widget, forms.CheckboxInput):
+                field.widget.attrs["class"] = "form-check-input"
+            else:
+                field.widget.attrs["class"] = "form-control"
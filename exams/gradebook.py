@@ -0,0 +1,61 @@
+"""
+Streaming CSV gradebooks of submitted attempts, per exam or per course.
+
+Attempts are read joined with their user through values_list(...).iterator(),
+so rows go out as they are fetched and memory does not grow with the number
+of attempts. The per-question columns of an exam gradebook come from the
+same ordered query joined with AttemptAnswer: the rows of one attempt are
+consecutive, and are folded into one line with groupby. Text cells are
+escaped against spreadsheet formula injection (see csvstream.safe_row).
+"""
+import csv
+from itertools import groupby
+
+from .compiled import get_compiled_exam
+from .csvstream import Echo, safe_row
+from .models import ExamAttempt
+
+CHUNK_SIZE = 2000
+COLUMNS = ["attempt", "username", "email", "exam", "started_at", "submitted_at", "user_mark", "full_mark"]
+FIELDS = ["id", "user__username", "user__email", "exam__title", "started_at", "submitted_at", "user_mark", "full_mark"]
+
+
+def submitted_attempts(exam=None, course=None):
+    attempts = ExamAttempt.objects.filter(status=ExamAttempt.Status.SUBMITTED)
+    if exam is not None:
+        return attempts.filter(exam=exam).order_by("id")
+    return attempts.filter(exam__course=course).order_by("exam_id", "id")
+
+
+def gradebook_lines(exam=None, course=None, questions=False, chunk_size=CHUNK_SIZE):
+    """
+    Yield the CSV gradebook of ``exam`` (or of every exam of ``course``) line
+    by line. ``questions`` adds the earned mark of every question as columns,
+    for a single exam only.
+    """
+    writer = csv.writer(Echo())
+    attempts = submitted_attempts(exam, course)
+
+    if not (questions and exam is not None):
+        yield writer.writerow(COLUMNS)
+        for row in attempts.values_list(*FIELDS).iterator(chunk_size=chunk_size):
+            yield writer.writerow(safe_row(row))
+        return
+
+    compiled = get_compiled_exam(exam)
+    column = {question_id: i for i, question_id in enumerate(compiled.question_ids)}
+    yield writer.writerow(COLUMNS + [f"Q{q.order}" for q in compiled.questions])
+
+    rows = (
+        attempts
+        .values_list(*FIELDS, "answers__question_id", "answers__earned_mark")
+        .order_by("id", "answers__question_id")
+        .iterator(chunk_size=chunk_size)
+    )
+    for _, group in groupby(rows, key=lambda row: row[0]):
+        marks = [""] * len(column)
+        for *attempt, question_id, earned in group:
+            # an attempt without answers is one row with question_id None
+            if question_id in column:
+                marks[column[question_id]] = earned
+        yield writer.writerow(safe_row(attempt) + marks)
@@ -0,0 +1,165 @@
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.http import Http404
+from django.utils import timezone
+
+from .models import ExamAttempt, AttemptAnswer
+from .ranking import record_scores
+
+
+def parse_choice(key, question_id, raw):
+    """Validate a posted choice id against the compiled exam; None when unanswered."""
+    if not raw:
+        return None
+
+    try:
+        choice_id = int(raw)
+    except (TypeError, ValueError):
+        raise Http404("Invalid choice.")
+
+    if choice_id not in key.choices[question_id]:
+        raise Http404("Invalid choice.")
+
+    return choice_id
+
+
+def build_answer(attempt, key, question_id, choice_id):
+    is_correct = choice_id is not None and key.choices[question_id][choice_id]
+    return AttemptAnswer(
+        attempt=attempt,
+        question_id=question_id,
+        selected_choice_id=choice_id,
+        is_correct=is_correct,
+        earned_mark=key.marks[question_id] if is_correct else 0,
+    )
+
+
+def upsert_answers(rows):
+    if rows:
+        AttemptAnswer.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=["attempt", "question"],
+            update_fields=["selected_choice", "is_correct", "earned_mark"],
+        )
+
+
+def earned_total():
+    """The sum of the earned marks of the outer ExamAttempt's answers, for an UPDATE."""
+    earned = (
+        AttemptAnswer.objects
+        .filter(attempt=OuterRef("pk"))
+        .order_by()
+        .values("attempt")
+        .annotate(total=Sum("earned_mark"))
+        .values("total")
+    )
+    return Coalesce(Subquery(earned), 0)
+
+
+def lock_attempt(attempt):
+    # answer writes of one attempt (autosave, page posts) queue up on its
+    # row, so each re-sums user_mark only once the previous one committed
+    list(ExamAttempt.objects.select_for_update().filter(pk=attempt.pk).values_list("pk", flat=True))
+
+
+def grade_answers(attempt, key, data):
+    """
+    Grade every question of the compiled exam ``key`` from ``data`` (e.g.
+    request.POST) and upsert all AttemptAnswer rows in one statement.
+
+    All choices are validated before anything is written, and user_mark is
+    summed in Python, so the query count does not depend on the exam size.
+    When ``key`` is a single page, user_mark is re-summed from the stored
+    answers instead, in the same UPDATE. Must run in a transaction.
+    """
+    rows = []
+    for question_id in key.question_ids:
+        choice_id = parse_choice(key, question_id, data.get(f"q_{question_id}"))
+        rows.append(build_answer(attempt, key, question_id, choice_id))
+
+    lock_attempt(attempt)
+    upsert_answers(rows)
+    if key.partial:
+        ExamAttempt.objects.filter(pk=attempt.pk).update(user_mark=earned_total())
+    else:
+        attempt.user_mark = sum(row.earned_mark for row in rows)
+        attempt.save(update_fields=["user_mark"])
+
+
+def save_answer(attempt, key, question_id, choice_id):
+    """Upsert a single answer and re-sum user_mark in one UPDATE. Must run in a transaction."""
+    row = build_answer(attempt, key, question_id, choice_id)
+    lock_attempt(attempt)
+    upsert_answers([row])
+    ExamAttempt.objects.filter(pk=attempt.pk).update(user_mark=earned_total())
+    return row
+
+
+def build_result(attempt, key):
+    """
+    Compact, render-ready result of an attempt: per question the selected and
+    correct choice text and the earned mark. Stored on the attempt at submit.
+    """
+    answers = {
+        question_id: (choice_id, is_correct, earned)
+        for question_id, choice_id, is_correct, earned in attempt.answers.values_list(
+            "question_id", "selected_choice_id", "is_correct", "earned_mark"
+        )
+    }
+
+    questions = []
+    for q in key.questions:
+        choice_id, is_correct, earned = answers.get(q.id, (None, False, 0))
+        selected = q.choice(choice_id)
+        correct = q.correct_choice
+        questions.append({
+            "id": q.id,
+            "order": q.order,
+            "text": q.text,
+            "mark": q.mark,
+            "selected": selected.text if selected else None,
+            "correct": correct.text if correct else None,
+            "is_correct": is_correct,
+            "earned": earned,
+        })
+
+    return {
+        "user_mark": sum(q["earned"] for q in questions),
+        "questions": questions,
+    }
+
+
+def submit_attempt(attempt, key):
+    """
+    Mark the attempt submitted, with user_mark and the result snapshot from its
+    answers, and count its score in the exam's ranking. Returns False when it
+    was submitted meanwhile (by another request or the expiry sweep).
+    """
+    attempt.result = build_result(attempt, key)
+    attempt.user_mark = attempt.result["user_mark"]
+    attempt.status = ExamAttempt.Status.SUBMITTED
+    attempt.submitted_at = timezone.now()
+
+    with transaction.atomic():
+        submitted = (
+            ExamAttempt.objects
+            .filter(pk=attempt.pk, status=ExamAttempt.Status.IN_PROGRESS)
+            .update(
+                user_mark=attempt.user_mark,
+                status=attempt.status,
+                submitted_at=attempt.submitted_at,
+                result=attempt.result,
+            )
+        )
+        if submitted:
+            record_scores({(attempt.exam_id, attempt.user_mark): 1})
+
+    return bool(submitted)
+
+
+def store_result(attempt, key):
+    """Materialize the snapshot of an attempt submitted without one."""
+    attempt.result = build_result(attempt, key)
+    attempt.save(update_fields=["result"])
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from exams.analytics import item_analysis, update_statistics
+from exams.models import Exam
+
+
+class Command(BaseCommand):
+    help = (
+        "Fold newly submitted attempts into the item statistics of every exam "
+        "(or the given exams) and print difficulty/discrimination per question."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("exam_ids", nargs="*", type=int)
+        parser.add_argument("--full", action="store_true",
+                            help="Recompute from all submitted attempts instead of the new ones.")
+        parser.add_argument("--quiet", action="store_true", help="Only update, do not print the report.")
+
+    def handle(self, *args, exam_ids, **options):
+        exams = Exam.objects.all()
+        if exam_ids:
+            exams = exams.filter(pk__in=exam_ids)
+
+        for exam in exams.order_by("id"):
+            stats = update_statistics(exam, full=options["full"])
+            if options["quiet"]:
+                continue
+
+            analysis = item_analysis(exam, stats)
+            self.stdout.write(
+                f"Exam #{exam.pk} {exam.title}: {analysis['attempts']} attempt(s), "
+                f"mean {analysis['mean']}, std {analysis['std']}"
+            )
+            for q in analysis["questions"]:
+                self.stdout.write(
+                    f"  Q{q['order']:<4} p={_fmt(q['difficulty'])}  r={_fmt(q['discrimination'])}  "
+                    f"no answer={q['unanswered']}"
+                )
+
+        self.stdout.write(self.style.SUCCESS(f"Updated statistics for {exams.count()} exam(s)."))
+
+
+def _fmt(value):
+    return "-" if value is None else f"{value:.3f}"
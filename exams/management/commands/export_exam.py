@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from exams.models import Exam
+from exams.transfer import CHUNK_SIZE, FORMATS, export_lines, guess_format
+
+
+class Command(BaseCommand):
+    help = "Stream an exam's questions and choices to a JSON Lines or CSV file (or stdout)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("exam_id", type=int)
+        parser.add_argument("path", nargs="?", default="-")
+        parser.add_argument("--format", choices=FORMATS, help="Defaults to the file extension.")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, exam_id, path, **options):
+        exam = Exam.objects.filter(pk=exam_id).first()
+        if exam is None:
+            raise CommandError(f"Unknown exam id: {exam_id}")
+
+        fmt = options["format"] or guess_format(path)
+        lines = export_lines(exam, fmt, chunk_size=options["chunk_size"])
+        if path == "-":
+            for line in lines:
+                self.stdout.write(line, ending="")
+            return
+
+        with open(path, "w", encoding="utf-8", newline="") as fh:
+            fh.writelines(lines)
+        self.stdout.write(self.style.SUCCESS(f"{exam}: exported to {path}."))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.models import Course
+from exams.gradebook import CHUNK_SIZE, gradebook_lines
+from exams.models import Exam
+
+
+class Command(BaseCommand):
+    help = "Stream the CSV gradebook of an exam or of a whole course to a file (or stdout)."
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument("--exam", type=int, dest="exam_id")
+        target.add_argument("--course", type=int, dest="course_id")
+        parser.add_argument("path", nargs="?", default="-")
+        parser.add_argument("--questions", action="store_true",
+                            help="Add the earned mark of every question as columns (exam only).")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, exam_id, course_id, path, **options):
+        if exam_id is not None:
+            target = Exam.objects.filter(pk=exam_id).first()
+            if target is None:
+                raise CommandError(f"Unknown exam id: {exam_id}")
+            lines = gradebook_lines(exam=target, questions=options["questions"], chunk_size=options["chunk_size"])
+        else:
+            target = Course.objects.filter(pk=course_id).first()
+            if target is None:
+                raise CommandError(f"Unknown course id: {course_id}")
+            lines = gradebook_lines(course=target, chunk_size=options["chunk_size"])
+
+        if path == "-":
+            for line in lines:
+                self.stdout.write(line, ending="")
+            return
+
+        with open(path, "w", encoding="utf-8", newline="") as fh:
+            fh.writelines(lines)
+        self.stdout.write(self.style.SUCCESS(f"{target}: gradebook exported to {path}."))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from exams.models import Exam
+from exams.transfer import CHUNK_SIZE, FORMATS, ExamImportError, guess_format, import_questions
+
+
+class Command(BaseCommand):
+    help = "Stream questions and choices from a JSON Lines or CSV file into an exam."
+
+    def add_arguments(self, parser):
+        parser.add_argument("exam_id", type=int)
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=FORMATS, help="Defaults to the file extension.")
+        parser.add_argument("--replace", action="store_true", help="Delete the exam's questions first (refused once the exam has attempts).")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, exam_id, path, **options):
+        exam = Exam.objects.filter(pk=exam_id).first()
+        if exam is None:
+            raise CommandError(f"Unknown exam id: {exam_id}")
+
+        fmt = options["format"] or guess_format(path)
+        try:
+            with open(path, "rb") as fh:
+                questions, choices = import_questions(
+                    exam, fh, fmt, replace=options["replace"], chunk_size=options["chunk_size"],
+                )
+        except ExamImportError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(self.style.SUCCESS(f"{exam}: imported {questions} question(s), {choices} choice(s)."))
@@ -0,0 +1,274 @@
+import json
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, HTTPRedirectHandler, build_opener
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from enrollments.access import invalidate_enrollments
+from enrollments.models import Enrollment
+from exams.models import Exam, ExamAttempt
+
+ENDPOINTS = [
+    "attempt_start",
+    "attempt_take GET",
+    "attempt_take POST",
+    "attempt_submit",
+    "attempt_result",
+]
+RADIO_RE = re.compile(r'name="(q_\d+)"[^>]*value="(\d+)"')
+
+
+class NoRedirect(HTTPRedirectHandler):
+    # every hop of the flow is timed as its own request
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(0, int(round(pct / 100 * len(sorted_values))) - 1)
+    return sorted_values[index]
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {name: [] for name in ENDPOINTS}
+        self.errors = {name: 0 for name in ENDPOINTS}
+        self.server_errors = {name: 0 for name in ENDPOINTS}
+        self.failed_sessions = 0
+
+    def record(self, name, seconds, status):
+        with self.lock:
+            self.latencies[name].append(seconds)
+            if not 200 <= status < 400:
+                self.errors[name] += 1
+            # lock timeouts and deadlocks surface as 5xx; the cause is only in
+            # the server's logs (the page shows it with DEBUG on only)
+            if status >= 500:
+                self.server_errors[name] += 1
+
+    def report(self, wall_time):
+        endpoints = {}
+        total = 0
+        for name in ENDPOINTS:
+            values = sorted(self.latencies[name])
+            total += len(values)
+            endpoints[name] = {
+                "requests": len(values),
+                "throughput_rps": round(len(values) / wall_time, 2) if wall_time else None,
+                "p50_ms": _ms(percentile(values, 50)),
+                "p95_ms": _ms(percentile(values, 95)),
+                "p99_ms": _ms(percentile(values, 99)),
+                "max_ms": _ms(values[-1] if values else None),
+                "errors": self.errors[name],
+                "server_errors": self.server_errors[name],
+            }
+        return {
+            "wall_time_s": round(wall_time, 3),
+            "requests": total,
+            "throughput_rps": round(total / wall_time, 2) if wall_time else None,
+            "failed_sessions": self.failed_sessions,
+            "endpoints": endpoints,
+        }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+class Student:
+    """One simulated student walking start -> take -> save -> submit -> result."""
+
+    def __init__(self, base_url, stats, timeout):
+        self.base_url = base_url.rstrip("/")
+        self.stats = stats
+        self.timeout = timeout
+        self.cookies = CookieJar()
+        self.opener = build_opener(HTTPCookieProcessor(self.cookies), NoRedirect)
+
+    def csrf_token(self):
+        return next((c.value for c in self.cookies if c.name == "csrftoken"), "")
+
+    def request(self, path, data=None, name=None):
+        url = path if path.startswith("http") else self.base_url + path
+        body = None
+        if data is not None:
+            data = {**data, "csrfmiddlewaretoken": self.csrf_token()}
+            body = urlencode(data).encode()
+
+        started = time.perf_counter()
+        try:
+            response = self.opener.open(url, body, timeout=self.timeout)
+            status, headers, content = response.status, response.headers, response.read()
+        except HTTPError as exc:
+            status, headers, content = exc.code, exc.headers, exc.read()
+        except URLError:
+            status, headers, content = 0, {}, b""
+        elapsed = time.perf_counter() - started
+
+        text = content.decode("utf-8", "replace")
+        if name:
+            self.stats.record(name, elapsed, status)
+        return status, headers.get("Location"), text
+
+    def login(self, username, password):
+        self.request("/login/")
+        status, location, _ = self.request("/login/", {"username": username, "password": password})
+        return status == 302
+
+    def run(self, exam_id, saves):
+        status, take_url, _ = self.request(f"/exams/{exam_id}/start/", name="attempt_start")
+        if status != 302 or "/take/" not in (take_url or ""):
+            raise RuntimeError(f"start returned {status} -> {take_url}")
+
+        status, _, page = self.request(take_url, name="attempt_take GET")
+        choices = {}
+        for question, choice in RADIO_RE.findall(page):
+            choices.setdefault(question, []).append(choice)
+
+        for _ in range(saves):
+            answers = {q: random.choice(options) for q, options in choices.items()}
+            self.request(take_url, answers, name="attempt_take POST")
+
+        submit_url = take_url.replace("/attempts/", "/attempt/").replace("/take/", "/submit/")
+        status, result_url, _ = self.request(submit_url, {}, name="attempt_submit")
+        if result_url:
+            self.request(result_url, name="attempt_result")
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate concurrent students taking an exam against a running server "
+        "and report throughput, p50/p95/p99 latency and errors per endpoint as JSON. "
+        "errors counts every non-2xx/3xx response (0 for timeouts and refused "
+        "connections), server_errors the 5xx among them; check the server log "
+        "for lock timeouts or deadlocks behind them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("exam_id", type=int)
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument("--students", type=int, default=50)
+        parser.add_argument("--concurrency", type=int, default=None,
+                            help="Worker threads (defaults to --students).")
+        parser.add_argument("--saves", type=int, default=3,
+                            help="Full-form saves per student before submitting.")
+        parser.add_argument("--password", default="loadtest-password")
+        parser.add_argument("--timeout", type=float, default=30)
+        parser.add_argument("--no-setup", action="store_true",
+                            help="Reuse the loadtest users and their attempts as they are.")
+        parser.add_argument("--output", help="JSON results path (default: loadtest-<timestamp>.json).")
+        parser.add_argument("--baseline", help="Previous results JSON to compare p95 latency against.")
+        parser.add_argument("--max-regression", type=float, default=0.2,
+                            help="Allowed p95 growth over the baseline (0.2 = 20%%).")
+
+    def handle(self, *args, **options):
+        exam = Exam.objects.filter(pk=options["exam_id"]).first()
+        if exam is None:
+            raise CommandError(f"Unknown exam id: {options['exam_id']}")
+
+        usernames = [f"loadtest_{i:05d}" for i in range(options["students"])]
+        if not options["no_setup"]:
+            self.setup_students(exam, usernames, options["password"])
+
+        stats = Stats()
+
+        def simulate(username):
+            student = Student(options["base_url"], stats, options["timeout"])
+            try:
+                if not student.login(username, options["password"]):
+                    raise RuntimeError("login failed")
+                student.run(exam.pk, options["saves"])
+            except Exception as exc:
+                with stats.lock:
+                    stats.failed_sessions += 1
+                self.stderr.write(f"{username}: {exc}")
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"] or len(usernames)) as pool:
+            list(pool.map(simulate, usernames))
+        wall_time = time.perf_counter() - started
+
+        report = {
+            "run_at": timezone.now().isoformat(),
+            "base_url": options["base_url"],
+            "exam_id": exam.pk,
+            "questions": exam.questions.count(),
+            "students": len(usernames),
+            "concurrency": options["concurrency"] or len(usernames),
+            "saves": options["saves"],
+            **stats.report(wall_time),
+        }
+
+        output = options["output"] or f"loadtest-{timezone.now():%Y%m%d-%H%M%S}.json"
+        with open(output, "w") as fh:
+            json.dump(report, fh, indent=2)
+
+        self.print_report(report)
+        self.stdout.write(f"Results written to {output}")
+
+        if options["baseline"]:
+            self.compare(report, options["baseline"], options["max_regression"])
+
+    def setup_students(self, exam, usernames, password):
+        User = get_user_model()
+        existing = set(User.objects.filter(username__in=usernames).values_list("username", flat=True))
+        for username in usernames:
+            if username not in existing:
+                User.objects.create_user(username, password=password)
+
+        user_ids = list(User.objects.filter(username__in=usernames).values_list("id", flat=True))
+        enrolled = set(
+            Enrollment.objects
+            .filter(course_id=exam.course_id, user_id__in=user_ids)
+            .values_list("user_id", flat=True)
+        )
+        Enrollment.objects.bulk_create([
+            Enrollment(user_id=user_id, course_id=exam.course_id)
+            for user_id in user_ids if user_id not in enrolled
+        ])
+        invalidate_enrollments(user_ids)
+
+        # every run starts from a fresh attempt
+        ExamAttempt.objects.filter(exam=exam, user_id__in=user_ids).delete()
+
+    def print_report(self, report):
+        self.stdout.write(
+            f"{report['requests']} requests in {report['wall_time_s']}s "
+            f"({report['throughput_rps']} req/s), {report['failed_sessions']} failed session(s)"
+        )
+        self.stdout.write(
+            f"{'endpoint':<20}{'reqs':>7}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'errors':>8}{'5xx':>8}"
+        )
+        for name, row in report["endpoints"].items():
+            self.stdout.write(
+                f"{name:<20}{row['requests']:>7}{row['throughput_rps'] or 0:>9}"
+                f"{row['p50_ms'] or 0:>9}{row['p95_ms'] or 0:>9}{row['p99_ms'] or 0:>9}"
+                f"{row['errors']:>8}{row['server_errors']:>8}"
+            )
+
+    def compare(self, report, baseline_path, max_regression):
+        with open(baseline_path) as fh:
+            baseline = json.load(fh)
+
+        regressions = []
+        for name, row in report["endpoints"].items():
+            before = baseline.get("endpoints", {}).get(name, {}).get("p95_ms")
+            after = row["p95_ms"]
+            if before and after and after > before * (1 + max_regression):
+                regressions.append(f"{name}: p95 {before}ms -> {after}ms")
+
+        if regressions:
+            raise CommandError("p95 regressions over baseline:\n  " + "\n  ".join(regressions))
+        self.stdout.write(self.style.SUCCESS(f"No p95 regression over {baseline_path}."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from exams.models import Exam
+from exams.provisioning import provision_attempts
+
+
+class Command(BaseCommand):
+    help = "Pre-create in-progress attempts for every student enrolled in the exam's course."
+
+    def add_arguments(self, parser):
+        parser.add_argument("exam_ids", nargs="+", type=int)
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, exam_ids, batch_size, **options):
+        exams = Exam.objects.in_bulk(exam_ids)
+        missing = set(exam_ids) - set(exams)
+        if missing:
+            raise CommandError(f"Unknown exam id(s): {', '.join(map(str, sorted(missing)))}")
+
+        for exam in exams.values():
+            created = provision_attempts(exam, batch_size=batch_size)
+            self.stdout.write(self.style.SUCCESS(f"{exam}: provisioned {created} attempt(s)."))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from exams import ranking
+
+
+class Command(BaseCommand):
+    help = "Recount the score distribution behind ranks and leaderboards of every exam (or the given exams)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("exam_ids", nargs="*", type=int)
+
+    def handle(self, *args, exam_ids, **options):
+        if exam_ids:
+            buckets = sum(ranking.rebuild(pk) for pk in exam_ids)
+        else:
+            buckets = ranking.rebuild()
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {buckets} score bucket(s)."))
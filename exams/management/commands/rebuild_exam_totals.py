@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from exams.models import Exam
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored question marks total of every exam (or the given exams)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("exam_ids", nargs="*", type=int)
+
+    def handle(self, *args, exam_ids, **options):
+        if exam_ids:
+            updated = sum(Exam.refresh_question_marks_total(pk) for pk in exam_ids)
+        else:
+            updated = Exam.refresh_question_marks_total()
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt marks total for {updated} exam(s)."))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from exams.deadlines import BATCH_SIZE, sweep_expired
+
+
+class Command(BaseCommand):
+    help = "Submit in-progress attempts of timed exams whose deadline has passed, every --interval seconds."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=30, help="Seconds between sweeps.")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument("--once", action="store_true", help="Sweep once and exit.")
+
+    def handle(self, *args, interval, batch_size, once, **options):
+        try:
+            while True:
+                close_old_connections()
+                finalized = sweep_expired(batch_size=batch_size)
+                if finalized or once:
+                    self.stdout.write(self.style.SUCCESS(f"Submitted {finalized} expired attempt(s)."))
+                if once:
+                    return
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped.")
@@ -0,0 +1,34 @@
+# Generated by Django 6.0 on 2026-10-18 20:45
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_question_marks_total(apps, schema_editor):
+    Exam = apps.get_model("exams", "Exam")
+    Question = apps.get_model("exams", "Question")
+    marks = (
+        Question.objects
+        .filter(exam=models.OuterRef("pk"))
+        .order_by()
+        .values("exam")
+        .annotate(total=models.Sum("mark"))
+        .values("total")
+    )
+    Exam.objects.update(question_marks_total=Coalesce(models.Subquery(marks), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0004_exam_content_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exam',
+            name='question_marks_total',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_question_marks_total, migrations.RunPython.noop),
+    ]
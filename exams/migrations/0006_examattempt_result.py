@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 20:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0005_exam_question_marks_total'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='examattempt',
+            name='result',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
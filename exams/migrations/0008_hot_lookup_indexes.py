@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-18 20:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0007_examstatistics'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # create the composite indexes before dropping the FK indexes they replace
+        migrations.AddIndex(
+            model_name='examattempt',
+            index=models.Index(fields=['user', 'exam', 'status'], name='attempt_user_exam_status'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['exam', 'order'], name='question_exam_order'),
+        ),
+        migrations.AlterField(
+            model_name='examattempt',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='exam_attempts', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='question',
+            name='exam',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='questions', to='exams.exam'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-18 21:05
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0008_hot_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exam',
+            name='questions_per_page',
+            field=models.PositiveSmallIntegerField(blank=True, help_text='Leave empty to show every question on one page.', null=True, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+    ]
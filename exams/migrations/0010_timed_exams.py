@@ -0,0 +1,30 @@
+# Generated by Django 6.0 on 2026-10-18 21:07
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0009_exam_questions_per_page'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exam',
+            name='duration',
+            field=models.DurationField(blank=True, help_text='Time allowed per attempt as HH:MM:SS. Leave empty for an untimed exam.', null=True),
+        ),
+        migrations.AlterField(
+            model_name='examattempt',
+            name='started_at',
+            field=models.DateTimeField(blank=True, default=django.utils.timezone.now, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='examattempt',
+            index=models.Index(fields=['status', 'started_at'], name='attempt_status_started'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 6.0 on 2026-10-18 21:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_score_buckets(apps, schema_editor):
+    ExamAttempt = apps.get_model("exams", "ExamAttempt")
+    ExamScoreBucket = apps.get_model("exams", "ExamScoreBucket")
+    counts = (
+        ExamAttempt.objects
+        .filter(status="SUBMITTED")
+        .values("exam", "user_mark")
+        .annotate(n=models.Count("id"))
+        .order_by()
+        .values_list("exam", "user_mark", "n")
+    )
+    ExamScoreBucket.objects.bulk_create(
+        (ExamScoreBucket(exam_id=exam_id, mark=mark, count=n) for exam_id, mark, n in counts.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0010_timed_exams'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExamScoreBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mark', models.PositiveSmallIntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='examattempt',
+            index=models.Index(fields=['exam', 'status', '-user_mark', 'submitted_at'], name='attempt_leaderboard'),
+        ),
+        migrations.AddField(
+            model_name='examscorebucket',
+            name='exam',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='score_buckets', to='exams.exam'),
+        ),
+        migrations.AddConstraint(
+            model_name='examscorebucket',
+            constraint=models.UniqueConstraint(fields=('exam', 'mark'), name='unique_score_bucket_per_exam_mark'),
+        ),
+        migrations.RunPython(fill_score_buckets, migrations.RunPython.noop),
+    ]
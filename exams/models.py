@@ -1,5 +1,8 @@
 from django.conf import settings
+from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
 
 class Exam(models.Model):
@@ -10,24 +13,63 @@ class Exam(models.Model):
     )
     title = models.CharField(max_length=200)
     total_marks = models.PositiveSmallIntegerField(null=True, blank=True)
+    # sum of Question.mark, refreshed by the Question signal receivers; bulk
+    # writes (bulk_create, .update()) must call refresh_question_marks_total()
+    question_marks_total = models.PositiveIntegerField(default=0, editable=False)
+    # bumped on every Question/AnswerChoice write, keys the compiled exam cache
+    content_version = models.PositiveIntegerField(default=1, editable=False)
+    # deliver the exam this many questions at a time, see compiled.CompiledPage
+    questions_per_page = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(1)],
+        help_text="Leave empty to show every question on one page.",
+    )
+    # time allowed per attempt, enforced by exams.deadlines
+    duration = models.DurationField(
+        null=True,
+        blank=True,
+        help_text="Time allowed per attempt as HH:MM:SS. Leave empty for an untimed exam.",
+    )
 
     def __str__(self):
         return self.title
 
-    #computed field
-    @property
-    def total_marks1(self):
-        return self.questions.all().aggregate(sum=models.Sum('mark'))['sum'] or 0
+    @classmethod
+    def bump_content_version(cls, pk=None, question_id=None):
+        if pk is not None:
+            exams = cls.objects.filter(pk=pk)
+        else:
+            exams = cls.objects.filter(questions=question_id)
+        exams.update(content_version=models.F("content_version") + 1)
+
+    @classmethod
+    def refresh_question_marks_total(cls, pk=None):
+        """Recompute the stored marks total of one exam (or all exams when pk is None)."""
+        marks = (
+            Question.objects
+            .filter(exam=models.OuterRef("pk"))
+            .order_by()
+            .values("exam")
+            .annotate(total=models.Sum("mark"))
+            .values("total")
+        )
+        exams = cls.objects.all() if pk is None else cls.objects.filter(pk=pk)
+        return exams.update(question_marks_total=Coalesce(models.Subquery(marks), 0))
 
 
 class Question(models.Model):
-    exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name="questions")
+    # indexed by question_exam_order
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name="questions", db_index=False)
     text = models.TextField()
     mark = models.PositiveSmallIntegerField()
     order = models.PositiveSmallIntegerField()
 
     class Meta:
         ordering = ["order"]
+        indexes = [
+            models.Index(fields=["exam", "order"], name="question_exam_order"),
+        ]
 
     def __str__(self):
         return f"Q{self.order} ({self.mark} marks)"
@@ -46,6 +88,8 @@ class AnswerChoice(models.Model):
             AnswerChoice.objects.filter(
                 question_id=self.question_id
             ).exclude(pk=self.pk).update(is_correct=False)
+            # the post_save bump ran before this update, bump again
+            Exam.bump_content_version(question_id=self.question_id)
 
     def __str__(self):
         return self.text[:50]
@@ -60,10 +104,12 @@ class ExamAttempt(models.Model):
     #     ('SUBMITTED', 'Submitted'),
     # )
 
+    # indexed by attempt_user_exam_status
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
-        related_name="exam_attempts"
+        related_name="exam_attempts",
+        db_index=False,
     )
     exam = models.ForeignKey(
         Exam,
@@ -77,11 +123,14 @@ class ExamAttempt(models.Model):
         default=Status.IN_PROGRESS,
     )
 
-    started_at = models.DateTimeField(auto_now_add=True)
+    # None until a provisioned attempt is first opened, see deadlines.start_clock
+    started_at = models.DateTimeField(null=True, blank=True, default=timezone.now)
     submitted_at = models.DateTimeField(null=True, blank=True)
 
     full_mark = models.PositiveSmallIntegerField(default=0)
     user_mark = models.PositiveSmallIntegerField(default=0)
+    # per-question result written once at submit, see grading.build_result
+    result = models.JSONField(null=True, blank=True, editable=False)
 
     def __str__(self):
         return f"{self.user} - {self.exam} ({self.status})"
@@ -94,6 +143,14 @@ class ExamAttempt(models.Model):
                 name="unique_in_progress_attempt_per_user_exam",
             )
         ]
+        indexes = [
+            # the start view's lookup, including its ORDER BY status
+            models.Index(fields=["user", "exam", "status"], name="attempt_user_exam_status"),
+            # the expired-attempt sweep, see deadlines.expired_attempts
+            models.Index(fields=["status", "started_at"], name="attempt_status_started"),
+            # the top N of an exam, see ranking.leaderboard
+            models.Index(fields=["exam", "status", "-user_mark", "submitted_at"], name="attempt_leaderboard"),
+        ]
 
 
 class AttemptAnswer(models.Model):
@@ -128,3 +185,40 @@ class AttemptAnswer(models.Model):
 
     def __str__(self):
         return f"{self.attempt} - Q{self.question.order}"
+
+
+class ExamStatistics(models.Model):
+    # running item-analysis totals, folded in by exams.analytics.update_statistics
+    exam = models.OneToOneField(
+        Exam,
+        on_delete=models.CASCADE,
+        related_name="statistics",
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    last_submitted_at = models.DateTimeField(null=True, blank=True)
+    state = models.JSONField(default=dict, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.exam} statistics"
+
+
+class ExamScoreBucket(models.Model):
+    # submitted attempts of an exam per user_mark, kept by exams.ranking
+    # indexed by unique_score_bucket_per_exam_mark
+    exam = models.ForeignKey(
+        Exam,
+        on_delete=models.CASCADE,
+        related_name="score_buckets",
+        db_index=False,
+    )
+    mark = models.PositiveSmallIntegerField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["exam", "mark"], name="unique_score_bucket_per_exam_mark"),
+        ]
+
+    def __str__(self):
+        return f"{self.exam}: {self.count} x {self.mark}"
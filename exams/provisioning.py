@@ -0,0 +1,61 @@
+from django.db import transaction
+
+from enrollments.models import Enrollment
+
+from .models import ExamAttempt
+
+
+def provision_attempts(exam, batch_size=1000):
+    """
+    Pre-create an IN_PROGRESS attempt for every user enrolled in the exam's
+    course who has no attempt yet, so starting the exam is a single lookup.
+
+    Returns the number of attempts actually created.
+    """
+    has_attempt = ExamAttempt.objects.filter(exam=exam).values("user_id")
+    user_ids = (
+        Enrollment.objects
+        .filter(course_id=exam.course_id)
+        .exclude(user_id__in=has_attempt)
+        .values_list("user_id", flat=True)
+        .distinct()
+        .order_by("user_id")
+    )
+
+    created = 0
+    batch = []
+    for user_id in user_ids.iterator(chunk_size=batch_size):
+        batch.append(ExamAttempt(
+            user_id=user_id,
+            exam=exam,
+            status=ExamAttempt.Status.IN_PROGRESS,
+            # the clock starts when the student opens it, see deadlines.start_clock
+            started_at=None,
+            full_mark=exam.question_marks_total,
+            user_mark=0,
+        ))
+        if len(batch) >= batch_size:
+            created += _insert(batch)
+            batch = []
+
+    if batch:
+        created += _insert(batch)
+
+    return created
+
+
+def _insert(batch):
+    # a student who starts the exam meanwhile wins the partial unique
+    # constraint and this batch's row is skipped. Their attempt has a
+    # started_at, and ours stay unstarted until committed, so the rows
+    # created are the new unstarted ones.
+    unstarted = ExamAttempt.objects.filter(
+        exam_id=batch[0].exam_id,
+        user_id__in=[attempt.user_id for attempt in batch],
+        status=ExamAttempt.Status.IN_PROGRESS,
+        started_at__isnull=True,
+    )
+    with transaction.atomic():
+        before = unstarted.count()
+        ExamAttempt.objects.bulk_create(batch, ignore_conflicts=True)
+        return unstarted.count() - before
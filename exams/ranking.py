@@ -0,0 +1,130 @@
+"""
+Ranks, percentiles and leaderboards of submitted attempts.
+
+Every submission adds one to its exam's ExamScoreBucket for that user_mark,
+so an exam's score distribution is at most full_mark + 1 rows however many
+students took it. A student's rank is 1 + the attempts in the buckets above
+their mark, summed from those rows instead of counting ExamAttempt rows, and
+the top N attempts are read off the attempt_leaderboard index.
+"""
+from typing import NamedTuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+
+from .models import ExamAttempt, ExamScoreBucket
+
+LEADERBOARD_SIZE = 10
+MAX_LEADERBOARD_SIZE = 100
+
+
+class Standing(NamedTuple):
+    rank: int
+    total: int
+    percentile: float
+
+
+def record_scores(counts):
+    """Add ``{(exam_id, mark): n}`` submitted attempts to the buckets (n < 0 removes them)."""
+    for (exam_id, mark), n in counts.items():
+        bucket = ExamScoreBucket.objects.filter(exam_id=exam_id, mark=mark)
+        if bucket.update(count=F("count") + n) or n < 0:
+            continue
+        try:
+            with transaction.atomic():
+                ExamScoreBucket.objects.create(exam_id=exam_id, mark=mark, count=n)
+        except IntegrityError:
+            # created by a concurrent submission
+            bucket.update(count=F("count") + n)
+
+
+def record_attempts(attempt_ids):
+    """Count attempts just submitted in bulk, grouped per (exam, mark) in SQL."""
+    counts = (
+        ExamAttempt.objects
+        .filter(pk__in=attempt_ids)
+        .values("exam_id", "user_mark")
+        .annotate(n=Count("id"))
+        .order_by()
+        .values_list("exam_id", "user_mark", "n")
+    )
+    record_scores({(exam_id, mark): n for exam_id, mark, n in counts})
+
+
+def _standing_counts(mark):
+    return {
+        "higher": Sum("count", filter=Q(mark__gt=mark), default=0),
+        "equal": Sum("count", filter=Q(mark=mark), default=0),
+        "total": Sum("count", default=0),
+    }
+
+
+def standing(exam_id, mark):
+    """Rank (ties share the best rank), number of ranked attempts and percentile of ``mark``."""
+    counts = ExamScoreBucket.objects.filter(exam_id=exam_id).aggregate(**_standing_counts(mark))
+    return _standing(counts)
+
+
+async def astanding(exam_id, mark):
+    counts = await ExamScoreBucket.objects.filter(exam_id=exam_id).aaggregate(**_standing_counts(mark))
+    return _standing(counts)
+
+
+def _standing(counts):
+    total = counts["total"]
+    below = total - counts["higher"] - counts["equal"]
+    # percentile rank: the share of attempts below, counting ties as half
+    percentile = round(100 * (below + counts["equal"] / 2) / total, 1) if total else 0.0
+    return Standing(counts["higher"] + 1, total, percentile)
+
+
+def ranked_count(exam_id):
+    return ExamScoreBucket.objects.filter(exam_id=exam_id).aggregate(total=Sum("count", default=0))["total"]
+
+
+def leaderboard(exam_id, size=LEADERBOARD_SIZE):
+    """The ``size`` best submitted attempts as (rank, attempt), earliest first among ties."""
+    attempts = list(
+        ExamAttempt.objects
+        .filter(exam_id=exam_id, status=ExamAttempt.Status.SUBMITTED)
+        .select_related("user")
+        .order_by("-user_mark", "submitted_at")[:size]
+    )
+    if not attempts:
+        return []
+
+    # ranks from the buckets at or above the lowest mark shown
+    buckets = (
+        ExamScoreBucket.objects
+        .filter(exam_id=exam_id, mark__gte=attempts[-1].user_mark)
+        .order_by("-mark")
+        .values_list("mark", "count")
+    )
+    rank_of, above = {}, 0
+    for mark, count in buckets:
+        rank_of[mark] = above + 1
+        above += count
+
+    return [(rank_of.get(attempt.user_mark, 1), attempt) for attempt in attempts]
+
+
+def rebuild(exam_id=None):
+    """Recount the buckets of one exam (or all exams) from the submitted attempts."""
+    with transaction.atomic():
+        buckets = ExamScoreBucket.objects.all()
+        attempts = ExamAttempt.objects.filter(status=ExamAttempt.Status.SUBMITTED)
+        if exam_id is not None:
+            buckets = buckets.filter(exam_id=exam_id)
+            attempts = attempts.filter(exam_id=exam_id)
+
+        buckets.delete()
+        counts = (
+            attempts
+            .values("exam_id", "user_mark")
+            .annotate(n=Count("id"))
+            .order_by()
+            .values_list("exam_id", "user_mark", "n")
+        )
+        return len(ExamScoreBucket.objects.bulk_create(
+            [ExamScoreBucket(exam_id=exam, mark=mark, count=n) for exam, mark, n in counts],
+        ))
@@ -0,0 +1,23 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Exam, Question, AnswerChoice, ExamAttempt
+from .ranking import record_scores
+
+
+@receiver([post_save, post_delete], sender=Question)
+def question_changed(sender, instance, **kwargs):
+    # post_delete also fires for queryset and cascaded deletes, which skip Question.delete()
+    Exam.bump_content_version(pk=instance.exam_id)
+    Exam.refresh_question_marks_total(instance.exam_id)
+
+
+@receiver([post_save, post_delete], sender=AnswerChoice)
+def choice_changed(sender, instance, **kwargs):
+    Exam.bump_content_version(question_id=instance.question_id)
+
+
+@receiver(post_delete, sender=ExamAttempt)
+def attempt_deleted(sender, instance, **kwargs):
+    if instance.status == ExamAttempt.Status.SUBMITTED:
+        record_scores({(instance.exam_id, instance.user_mark): -1})
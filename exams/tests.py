@@ -1,3 +1,1035 @@
-from django.test import TestCase
+import io
+import json
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.exceptions import PermissionDenied
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.core.cache import cache
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from config.db_router import PIN_COOKIE
+from courses.models import Course
+from enrollments.access import enrolled_course_ids
+from enrollments.models import Enrollment
+from search.documents import search
+
+from . import async_views, ranking
+from .analytics import item_analysis, update_statistics
+from .management.commands.loadtest_exams import Stats
+from .deadlines import GRACE, sweep_expired
+from .grading import submit_attempt
+from .provisioning import provision_attempts
+from .compiled import get_compiled_exam
+from .models import Exam, Question, AnswerChoice, ExamAttempt, AttemptAnswer, ExamScoreBucket
+from .transfer import export_lines
+
+
+@override_settings(READ_REPLICA_ALIAS="replica")
+class ReplicaRoutingTests(TestCase):
+    # "replica" is a second SQLite file here, so rows written with
+    # .using("replica") only are visible to reads routed to the replica
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        course = Course.objects.create(name="Primary course", grade=1)
+        self.exam = Exam.objects.create(course=course, title="Primary exam")
+        question = Question.objects.create(exam=self.exam, text="2 + 2?", mark=1, order=1)
+        AnswerChoice.objects.create(question=question, text="4", is_correct=True)
+
+        replica_course = Course.objects.using("replica").create(name="Replica course", grade=1)
+        Exam.objects.using("replica").create(course=replica_course, title="Replica exam")
+
+        # staff see every course, so enrollment does not hide the replica rows
+        self.user = User.objects.create_user("staff", password="pw", is_staff=True)
+        self.client.force_login(self.user)
+
+    def test_list_pages_read_from_replica(self):
+        response = self.client.get(reverse("exams:exam_list"))
+        self.assertContains(response, "Replica exam")
+        self.assertNotContains(response, "Primary exam")
+
+        response = self.client.get(reverse("courses:course-list"))
+        self.assertContains(response, "Replica course")
+
+    def test_views_without_flag_read_from_primary(self):
+        response = self.client.get(reverse("exams:exam_detail", args=[self.exam.pk]))
+        self.assertContains(response, "Primary exam")
+
+    def test_post_pins_user_to_primary(self):
+        attempt = ExamAttempt.objects.create(user=self.user, exam=self.exam, full_mark=1)
+
+        response = self.client.post(reverse("exams:attempt_take", args=[attempt.pk]))
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(ExamAttempt.objects.using("replica").count(), 0)
+
+        response = self.client.get(reverse("exams:exam_list"))
+        self.assertContains(response, "Primary exam")
+        self.assertNotContains(response, "Replica exam")
+
+    def test_submitted_result_is_read_from_primary_while_pinned(self):
+        attempt = ExamAttempt.objects.create(user=self.user, exam=self.exam, full_mark=1)
+
+        self.client.post(reverse("exams:attempt_submit", args=[attempt.pk]))
+        response = self.client.get(reverse("exams:attempt_result", args=[attempt.pk]))
+        self.assertContains(response, "Score: 0 / 1")
+
+    async def test_routing_under_asgi(self):
+        # the async client runs the middleware chain through ASGIHandler
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse("exams:exam_list"))
+        self.assertContains(response, "Replica exam")
+
+        response = await self.async_client.get(reverse("exams:exam_detail", args=[self.exam.pk]))
+        self.assertContains(response, "Primary exam")
+
+    @override_settings(READ_REPLICA_ALIAS=None)
+    def test_routing_disabled_without_replica(self):
+        response = self.client.get(reverse("exams:exam_list"))
+        self.assertContains(response, "Primary exam")
+
+
+class EnrollmentAccessTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.course = Course.objects.create(name="Enrolled course", grade=1)
+        self.other_course = Course.objects.create(name="Other course", grade=1)
+        self.exam = Exam.objects.create(course=self.course, title="Enrolled exam")
+        self.other_exam = Exam.objects.create(course=self.other_course, title="Other exam")
+
+        self.user = User.objects.create_user("student", password="pw")
+        Enrollment.objects.create(user=self.user, course=self.course)
+        self.client.force_login(self.user)
+
+    def test_lists_only_show_enrolled_courses(self):
+        response = self.client.get(reverse("exams:exam_list"))
+        self.assertContains(response, "Enrolled exam")
+        self.assertNotContains(response, "Other exam")
+
+        response = self.client.get(reverse("courses:course-list"))
+        self.assertContains(response, "Enrolled course")
+        self.assertNotContains(response, "Other course")
+
+    def test_other_course_is_forbidden(self):
+        response = self.client.get(reverse("exams:exam_detail", args=[self.other_exam.pk]))
+        self.assertEqual(response.status_code, 403)
+
+        response = self.client.get(reverse("exams:attempt_start", args=[self.other_exam.pk]))
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(ExamAttempt.objects.exists())
+
+        response = self.client.get(reverse("courses:unit-list", args=[self.other_course.pk]))
+        self.assertEqual(response.status_code, 403)
+
+    def test_students_do_not_see_the_answer_key(self):
+        question = Question.objects.create(exam=self.exam, text="2 + 2?", mark=1, order=1)
+        AnswerChoice.objects.create(question=question, text="Four", is_correct=True)
+
+        response = self.client.get(reverse("exams:exam_detail", args=[self.exam.pk]))
+        self.assertContains(response, "1 question")
+        self.assertNotContains(response, "Four")
+        self.assertNotContains(response, "Correct")
+        self.assertNotContains(response, reverse("exams:question_update", args=[question.pk]))
+
+        self.client.force_login(User.objects.create_user("staff", is_staff=True))
+        response = self.client.get(reverse("exams:exam_detail", args=[self.exam.pk]))
+        self.assertContains(response, "Four")
+
+    def test_authoring_requires_staff(self):
+        response = self.client.get(reverse("exams:exam_create"))
+        self.assertEqual(response.status_code, 403)
+
+    def test_enrolled_course_ids_are_cached(self):
+        self.client.get(reverse("exams:exam_detail", args=[self.exam.pk]))
+
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(enrolled_course_ids(user), {self.course.pk})
+
+    def test_new_enrollment_invalidates_cache(self):
+        self.client.get(reverse("exams:exam_detail", args=[self.exam.pk]))
+        Enrollment.objects.create(user=self.user, course=self.other_course)
+
+        response = self.client.get(reverse("exams:exam_detail", args=[self.other_exam.pk]))
+        self.assertEqual(response.status_code, 200)
+
+
+class PagedDeliveryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        course = Course.objects.create(name="Course", grade=1)
+        self.exam = Exam.objects.create(course=course, title="Long exam", questions_per_page=2)
+        self.right = {}
+        for order in range(1, 6):
+            question = Question.objects.create(exam=self.exam, text=f"Question {order}", mark=order, order=order)
+            self.right[order] = AnswerChoice.objects.create(question=question, text="right", is_correct=True)
+            AnswerChoice.objects.create(question=question, text="wrong")
+
+        user = User.objects.create_user("student", password="pw")
+        Enrollment.objects.create(user=user, course=course)
+        self.client.force_login(user)
+        self.attempt = ExamAttempt.objects.create(user=user, exam=self.exam, full_mark=15)
+        self.url = reverse("exams:attempt_take", args=[self.attempt.pk])
+
+    def answer(self, *orders):
+        return {f"q_{self.right[o].question_id}": str(self.right[o].pk) for o in orders}
+
+    def post(self, data):
+        # what the rendered page form carries
+        version = Exam.objects.values_list("content_version", flat=True).get(pk=self.exam.pk)
+        return self.client.post(self.url, {"version": version, **data})
+
+    def test_get_renders_only_the_page(self):
+        response = self.client.get(self.url, {"page": 2})
+        self.assertContains(response, "Question 3")
+        self.assertContains(response, "Question 4")
+        self.assertNotContains(response, "Question 1")
+        self.assertNotContains(response, "Question 5")
+        self.assertContains(response, "Page 2 of 3")
+
+        response = self.client.get(self.url, {"page": 99})
+        self.assertContains(response, "Question 5")
+
+    def test_post_grades_only_the_page(self):
+        response = self.post({"page": 1, "goto": 2, **self.answer(1, 2)})
+        self.assertRedirects(response, f"{self.url}?page=2")
+        self.post({"page": 2, **self.answer(3, 4, 5)})
+
+        self.attempt.refresh_from_db()
+        self.assertEqual(self.attempt.answers.count(), 4)
+        self.assertEqual(self.attempt.user_mark, 1 + 2 + 3 + 4)
+
+        # clearing an answer on page 1 leaves page 2's marks alone
+        self.post({"page": 1, **self.answer(2)})
+        self.attempt.refresh_from_db()
+        self.assertEqual(self.attempt.user_mark, 2 + 3 + 4)
+
+    def test_post_from_an_older_layout_saves_nothing(self):
+        self.post({"page": 3, **self.answer(5)})
+        version = self.client.get(self.url, {"page": 2}).context["page"].version
+
+        # with question 1 gone, page 2 holds questions 4 and 5; grading the old
+        # page 2 (3 and 4) against it would clear the answer to 5
+        Question.objects.get(exam=self.exam, order=1).delete()
+        response = self.client.post(self.url, {"page": 2, "version": version, **self.answer(3, 4)})
+        self.assertContains(response, "this page was not saved", status_code=409)
+        self.assertContains(response, "Question 5", status_code=409)
+
+        self.attempt.refresh_from_db()
+        self.assertEqual(list(self.attempt.answers.values_list("question__order", flat=True)), [5])
+
+        # posting without a version is stale too
+        response = self.client.post(self.url, {"page": 1, **self.answer(5)})
+        self.assertEqual(response.status_code, 409)
+
+
+class TimedExamTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        course = Course.objects.create(name="Course", grade=1)
+        self.exam = Exam.objects.create(course=course, title="Timed exam", duration=timedelta(minutes=30))
+        question = Question.objects.create(exam=self.exam, text="2 + 2?", mark=2, order=1)
+        self.right = AnswerChoice.objects.create(question=question, text="4", is_correct=True)
+        self.exam.refresh_from_db()
+
+        self.user = User.objects.create_user("student", password="pw")
+        Enrollment.objects.create(user=self.user, course=course)
+        self.client.force_login(self.user)
+
+    def attempt(self, minutes_ago, user=None, exam=None):
+        return ExamAttempt.objects.create(
+            user=user or self.user,
+            exam=exam or self.exam,
+            full_mark=2,
+            started_at=None if minutes_ago is None else timezone.now() - timedelta(minutes=minutes_ago),
+        )
+
+    def test_expired_attempt_is_closed_on_open(self):
+        attempt = self.attempt(minutes_ago=31)
+
+        response = self.client.get(reverse("exams:attempt_take", args=[attempt.pk]))
+        self.assertRedirects(response, reverse("exams:attempt_result", args=[attempt.pk]))
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.status, ExamAttempt.Status.SUBMITTED)
+
+    def test_answers_after_the_grace_period_are_not_saved(self):
+        late = self.attempt(minutes_ago=30 + GRACE.total_seconds() / 60 + 1)
+        self.client.post(reverse("exams:attempt_take", args=[late.pk]), {f"q_{self.right.question_id}": self.right.pk})
+
+        late.refresh_from_db()
+        self.assertEqual(late.status, ExamAttempt.Status.SUBMITTED)
+        self.assertEqual(late.user_mark, 0)
+        self.assertFalse(late.answers.exists())
+
+    def test_provisioned_attempt_starts_its_clock_on_open(self):
+        attempt = self.attempt(minutes_ago=None)
+
+        response = self.client.get(reverse("exams:attempt_take", args=[attempt.pk]))
+        self.assertContains(response, "Time left")
+        attempt.refresh_from_db()
+        self.assertIsNotNone(attempt.started_at)
+
+    def test_sweep_submits_only_expired_attempts(self):
+        expired = self.attempt(minutes_ago=60)
+        AttemptAnswer.objects.create(
+            attempt=expired, question_id=self.right.question_id, selected_choice=self.right,
+            is_correct=True, earned_mark=2,
+        )
+        other = User.objects.create_user("other")
+        running = self.attempt(minutes_ago=5, user=other)
+        unopened = self.attempt(minutes_ago=None, user=User.objects.create_user("third"))
+        untimed = self.attempt(
+            minutes_ago=600, user=other, exam=Exam.objects.create(course=self.exam.course, title="Untimed"),
+        )
+
+        self.assertEqual(sweep_expired(batch_size=1), 1)
+
+        expired.refresh_from_db()
+        self.assertEqual(expired.status, ExamAttempt.Status.SUBMITTED)
+        self.assertEqual(expired.user_mark, 2)
+        self.assertIsNotNone(expired.submitted_at)
+        for attempt in (running, unopened, untimed):
+            attempt.refresh_from_db()
+            self.assertEqual(attempt.status, ExamAttempt.Status.IN_PROGRESS)
+
+        # the result snapshot is built when the student looks at it
+        response = self.client.get(reverse("exams:attempt_result", args=[expired.pk]))
+        self.assertContains(response, "Score: 2 / 2")
+
+
+class RankingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.course = Course.objects.create(name="Course", grade=1)
+        self.exam = Exam.objects.create(course=self.course, title="Ranked exam")
+        self.question = Question.objects.create(exam=self.exam, text="2 + 2?", mark=5, order=1)
+        self.exam.refresh_from_db()
+
+        self.attempts = [self.submitted(name, mark) for name, mark in [("a", 5), ("b", 3), ("c", 3), ("d", 0)]]
+
+    def submitted(self, username, mark):
+        user = User.objects.create_user(username, password="pw")
+        Enrollment.objects.create(user=user, course=self.course)
+        attempt = ExamAttempt.objects.create(user=user, exam=self.exam, full_mark=5)
+        if mark:
+            AttemptAnswer.objects.create(attempt=attempt, question=self.question, is_correct=True, earned_mark=mark)
+        submit_attempt(attempt, get_compiled_exam(self.exam))
+        return attempt
+
+    def test_standing_from_buckets(self):
+        with self.assertNumQueries(1):
+            standing = ranking.standing(self.exam.pk, 3)
+        self.assertEqual(standing, ranking.Standing(rank=2, total=4, percentile=50.0))
+        self.assertEqual(ranking.standing(self.exam.pk, 5).rank, 1)
+        self.assertEqual(ranking.standing(self.exam.pk, 0).rank, 4)
+
+    def test_submitting_twice_counts_once(self):
+        self.assertFalse(submit_attempt(self.attempts[0], get_compiled_exam(self.exam)))
+        self.assertEqual(ranking.ranked_count(self.exam.pk), 4)
+
+    def test_leaderboard_shares_ranks_between_ties(self):
+        leaders = ranking.leaderboard(self.exam.pk, size=3)
+        self.assertEqual([(rank, a.user.username) for rank, a in leaders], [(1, "a"), (2, "b"), (2, "c")])
+
+        self.client.force_login(self.attempts[1].user)
+        response = self.client.get(reverse("exams:exam_leaderboard", args=[self.exam.pk]))
+        self.assertContains(response, "4 submitted attempts")
+
+        response = self.client.get(reverse("exams:attempt_result", args=[self.attempts[1].pk]))
+        self.assertContains(response, "Rank 2 of 4")
+
+    def test_deleted_and_swept_attempts_update_buckets(self):
+        self.attempts[0].delete()
+        self.assertEqual(ranking.standing(self.exam.pk, 3), ranking.Standing(rank=1, total=3, percentile=66.7))
+
+        Exam.objects.filter(pk=self.exam.pk).update(duration=timedelta(minutes=10))
+        user = User.objects.create_user("late")
+        ExamAttempt.objects.create(
+            user=user, exam=self.exam, full_mark=5, started_at=timezone.now() - timedelta(hours=1),
+        )
+        sweep_expired()
+        self.assertEqual(ranking.ranked_count(self.exam.pk), 4)
+
+        buckets = ExamScoreBucket.objects.filter(exam=self.exam, count__gt=0).values_list("mark", "count")
+        counts = dict(buckets)
+        ranking.rebuild(self.exam.pk)
+        self.assertEqual(dict(buckets), counts)
+
+
+class GradebookTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.course = Course.objects.create(name="Course", grade=1)
+        self.exam = Exam.objects.create(course=self.course, title="Exam")
+        self.questions = [
+            Question.objects.create(exam=self.exam, text=f"Q{order}", mark=order, order=order) for order in (1, 2)
+        ]
+        other_exam = Exam.objects.create(course=self.course, title="Other exam")
+
+        student = User.objects.create_user("student", email="s@example.com")
+        answered = ExamAttempt.objects.create(
+            user=student, exam=self.exam, full_mark=3, user_mark=2,
+            status=ExamAttempt.Status.SUBMITTED, submitted_at=timezone.now(),
+        )
+        AttemptAnswer.objects.create(attempt=answered, question=self.questions[1], is_correct=True, earned_mark=2)
+        ExamAttempt.objects.create(
+            user=User.objects.create_user("blank"), exam=self.exam, full_mark=3,
+            status=ExamAttempt.Status.SUBMITTED, submitted_at=timezone.now(),
+        )
+        ExamAttempt.objects.create(user=User.objects.create_user("busy"), exam=self.exam, full_mark=3)
+        ExamAttempt.objects.create(
+            user=student, exam=other_exam, status=ExamAttempt.Status.SUBMITTED, submitted_at=timezone.now(),
+        )
+
+        self.client.force_login(User.objects.create_user("staff", is_staff=True))
+
+    def rows(self, response):
+        self.assertTrue(response.streaming)
+        content = b"".join(response.streaming_content).decode()
+        return [line.split(",") for line in content.splitlines()]
+
+    def test_exam_gradebook_pivots_questions(self):
+        response = self.client.get(reverse("exams:exam_gradebook", args=[self.exam.pk]), {"questions": 1})
+        header, *rows = self.rows(response)
+
+        self.assertEqual(header[-2:], ["Q1", "Q2"])
+        self.assertEqual([(row[1], row[-2:]) for row in rows], [("student", ["", "2"]), ("blank", ["", ""])])
+
+    def test_course_gradebook_lists_every_exam(self):
+        response = self.client.get(reverse("exams:course_gradebook", args=[self.course.pk]))
+        _, *rows = self.rows(response)
+
+        self.assertEqual([(row[1], row[3]) for row in rows], [
+            ("student", "Exam"), ("blank", "Exam"), ("student", "Other exam"),
+        ])
+
+    def test_text_cells_are_escaped_against_formulas(self):
+        Exam.objects.filter(title="Other exam").update(title="=SUM(A1:A9)")
+        User.objects.filter(username="student").update(username="-student", email="@s@example.com")
+
+        response = self.client.get(reverse("exams:course_gradebook", args=[self.course.pk]))
+        _, *rows = self.rows(response)
+        self.assertEqual(rows[-1][1:4], ["'-student", "'@s@example.com", "'=SUM(A1:A9)"])
+
+        response = self.client.get(reverse("exams:exam_gradebook", args=[self.exam.pk]), {"questions": 1})
+        _, first, _ = self.rows(response)
+        self.assertEqual(first[1], "'-student")
+        self.assertEqual(first[-1], "2")
+
+    def test_gradebook_requires_staff(self):
+        self.client.force_login(User.objects.get(username="student"))
+        response = self.client.get(reverse("exams:exam_gradebook", args=[self.exam.pk]))
+        self.assertEqual(response.status_code, 403)
+
+
+class AutosaveTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        course = Course.objects.create(name="Course", grade=1)
+        exam = Exam.objects.create(course=course, title="Exam")
+        self.questions = [Question.objects.create(exam=exam, text=f"Q{o}", mark=o, order=o) for o in (1, 2)]
+        self.right = [AnswerChoice.objects.create(question=q, text="right", is_correct=True) for q in self.questions]
+        self.wrong = [AnswerChoice.objects.create(question=q, text="wrong") for q in self.questions]
+
+        user = User.objects.create_user("student", password="pw")
+        Enrollment.objects.create(user=user, course=course)
+        self.client.force_login(user)
+        self.attempt = ExamAttempt.objects.create(user=user, exam=exam, full_mark=3)
+        self.url = reverse("exams:attempt_answer", args=[self.attempt.pk])
+
+    def save(self, choice):
+        return self.client.post(self.url, {"question": choice.question_id, "choice": choice.pk})
+
+    def test_reply_does_not_reveal_the_mark(self):
+        response = self.save(self.right[0])
+        self.assertEqual(response.json(), {"question": self.questions[0].pk, "choice": self.right[0].pk})
+
+        response = self.client.get(reverse("exams:attempt_take", args=[self.attempt.pk]))
+        self.assertNotContains(response, "current-mark")
+
+    def test_user_mark_is_resummed_from_answers(self):
+        self.save(self.right[0])
+        self.save(self.right[1])
+        self.save(self.right[1])
+        self.attempt.refresh_from_db()
+        self.assertEqual(self.attempt.user_mark, 3)
+
+        # a stale user_mark (e.g. a lost concurrent update) is corrected by the next save
+        ExamAttempt.objects.filter(pk=self.attempt.pk).update(user_mark=99)
+        self.save(self.wrong[0])
+        self.attempt.refresh_from_db()
+        self.assertEqual(self.attempt.user_mark, 2)
+
+    def test_invalid_question_or_choice(self):
+        response = self.client.post(self.url, {"question": "x"})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(self.url, {"question": self.questions[0].pk, "choice": self.right[1].pk})
+        self.assertEqual(response.status_code, 404)
+
+
+class ImportExportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.exam = Exam.objects.create(course=Course.objects.create(name="Course", grade=1), title="Exam")
+        self.url = reverse("exams:exam_import", args=[self.exam.pk])
+        self.client.force_login(User.objects.create_user("staff", is_staff=True))
+
+    def upload(self, name, content, **data):
+        return self.client.post(self.url, {"file": SimpleUploadedFile(name, content), **data})
+
+    def questions(self, exam=None):
+        return [
+            (q.order, q.text, q.mark, [(c.text, c.is_correct) for c in q.choices.order_by("id")])
+            for q in Question.objects.filter(exam=exam or self.exam).order_by("order")
+        ]
+
+    def test_csv_import_groups_rows_by_order(self):
+        content = (
+            "order,text,mark,choice,is_correct\n"
+            "1,Two plus two?,2,4,true\n"
+            "1,Two plus two?,2,5,\n"
+            "2,Sky colour?,1,Blue,yes\n"
+            "2,Sky colour?,1,Cyan,yes\n"
+        ).encode()
+        response = self.upload("q.csv", content)
+        self.assertRedirects(response, reverse("exams:exam_detail", args=[self.exam.pk]))
+
+        self.assertEqual(self.questions(), [
+            (1, "Two plus two?", 2, [("4", True), ("5", False)]),
+            # only the last correct choice is kept, as AnswerChoice.save() would
+            (2, "Sky colour?", 1, [("Blue", False), ("Cyan", True)]),
+        ])
+        self.exam.refresh_from_db()
+        self.assertEqual(self.exam.question_marks_total, 3)
+
+    def test_export_round_trips(self):
+        self.upload("q.jsonl", b'{"order": 1, "text": "Q", "mark": 2, "choices": [{"text": "A", "is_correct": true}]}\n')
+        other = Exam.objects.create(course=self.exam.course, title="Copy")
+
+        for fmt in ("jsonl", "csv"):
+            Question.objects.filter(exam=other).delete()
+            content = "".join(export_lines(self.exam, fmt)).encode()
+            self.client.post(
+                reverse("exams:exam_import", args=[other.pk]),
+                {"file": SimpleUploadedFile(f"q.{fmt}", content)},
+            )
+            self.assertEqual(self.questions(other), [(1, "Q", 2, [("A", True)])])
+
+    def test_replace_is_refused_once_the_exam_has_attempts(self):
+        line = b'{"order": 1, "text": "Q", "mark": 1, "choices": [{"text": "A", "is_correct": true}]}\n'
+        self.upload("q.jsonl", line)
+        question = self.exam.questions.get()
+        attempt = ExamAttempt.objects.create(user=User.objects.create_user("student"), exam=self.exam, full_mark=1)
+        AttemptAnswer.objects.create(attempt=attempt, question=question, is_correct=True, earned_mark=1)
+
+        response = self.upload("q.jsonl", line, replace="on")
+        self.assertIn("has 1 attempt(s)", response.context["form"].errors["file"][0])
+        self.assertEqual(attempt.answers.count(), 1)
+
+        with tempfile.NamedTemporaryFile(suffix=".jsonl") as fh:
+            fh.write(line)
+            fh.flush()
+            with self.assertRaisesMessage(CommandError, "would delete their answers"):
+                call_command("import_exam", self.exam.pk, fh.name, "--replace", stdout=io.StringIO())
+        self.assertEqual(self.questions(), [(1, "Q", 1, [("A", True)])])
+
+        attempt.delete()
+        self.upload("q.jsonl", line.replace(b'"Q"', b'"New"'), replace="on")
+        self.assertEqual(self.questions(), [(1, "New", 1, [("A", True)])])
+
+    def test_invalid_files_are_form_errors(self):
+        cases = [
+            ("q.csv", "order,text,mark,choice,is_correct\n1,Café,1,Oui,1\n".encode("latin-1"), "not UTF-8"),
+            ("q.csv", b"order,text,mark,choice,is_correct\n1,Q,1," + b"x" * 200_000 + b",1\n", "malformed CSV"),
+            ("q.csv", b"order,text\n1,Q\n", "Missing CSV column"),
+            ("q.jsonl", b'{"order": 1, "text": "Q", "mark": 99999}\n', "mark must be between"),
+            ("q.jsonl", b'{"order": 1, "text": "Q", "mark": 1}\n[1, 2]\n', "Line 2: expected a question object"),
+            ("q.jsonl", b'{"order": 1, "text": "Q", "mark": 1, "choices": [{"text": 5}]}\n', "choice text"),
+            ("q.jsonl", b"{not json\n", "Line 1: not valid JSON"),
+        ]
+        for name, content, error in cases:
+            with self.subTest(error):
+                response = self.upload(name, content)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn(error, response.context["form"].errors["file"][0])
+        self.assertEqual(self.questions(), [])
+
+
+class ProvisioningTests(TestCase):
+    def setUp(self):
+        course = Course.objects.create(name="Course", grade=1)
+        self.exam = Exam.objects.create(course=course, title="Exam")
+        Question.objects.create(exam=self.exam, text="Q", mark=3, order=1)
+        self.exam.refresh_from_db()
+        self.users = [User.objects.create_user(f"student{i}") for i in range(3)]
+        for user in self.users:
+            Enrollment.objects.create(user=user, course=course)
+        other_course = Course.objects.create(name="Other", grade=1)
+        Enrollment.objects.create(user=User.objects.create_user("elsewhere"), course=other_course)
+
+    def test_creates_one_unstarted_attempt_per_enrolled_user(self):
+        ExamAttempt.objects.create(user=self.users[0], exam=self.exam, full_mark=3)
+
+        self.assertEqual(provision_attempts(self.exam, batch_size=1), 2)
+        attempts = ExamAttempt.objects.filter(exam=self.exam, user__in=self.users[1:])
+        self.assertEqual(
+            sorted(attempts.values_list("user__username", "started_at", "full_mark")),
+            [("student1", None, 3), ("student2", None, 3)],
+        )
+        self.assertEqual(provision_attempts(self.exam), 0)
+
+    def test_rows_lost_to_a_concurrent_start_are_not_counted(self):
+        # student0 starts the exam between the user query and the insert
+        original = ExamAttempt.objects.bulk_create
+
+        def start_then_insert(objs, **kwargs):
+            ExamAttempt.objects.create(user=self.users[0], exam=self.exam, full_mark=3)
+            return original(objs, **kwargs)
+
+        with mock.patch.object(ExamAttempt.objects, "bulk_create", start_then_insert):
+            self.assertEqual(provision_attempts(self.exam), 2)
+        self.assertEqual(ExamAttempt.objects.filter(exam=self.exam).count(), 3)
+
+
+class LoadtestReportTests(SimpleTestCase):
+    def test_every_5xx_is_a_server_error(self):
+        stats = Stats()
+        for seconds, status in [(0.01, 200), (0.02, 302), (0.03, 500), (0.04, 503), (0.05, 404), (0.06, 0)]:
+            stats.record("attempt_submit", seconds, status)
+
+        row = stats.report(wall_time=2)["endpoints"]["attempt_submit"]
+        self.assertEqual(
+            (row["requests"], row["throughput_rps"], row["errors"], row["server_errors"]), (6, 3.0, 4, 2),
+        )
+        self.assertEqual((row["p50_ms"], row["p95_ms"], row["max_ms"]), (30.0, 60.0, 60.0))
+        self.assertIsNone(stats.report(wall_time=2)["endpoints"]["attempt_start"]["p50_ms"])
+
+
+class BulkGradingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.course = Course.objects.create(name="Course", grade=1)
+        self.user = User.objects.create_user("student", password="pw")
+        Enrollment.objects.create(user=self.user, course=self.course)
+        self.client.force_login(self.user)
+
+    def exam(self, size):
+        exam = Exam.objects.create(course=self.course, title=f"{size} questions")
+        choices = []
+        for order in range(1, size + 1):
+            question = Question.objects.create(exam=exam, text=f"Q{order}", mark=order, order=order)
+            choices.append((
+                AnswerChoice.objects.create(question=question, text="right", is_correct=True),
+                AnswerChoice.objects.create(question=question, text="wrong"),
+            ))
+        attempt = ExamAttempt.objects.create(user=self.user, exam=exam, full_mark=exam.question_marks_total)
+        return attempt, choices
+
+    def post(self, attempt, choices):
+        url = reverse("exams:attempt_take", args=[attempt.pk])
+        return self.client.post(url, {f"q_{choice.question_id}": choice.pk for choice in choices})
+
+    def test_whole_form_is_graded_and_upserted(self):
+        attempt, choices = self.exam(3)
+        self.post(attempt, [choices[0][0], choices[1][1], choices[2][0]])
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.user_mark, 1 + 3)
+        self.assertEqual(
+            sorted(attempt.answers.values_list("question__order", "is_correct", "earned_mark")),
+            [(1, True, 1), (2, False, 0), (3, True, 3)],
+        )
+
+        # posting again updates the same rows
+        self.post(attempt, [choices[1][0]])
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.user_mark, 2)
+        self.assertEqual(attempt.answers.count(), 3)
+        self.assertEqual(attempt.answers.filter(selected_choice__isnull=True).count(), 2)
+
+    def test_query_count_does_not_grow_with_the_exam(self):
+        counts = []
+        for size in (2, 12):
+            attempt, choices = self.exam(size)
+            self.post(attempt, [right for right, _ in choices])  # warms the compiled exam cache
+            with CaptureQueriesContext(connection) as queries:
+                self.post(attempt, [wrong for _, wrong in choices])
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_a_foreign_choice_saves_nothing(self):
+        attempt, choices = self.exam(2)
+        # a valid answer to question 1, and question 1's choice posted for question 2
+        response = self.client.post(reverse("exams:attempt_take", args=[attempt.pk]), {
+            f"q_{choices[0][0].question_id}": choices[0][0].pk,
+            f"q_{choices[1][0].question_id}": choices[0][1].pk,
+        })
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(attempt.answers.exists())
+
+
+class CompiledExamTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.exam = Exam.objects.create(course=Course.objects.create(name="Course", grade=1), title="Exam")
+        self.question = Question.objects.create(exam=self.exam, text="2 + 2?", mark=2, order=1)
+        self.four = AnswerChoice.objects.create(question=self.question, text="4", is_correct=True)
+        self.five = AnswerChoice.objects.create(question=self.question, text="5")
+
+    def compiled(self):
+        self.exam.refresh_from_db()
+        return get_compiled_exam(self.exam)
+
+    def test_built_once_per_version(self):
+        compiled = self.compiled()
+        self.assertEqual(compiled.question_ids, (self.question.pk,))
+        self.assertEqual(compiled.choices[self.question.pk], {self.four.pk: True, self.five.pk: False})
+        self.assertEqual((compiled.correct[self.question.pk], compiled.full_mark), (self.four.pk, 2))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_compiled_exam(self.exam).choices, compiled.choices)
+
+    def test_content_changes_bump_the_version(self):
+        versions = [self.compiled().version]
+
+        self.five.is_correct = True
+        self.five.save()
+        compiled = self.compiled()
+        versions.append(compiled.version)
+        # only one correct choice, as on the stored rows
+        self.assertEqual(compiled.choices[self.question.pk], {self.four.pk: False, self.five.pk: True})
+
+        self.question.mark = 5
+        self.question.save()
+        versions.append(self.compiled().version)
+        self.assertEqual(self.compiled().full_mark, 5)
+
+        self.four.delete()
+        versions.append(self.compiled().version)
+        self.assertEqual(self.compiled().choices[self.question.pk], {self.five.pk: True})
+
+        self.assertEqual(versions, sorted(set(versions)))
+
+
+class QuestionMarksTotalTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.course = Course.objects.create(name="Course", grade=1)
+        self.exam = Exam.objects.create(course=self.course, title="Exam")
+
+    def total(self):
+        self.exam.refresh_from_db()
+        return self.exam.question_marks_total
+
+    def test_question_writes_keep_the_total(self):
+        first = Question.objects.create(exam=self.exam, text="Q1", mark=2, order=1)
+        second = Question.objects.create(exam=self.exam, text="Q2", mark=3, order=2)
+        self.assertEqual(self.total(), 5)
+
+        second.mark = 10
+        second.save()
+        self.assertEqual(self.total(), 12)
+
+        first.delete()
+        self.assertEqual(self.total(), 10)
+
+    def test_queryset_and_cascaded_deletes_keep_the_total(self):
+        for order, mark in enumerate((2, 5, 7), start=1):
+            Question.objects.create(exam=self.exam, text=f"Q{order}", mark=mark, order=order)
+
+        Question.objects.filter(exam=self.exam, mark__gt=3).delete()
+        self.assertEqual(self.total(), 2)
+
+        self.client.force_login(User.objects.create_user("admin", is_staff=True, is_superuser=True))
+        self.client.post(reverse("admin:exams_question_changelist"), {
+            "action": "delete_selected",
+            "_selected_action": list(self.exam.questions.values_list("pk", flat=True)),
+            "post": "yes",
+        })
+        self.assertEqual(self.total(), 0)
+
+    def test_start_and_list_read_the_stored_total(self):
+        Question.objects.create(exam=self.exam, text="Q1", mark=4, order=1)
+        user = User.objects.create_user("student")
+        Enrollment.objects.create(user=user, course=self.course)
+        self.client.force_login(user)
+
+        self.client.get(reverse("exams:attempt_start", args=[self.exam.pk]))
+        self.assertEqual(ExamAttempt.objects.get(user=user).full_mark, 4)
+
+        # session, user, then the exams with their totals in one query
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("exams:exam_list"))
+        self.assertContains(response, "total marks 4")
+
+    def test_rebuild_command_repairs_drift(self):
+        Question.objects.create(exam=self.exam, text="Q1", mark=4, order=1)
+        Exam.objects.filter(pk=self.exam.pk).update(question_marks_total=99)
+
+        call_command("rebuild_exam_totals", stdout=io.StringIO())
+        self.assertEqual(self.total(), 4)
+
+
+class AsyncViewTests(TestCase):
+    """The async exam-taking views, called directly whichever set exams/urls.py wires."""
+
+    def setUp(self):
+        cache.clear()
+        course = Course.objects.create(name="Course", grade=1)
+        self.exam = Exam.objects.create(course=course, title="Exam")
+        self.right = []
+        for order in (1, 2):
+            question = Question.objects.create(exam=self.exam, text=f"Question {order}", mark=order, order=order)
+            self.right.append(AnswerChoice.objects.create(question=question, text="right", is_correct=True))
+            AnswerChoice.objects.create(question=question, text="wrong")
+        self.user = User.objects.create_user("student")
+        Enrollment.objects.create(user=self.user, course=course)
+        self.factory = AsyncRequestFactory()
+
+    def request(self, method, data=None, user=None, **headers):
+        request = getattr(self.factory, method)("/", data or {}, headers=headers)
+        request.user = user or self.user
+
+        async def auser():
+            return request.user
+        request.auser = auser
+        return request
+
+    async def test_start_take_submit_and_result(self):
+        response = await async_views.StartExamAttemptView.as_view()(self.request("get"), exam_id=self.exam.pk)
+        attempt = await ExamAttempt.objects.aget(user=self.user, exam=self.exam)
+        self.assertEqual((response.status_code, response.url), (302, reverse("exams:attempt_take", args=[attempt.pk])))
+        self.assertEqual(attempt.full_mark, 3)
+
+        take = async_views.TakeExamView.as_view()
+        response = await take(self.request("get"), attempt_id=attempt.pk)
+        self.assertContains(response, "Question 2")
+
+        answers = {f"q_{self.right[1].question_id}": self.right[1].pk}
+        response = await take(self.request("post", answers), attempt_id=attempt.pk)
+        self.assertEqual(response.status_code, 302)
+
+        response = await async_views.SubmitAttemptView.as_view()(self.request("post"), attempt_id=attempt.pk)
+        self.assertEqual(response.url, reverse("exams:attempt_result", args=[attempt.pk]))
+        attempt = await ExamAttempt.objects.aget(pk=attempt.pk)
+        self.assertEqual((attempt.status, attempt.user_mark), (ExamAttempt.Status.SUBMITTED, 2))
+        self.assertEqual([q["earned"] for q in attempt.result["questions"]], [0, 2])
+
+        result = async_views.AttemptResultView.as_view()
+        response = await result(self.request("get"), attempt_id=attempt.pk)
+        self.assertContains(response, "Score: 2 / 3")
+        response = await result(self.request("get", if_none_match=response["ETag"]), attempt_id=attempt.pk)
+        self.assertEqual(response.status_code, 304)
+
+    async def test_access_checks(self):
+        response = await async_views.StartExamAttemptView.as_view()(
+            self.request("get", user=AnonymousUser()), exam_id=self.exam.pk,
+        )
+        self.assertTrue(response.url.startswith(reverse("login")))
+
+        outsider = await User.objects.acreate(username="outsider")
+        with self.assertRaises(PermissionDenied):
+            await async_views.StartExamAttemptView.as_view()(self.request("get", user=outsider), exam_id=self.exam.pk)
+
+
+class ExamAuthoringPageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.exam = Exam.objects.create(course=Course.objects.create(name="Course", grade=1), title="Exam")
+        self.url = reverse("exams:exam_detail", args=[self.exam.pk])
+        self.client.force_login(User.objects.create_user("staff", is_staff=True))
+
+    def add_questions(self, count):
+        start = self.exam.questions.count()
+        for order in range(start + 1, start + count + 1):
+            question = Question.objects.create(exam=self.exam, text=f"Question {order}", mark=1, order=order)
+            AnswerChoice.objects.create(question=question, text=f"Choice {order}", is_correct=True)
+
+    def queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        return len(queries), response
+
+    def test_questions_are_prefetched_and_the_fragment_cached(self):
+        self.add_questions(2)
+        cold, _ = self.queries()
+        warm, response = self.queries()
+        # the cached fragment skips the question and choice queries
+        self.assertEqual(warm, cold - 2)
+        self.assertContains(response, "Choice 2")
+
+        self.add_questions(8)
+        cold_again, response = self.queries()
+        self.assertEqual(cold_again, cold)
+        self.assertContains(response, "Choice 10")
+
+    def test_edits_refresh_the_fragment(self):
+        self.add_questions(1)
+        self.queries()
+        choice = AnswerChoice.objects.get(text="Choice 1")
+        choice.text = "Edited choice"
+        choice.save()
+
+        _, response = self.queries()
+        self.assertContains(response, "Edited choice")
+        self.assertNotContains(response, "Choice 1")
+
+
+class ResultSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        course = Course.objects.create(name="Course", grade=1)
+        self.exam = Exam.objects.create(course=course, title="Exam")
+        self.question = Question.objects.create(exam=self.exam, text="Capital of France?", mark=2, order=1)
+        self.right = AnswerChoice.objects.create(question=self.question, text="Paris", is_correct=True)
+        AnswerChoice.objects.create(question=self.question, text="Lyon")
+
+        self.user = User.objects.create_user("student")
+        Enrollment.objects.create(user=self.user, course=course)
+        self.client.force_login(self.user)
+        self.attempt = ExamAttempt.objects.create(user=self.user, exam=self.exam, full_mark=2)
+        self.url = reverse("exams:attempt_result", args=[self.attempt.pk])
+
+    def submit(self, attempt):
+        AttemptAnswer.objects.create(
+            attempt=attempt, question=self.question, selected_choice=self.right, is_correct=True, earned_mark=2,
+        )
+        self.exam.refresh_from_db()
+        submit_attempt(attempt, get_compiled_exam(self.exam))
+
+    def test_result_is_frozen_at_submit(self):
+        self.submit(self.attempt)
+        self.question.text = "Edited afterwards"
+        self.question.save()
+
+        response = self.client.get(self.url)
+        self.assertContains(response, "Capital of France?")
+        self.assertNotContains(response, "Edited afterwards")
+
+    def test_etag_until_the_standing_changes(self):
+        self.submit(self.attempt)
+        # the first view sets the CSRF cookie, which is part of the tag
+        self.client.get(self.url)
+        response = self.client.get(self.url)
+        etag = response["ETag"]
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+
+        # session, user, attempt and standing: nothing else is read for a 304
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+        # another submission moves this attempt's standing
+        self.submit(ExamAttempt.objects.create(user=User.objects.create_user("other"), exam=self.exam, full_mark=2))
+        response = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_attempts_without_a_snapshot_get_one_on_first_view(self):
+        ExamAttempt.objects.filter(pk=self.attempt.pk).update(
+            status=ExamAttempt.Status.SUBMITTED, submitted_at=timezone.now(),
+        )
+        response = self.client.get(self.url)
+        self.assertContains(response, "Capital of France?")
+        self.attempt.refresh_from_db()
+        self.assertEqual(self.attempt.result["questions"][0]["correct"], "Paris")
+
+
+class ItemAnalysisTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.exam = Exam.objects.create(course=Course.objects.create(name="Course", grade=1), title="Exam")
+        self.questions = []
+        for order in (1, 2):
+            question = Question.objects.create(exam=self.exam, text=f"Q{order}", mark=1, order=order)
+            right = AnswerChoice.objects.create(question=question, text="right", is_correct=True)
+            wrong = AnswerChoice.objects.create(question=question, text="wrong")
+            self.questions.append((question, right, wrong))
+
+    def submit(self, *picks):
+        """One submitted attempt; picks are True (right), False (wrong) or None (unanswered) per question."""
+        attempt = ExamAttempt.objects.create(
+            user=User.objects.create_user(f"student{ExamAttempt.objects.count()}"), exam=self.exam, full_mark=2,
+            status=ExamAttempt.Status.SUBMITTED, submitted_at=timezone.now() - timedelta(minutes=1),
+            user_mark=sum(pick is True for pick in picks),
+        )
+        for (question, right, wrong), pick in zip(self.questions, picks):
+            if pick is not None:
+                AttemptAnswer.objects.create(
+                    attempt=attempt, question=question, selected_choice=right if pick else wrong,
+                    is_correct=pick, earned_mark=int(pick),
+                )
+
+    def test_difficulty_and_point_biserial_discrimination(self):
+        picks = [(True, True), (True, False), (False, None), (True, False)]
+        for pick in picks:
+            self.submit(*pick)
+
+        analysis = item_analysis(self.exam, update_statistics(self.exam))
+        scores = [sum(p is True for p in pick) for pick in picks]
+        self.assertEqual((analysis["attempts"], analysis["mean"], analysis["histogram"]), (4, 1.0, [(0, 1), (1, 2), (2, 1)]))
+        self.assertAlmostEqual(analysis["std"], float(np.std(scores)), places=3)
+
+        for i, question in enumerate(analysis["questions"]):
+            correct = [pick[i] is True for pick in picks]
+            self.assertEqual(question["difficulty"], sum(correct) / len(picks))
+            self.assertAlmostEqual(question["discrimination"], np.corrcoef(correct, scores)[0, 1], places=3)
+
+        second = analysis["questions"][1]
+        self.assertEqual([c["count"] for c in second["choices"]], [1, 2])
+        self.assertEqual(second["unanswered"], 1)
+
+    def test_later_runs_fold_in_only_new_attempts(self):
+        self.submit(True, True)
+        # the first run happened half an hour ago, before the next attempts
+        ExamAttempt.objects.update(submitted_at=timezone.now() - timedelta(hours=1))
+        with mock.patch("exams.analytics.timezone.now", return_value=timezone.now() - timedelta(minutes=30)):
+            update_statistics(self.exam)
+        self.submit(False, True)
+        self.submit(False, False)
+
+        incremental = update_statistics(self.exam)
+        full = update_statistics(self.exam, full=True)
+        self.assertEqual(incremental.state, full.state)
+        self.assertEqual(incremental.attempts, 3)
+
+    def test_statistics_page(self):
+        self.submit(True, False)
+        self.client.force_login(User.objects.create_user("staff", is_staff=True))
+        response = self.client.get(reverse("exams:exam_stats", args=[self.exam.pk]))
+        self.assertEqual(response.context["analysis"]["questions"][0]["difficulty"], 1.0)
+
+
+class QuestionReorderTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.exam = Exam.objects.create(course=Course.objects.create(name="Course", grade=1), title="Quiz")
+        self.questions = [
+            Question.objects.create(exam=self.exam, text=f"Question about {topic}", mark=1, order=order)
+            for order, topic in enumerate(["cells", "atoms"], start=1)
+        ]
+        self.client.force_login(User.objects.create_user("staff", is_staff=True))
+
+    def test_reorder_bumps_the_version_and_reindexes(self):
+        version = Exam.objects.get(pk=self.exam.pk).content_version
+        response = self.client.post(
+            reverse("exams:question_reorder", args=[self.exam.pk]),
+            json.dumps({"order": [self.questions[1].pk, self.questions[0].pk]}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.json()["updated"], 2)
+
+        exam = Exam.objects.get(pk=self.exam.pk)
+        self.assertGreater(exam.content_version, version)
+        self.assertEqual([q.text for q in get_compiled_exam(exam).questions], [
+            "Question about atoms", "Question about cells",
+        ])
+        self.assertEqual(search("atoms")[0]["title"], "Quiz — Q1")
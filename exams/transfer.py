@@ -0,0 +1,236 @@
+"""
+Streaming import/export of exam content (questions with their choices).
+
+Two formats are supported:
+
+  jsonl  one question per line:
+         {"order": 1, "text": "...", "mark": 2,
+          "choices": [{"text": "...", "is_correct": true}, ...]}
+
+  csv    one row per choice, with the question columns repeated:
+         order,text,mark,choice,is_correct
+         Consecutive rows with the same order belong to the same question.
+
+Imports go through bulk_create in chunks instead of Question.save() /
+AnswerChoice.save(), so the single-correct-choice rule, the marks total and
+the content version are applied once, set-based, at the end, and each chunk
+is added to the search index directly.
+"""
+import csv
+import io
+import json
+from functools import wraps
+from itertools import groupby
+
+from django.db import models, transaction
+from django.db.backends.base.operations import BaseDatabaseOperations
+
+from search.documents import index_questions
+
+from .csvstream import Echo
+from .models import Exam, Question, AnswerChoice
+
+FORMATS = ("jsonl", "csv")
+CSV_FIELDS = ["order", "text", "mark", "choice", "is_correct"]
+CHUNK_SIZE = 500
+TRUE_VALUES = {"1", "true", "yes", "y", "x"}
+
+
+class ExamImportError(ValueError):
+    pass
+
+
+def guess_format(filename):
+    return "csv" if filename.lower().endswith(".csv") else "jsonl"
+
+
+def text_stream(fh):
+    """Text view of an uploaded or opened-in-binary file, read line by line."""
+    if isinstance(fh, io.TextIOBase):
+        return fh
+    return io.TextIOWrapper(fh, encoding="utf-8-sig", newline="")
+
+
+def _integer(line, name, value):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ExamImportError(f"Line {line}: {name} must be an integer.")
+    # the portable range, so a file valid on SQLite also fits PostgreSQL
+    low, high = BaseDatabaseOperations.integer_field_ranges[Question._meta.get_field(name).get_internal_type()]
+    if not low <= value <= high:
+        raise ExamImportError(f"Line {line}: {name} must be between {low} and {high}.")
+    return value
+
+
+def _question(line, order, text, mark, choices):
+    order = _integer(line, "order", order)
+    mark = _integer(line, "mark", mark)
+    if not text or not isinstance(text, str):
+        raise ExamImportError(f"Line {line}: question text is required.")
+
+    max_length = AnswerChoice._meta.get_field("text").max_length
+    for choice_text, _ in choices:
+        if not isinstance(choice_text, str) or not 1 <= len(choice_text) <= max_length:
+            raise ExamImportError(f"Line {line}: choice text must be 1-{max_length} characters.")
+
+    return {"order": order, "text": text, "mark": mark, "choices": choices}
+
+
+def _readable(reader):
+    """Report undecodable uploads as ExamImportError instead of letting them escape."""
+    @wraps(reader)
+    def read(fh):
+        try:
+            yield from reader(fh)
+        except UnicodeDecodeError:
+            raise ExamImportError("The file is not UTF-8 encoded.")
+    return read
+
+
+@_readable
+def read_jsonl(fh):
+    for line, raw in enumerate(text_stream(fh), start=1):
+        if not raw.strip():
+            continue
+        try:
+            row = json.loads(raw)
+        except ValueError:
+            raise ExamImportError(f"Line {line}: not valid JSON.")
+        if not isinstance(row, dict) or not isinstance(row.get("choices", []), list):
+            raise ExamImportError(f"Line {line}: expected a question object.")
+        try:
+            choices = [(c["text"], bool(c.get("is_correct"))) for c in row.get("choices", [])]
+        except (KeyError, TypeError, AttributeError):
+            raise ExamImportError(f"Line {line}: every choice needs a text.")
+        yield _question(line, row.get("order"), row.get("text"), row.get("mark"), choices)
+
+
+@_readable
+def read_csv(fh):
+    reader = csv.DictReader(text_stream(fh))
+    try:
+        missing = set(CSV_FIELDS) - set(reader.fieldnames or ())
+        if missing:
+            raise ExamImportError(f"Missing CSV column(s): {', '.join(sorted(missing))}.")
+
+        numbered = ((reader.line_num, row) for row in reader)
+        for _, rows in groupby(numbered, key=lambda item: item[1]["order"]):
+            rows = list(rows)
+            line, first = rows[0]
+            choices = [
+                (row["choice"], (row["is_correct"] or "").strip().lower() in TRUE_VALUES)
+                for _, row in rows if row["choice"]
+            ]
+            yield _question(line, first["order"], first["text"], first["mark"], choices)
+    except csv.Error as exc:
+        raise ExamImportError(f"Line {reader.line_num}: malformed CSV ({exc}).")
+
+
+def import_questions(exam, fh, fmt="jsonl", replace=False, chunk_size=CHUNK_SIZE):
+    """
+    Stream questions from ``fh`` into ``exam``. With ``replace`` the existing
+    questions are deleted first, which is refused once the exam has attempts:
+    the delete would cascade to their answers. Returns (questions, choices)
+    created.
+    """
+    reader = read_csv if fmt == "csv" else read_jsonl
+    questions_created = choices_created = 0
+
+    with transaction.atomic():
+        if replace:
+            attempts = exam.attempts.count()
+            if attempts:
+                raise ExamImportError(
+                    f"{exam} has {attempts} attempt(s); replacing its questions would delete their answers. "
+                    "Import without replacing, or into a new exam."
+                )
+            exam.questions.all().delete()
+
+        chunk = []
+        for question in reader(fh):
+            chunk.append(question)
+            if len(chunk) >= chunk_size:
+                questions_created += len(chunk)
+                choices_created += _insert(exam, chunk, chunk_size)
+                chunk = []
+        if chunk:
+            questions_created += len(chunk)
+            choices_created += _insert(exam, chunk, chunk_size)
+
+        enforce_single_correct(exam)
+        Exam.refresh_question_marks_total(exam.pk)
+        Exam.bump_content_version(pk=exam.pk)
+
+    return questions_created, choices_created
+
+
+def _insert(exam, rows, chunk_size):
+    questions = Question.objects.bulk_create(
+        [Question(exam=exam, text=row["text"], mark=row["mark"], order=row["order"]) for row in rows],
+        batch_size=chunk_size,
+    )
+    choices = [
+        AnswerChoice(question_id=question.pk, text=text, is_correct=is_correct)
+        for question, row in zip(questions, rows)
+        for text, is_correct in row["choices"]
+    ]
+    AnswerChoice.objects.bulk_create(choices, batch_size=chunk_size)
+    # bulk_create sends no post_save, so the search index is fed here
+    index_questions(Question.objects.filter(pk__in=[question.pk for question in questions]))
+    return len(choices)
+
+
+def enforce_single_correct(exam):
+    """Keep only the last correct choice of each question, as AnswerChoice.save() would."""
+    last_correct = (
+        AnswerChoice.objects
+        .filter(question_id=models.OuterRef("question_id"), is_correct=True)
+        .order_by("-id")
+        .values("id")[:1]
+    )
+    return (
+        AnswerChoice.objects
+        .filter(question__exam=exam, is_correct=True)
+        .exclude(id=models.Subquery(last_correct))
+        .update(is_correct=False)
+    )
+
+
+def export_rows(exam, chunk_size=CHUNK_SIZE):
+    """Yield the exam's questions as import-format dicts, one query streamed in chunks."""
+    rows = (
+        Question.objects
+        .filter(exam=exam)
+        .order_by("order", "id", "choices__id")
+        .values_list("id", "order", "text", "mark", "choices__text", "choices__is_correct")
+        .iterator(chunk_size=chunk_size)
+    )
+    for _, group in groupby(rows, key=lambda row: row[0]):
+        group = list(group)
+        _, order, text, mark, _, _ = group[0]
+        yield {
+            "order": order,
+            "text": text,
+            "mark": mark,
+            "choices": [
+                {"text": choice, "is_correct": is_correct}
+                for *_, choice, is_correct in group if choice is not None
+            ],
+        }
+
+
+def export_lines(exam, fmt="jsonl", chunk_size=CHUNK_SIZE):
+    """Yield the export as text chunks, for a file or a StreamingHttpResponse."""
+    if fmt == "csv":
+        writer = csv.writer(Echo())
+        yield writer.writerow(CSV_FIELDS)
+        for question in export_rows(exam, chunk_size):
+            head = [question["order"], question["text"], question["mark"]]
+            if not question["choices"]:
+                yield writer.writerow(head + ["", ""])
+            for choice in question["choices"]:
+                yield writer.writerow(head + [choice["text"], "true" if choice["is_correct"] else "false"])
+    else:
+        for question in export_rows(exam, chunk_size):
+            yield json.dumps(question, ensure_ascii=False) + "\n"
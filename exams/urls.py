@@ -1,10 +1,16 @@
+from django.conf import settings
 from django.urls import path
+
+from . import async_views, views
 from .views import (
     ExamListView, ExamCreateView, ExamDetailView, ExamUpdateView, ExamDeleteView,
-    QuestionCreateView, QuestionUpdateView, QuestionDeleteView, ChoiceCreateView, ChoiceUpdateView, ChoiceDeleteView,
-    StartExamAttemptView, TakeExamView, SubmitAttemptView, AttemptResultView
+    QuestionCreateView, QuestionUpdateView, QuestionDeleteView, QuestionReorderView, ChoiceCreateView, ChoiceUpdateView, ChoiceDeleteView,
+    AutosaveAnswerView, ExamStatisticsView, ExamLeaderboardView, ExamImportView, ExamExportView,
+    ExamGradebookView, CourseGradebookView,
 )
 
+attempt_views = async_views if settings.EXAMS_ASYNC_VIEWS else views
+
 app_name = "exams"
 
 urlpatterns = [
@@ -13,9 +19,16 @@ urlpatterns = [
     path("<int:pk>/", ExamDetailView.as_view(), name="exam_detail"),
     path("<int:pk>/edit/", ExamUpdateView.as_view(), name="exam_update"),
     path("<int:pk>/delete/", ExamDeleteView.as_view(), name="exam_delete"),
+    path("<int:pk>/stats/", ExamStatisticsView.as_view(), name="exam_stats"),
+    path("<int:pk>/leaderboard/", ExamLeaderboardView.as_view(), name="exam_leaderboard"),
+    path("<int:pk>/import/", ExamImportView.as_view(), name="exam_import"),
+    path("<int:pk>/export/", ExamExportView.as_view(), name="exam_export"),
+    path("<int:pk>/gradebook/", ExamGradebookView.as_view(), name="exam_gradebook"),
+    path("courses/<int:course_id>/gradebook/", CourseGradebookView.as_view(), name="course_gradebook"),
 
     # Questions
     path("<int:exam_id>/questions/create/", QuestionCreateView.as_view(), name="question_create"),
+    path("<int:exam_id>/questions/reorder/", QuestionReorderView.as_view(), name="question_reorder"),
     path("questions/<int:pk>/edit/", QuestionUpdateView.as_view(), name="question_update"),
     path("questions/<int:pk>/delete/", QuestionDeleteView.as_view(), name="question_delete"),
 
@@ -24,8 +37,9 @@ urlpatterns = [
     path("choices/<int:pk>/edit/", ChoiceUpdateView.as_view(), name="choice_update"),
     path("choices/<int:pk>/delete/", ChoiceDeleteView.as_view(), name="choice_delete"),
 
-    path("<int:exam_id>/start/",StartExamAttemptView.as_view(),name="attempt_start",),
-    path("attempts/<int:attempt_id>/take/",TakeExamView.as_view(),name="attempt_take",),
-    path("attempt/<int:attempt_id>/submit/", SubmitAttemptView.as_view(), name="attempt_submit"),
-    path("attempt/<int:attempt_id>/result/", AttemptResultView.as_view(), name="attempt_result"),
+    path("<int:exam_id>/start/",attempt_views.StartExamAttemptView.as_view(),name="attempt_start",),
+    path("attempts/<int:attempt_id>/take/",attempt_views.TakeExamView.as_view(),name="attempt_take",),
+    path("attempts/<int:attempt_id>/answer/", AutosaveAnswerView.as_view(), name="attempt_answer"),
+    path("attempt/<int:attempt_id>/submit/", attempt_views.SubmitAttemptView.as_view(), name="attempt_submit"),
+    path("attempt/<int:attempt_id>/result/", attempt_views.AttemptResultView.as_view(), name="attempt_result"),
 ]
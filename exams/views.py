@@ -1,27 +1,50 @@
+import hashlib
+
+from django.conf import settings
 from django.db import transaction
-from django.db.models import Sum
+from django.db.models import Count, F
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.urls import reverse_lazy
-from django.utils import timezone
+from django.urls import reverse, reverse_lazy
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 from django.views import View
-from django.views.generic import ListView, CreateView, UpdateView, DeleteView, DetailView
+from django.views.generic import ListView, CreateView, UpdateView, DeleteView, DetailView, FormView
 from django.contrib.auth.mixins import LoginRequiredMixin
 
-from .models import Exam, Question, AnswerChoice, ExamAttempt, AttemptAnswer
-from .forms import ExamForm, QuestionForm, ChoiceForm
+from courses.models import Course
+from courses.pagination import KeysetPaginationMixin
+from courses.reorder import ReorderView
+from enrollments.access import EnrollmentRequiredMixin, StaffRequiredMixin
+from search.documents import index_questions
+
+from .models import Exam, Question, AnswerChoice, ExamAttempt
+from .forms import ExamForm, QuestionForm, ChoiceForm, ExamImportForm
+from . import ranking
+from .analytics import item_analysis, update_statistics
+from .compiled import get_compiled_exam, get_compiled_page
+from .gradebook import gradebook_lines
+from .deadlines import GRACE, seconds_left, start_clock, time_is_up
+from .grading import grade_answers, parse_choice, save_answer, store_result, submit_attempt
+from .transfer import FORMATS, ExamImportError, export_lines, guess_format, import_questions
 
 
-class ExamListView(ListView):
+class ExamListView(EnrollmentRequiredMixin, KeysetPaginationMixin, ListView):
     model = Exam
+    read_replica = True
     template_name = "exams/exam_list.html"
     context_object_name = "exams"
-    ordering = ["-id"]
+    keyset_fields = ("-id",)
 
     def get_queryset(self):
-        return Exam.objects.select_related("course").all().order_by("-id")
+        return self.limit_to_enrolled(
+            Exam.objects
+            .select_related("course")
+            .annotate(questions_count=Count("questions"))
+        )
 
 
-class ExamCreateView(CreateView):
+class ExamCreateView(StaffRequiredMixin, CreateView):
     model = Exam
     form_class = ExamForm
     template_name = "exams/exam_form.html"
@@ -35,7 +58,7 @@ class ExamCreateView(CreateView):
         return reverse_lazy("exams:exam_detail", kwargs={"pk": self.object.pk})
 
 
-class ExamUpdateView(UpdateView):
+class ExamUpdateView(StaffRequiredMixin, UpdateView):
     model = Exam
     form_class = ExamForm
     template_name = "exams/exam_form.html"
@@ -50,13 +73,13 @@ class ExamUpdateView(UpdateView):
         return reverse_lazy("exams:exam_detail", kwargs={"pk": self.object.pk})
 
 
-class ExamDeleteView(DeleteView):
+class ExamDeleteView(StaffRequiredMixin, DeleteView):
     model = Exam
     template_name = "exams/exam_confirm_delete.html"
     success_url = reverse_lazy("exams:exam_list")
 
 
-class ExamDetailView(DetailView):
+class ExamDetailView(EnrollmentRequiredMixin, DetailView):
     model = Exam
     template_name = "exams/exam_detail.html"
     context_object_name = "exam"
@@ -64,8 +87,116 @@ class ExamDetailView(DetailView):
     def get_queryset(self):
         return Exam.objects.select_related("course")
 
+    def get_object(self, queryset=None):
+        exam = super().get_object(queryset)
+        self.check_enrollment(exam.course_id)
+        return exam
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        if self.request.user.is_staff:
+            # lazy: only evaluated (2 queries) when the cached fragment is missing
+            ctx["questions"] = self.object.questions.prefetch_related("choices")
+        else:
+            # students must not see the choices (and which one is correct)
+            ctx["question_count"] = self.object.questions.count()
+        return ctx
+
+
+class ExamStatisticsView(StaffRequiredMixin, DetailView):
+    model = Exam
+    template_name = "exams/exam_stats.html"
+    context_object_name = "exam"
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        # only attempts submitted since the last run are read
+        stats = update_statistics(self.object)
+        ctx["stats"] = stats
+        ctx["analysis"] = item_analysis(self.object, stats)
+        return ctx
+
+
+class ExamLeaderboardView(EnrollmentRequiredMixin, DetailView):
+    model = Exam
+    read_replica = True
+    template_name = "exams/exam_leaderboard.html"
+    context_object_name = "exam"
+
+    def get_object(self, queryset=None):
+        exam = super().get_object(queryset)
+        self.check_enrollment(exam.course_id)
+        return exam
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        try:
+            size = int(self.request.GET.get("size", ranking.LEADERBOARD_SIZE))
+        except ValueError:
+            size = ranking.LEADERBOARD_SIZE
+        ctx["leaders"] = ranking.leaderboard(self.object.pk, max(1, min(size, ranking.MAX_LEADERBOARD_SIZE)))
+        ctx["ranked"] = ranking.ranked_count(self.object.pk)
+        return ctx
+
+
+class ExamImportView(StaffRequiredMixin, FormView):
+    form_class = ExamImportForm
+    template_name = "exams/exam_import.html"
 
-class QuestionCreateView(CreateView):
+    def dispatch(self, request, *args, **kwargs):
+        self.exam = get_object_or_404(Exam, pk=self.kwargs["pk"])
+        return super().dispatch(request, *args, **kwargs)
+
+    def form_valid(self, form):
+        upload = form.cleaned_data["file"]
+        fmt = form.cleaned_data["format"] or guess_format(upload.name)
+        try:
+            import_questions(self.exam, upload.file, fmt, replace=form.cleaned_data["replace"])
+        except ExamImportError as exc:
+            form.add_error("file", str(exc))
+            return self.form_invalid(form)
+        return super().form_valid(form)
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        ctx["exam"] = self.exam
+        return ctx
+
+    def get_success_url(self):
+        return reverse_lazy("exams:exam_detail", kwargs={"pk": self.exam.pk})
+
+
+class ExamExportView(StaffRequiredMixin, View):
+    def get(self, request, pk):
+        exam = get_object_or_404(Exam, pk=pk)
+        fmt = request.GET.get("format")
+        if fmt not in FORMATS:
+            fmt = "jsonl"
+
+        content_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+        response = StreamingHttpResponse(export_lines(exam, fmt), content_type=f"{content_type}; charset=utf-8")
+        response["Content-Disposition"] = f'attachment; filename="exam-{exam.pk}.{fmt}"'
+        return response
+
+
+class ExamGradebookView(StaffRequiredMixin, View):
+    def get(self, request, pk):
+        exam = get_object_or_404(Exam, pk=pk)
+        lines = gradebook_lines(exam=exam, questions=request.GET.get("questions") == "1")
+        response = StreamingHttpResponse(lines, content_type="text/csv; charset=utf-8")
+        response["Content-Disposition"] = f'attachment; filename="gradebook-exam-{exam.pk}.csv"'
+        return response
+
+
+class CourseGradebookView(StaffRequiredMixin, View):
+    def get(self, request, course_id):
+        course = get_object_or_404(Course, pk=course_id)
+        response = StreamingHttpResponse(gradebook_lines(course=course), content_type="text/csv; charset=utf-8")
+        response["Content-Disposition"] = f'attachment; filename="gradebook-course-{course.pk}.csv"'
+        return response
+
+
+class QuestionCreateView(StaffRequiredMixin, CreateView):
     model = Question
     form_class = QuestionForm
     template_name = "exams/question_form.html"
@@ -88,7 +219,7 @@ class QuestionCreateView(CreateView):
         return reverse_lazy("exams:exam_detail", kwargs={"pk": self.exam.pk})
 
 
-class QuestionUpdateView(UpdateView):
+class QuestionUpdateView(StaffRequiredMixin, UpdateView):
     model = Question
     form_class = QuestionForm
     template_name = "exams/question_form.html"
@@ -103,7 +234,7 @@ class QuestionUpdateView(UpdateView):
         return reverse_lazy("exams:exam_detail", kwargs={"pk": self.object.exam.pk})
 
 
-class QuestionDeleteView(DeleteView):
+class QuestionDeleteView(StaffRequiredMixin, DeleteView):
     model = Question
     template_name = "exams/question_confirm_delete.html"
 
@@ -111,7 +242,19 @@ class QuestionDeleteView(DeleteView):
         return reverse_lazy("exams:exam_detail", kwargs={"pk": self.object.exam.pk})
 
 
-class ChoiceCreateView(CreateView):
+class QuestionReorderView(ReorderView):
+    model = Question
+    container_model = Exam
+    container_field = "exam_id"
+    container_kwarg = "exam_id"
+
+    def reordered(self, container, items):
+        Exam.bump_content_version(pk=container.pk)
+        # question titles in the search index carry the order
+        index_questions(Question.objects.filter(pk__in=[item.pk for item in items]))
+
+
+class ChoiceCreateView(StaffRequiredMixin, CreateView):
     model = AnswerChoice
     form_class = ChoiceForm
     template_name = "exams/choice_form.html"
@@ -136,7 +279,7 @@ class ChoiceCreateView(CreateView):
         return reverse_lazy("exams:exam_detail", kwargs={"pk": self.question.exam.pk})
 
 
-class ChoiceUpdateView(UpdateView):
+class ChoiceUpdateView(StaffRequiredMixin, UpdateView):
     model = AnswerChoice
     form_class = ChoiceForm
     template_name = "exams/choice_form.html"
@@ -152,7 +295,7 @@ class ChoiceUpdateView(UpdateView):
         return reverse_lazy("exams:exam_detail", kwargs={"pk": self.object.question.exam.pk})
 
 
-class ChoiceDeleteView(DeleteView):
+class ChoiceDeleteView(StaffRequiredMixin, DeleteView):
     model = AnswerChoice
     template_name = "exams/choice_confirm_delete.html"
 
@@ -160,159 +303,250 @@ class ChoiceDeleteView(DeleteView):
         return reverse_lazy("exams:exam_detail", kwargs={"pk": self.object.question.exam.pk})
 
 
-class StartExamAttemptView(LoginRequiredMixin, View):
+class StartExamAttemptView(EnrollmentRequiredMixin, View):
     def get(self, request, exam_id):
-        exam = get_object_or_404(Exam, pk=exam_id)
+        # one indexed lookup covers both cases: "SUBMITTED" sorts after
+        # "IN_PROGRESS", so a submitted attempt wins
+        attempt = (
+            ExamAttempt.objects
+            .filter(user=request.user, exam_id=exam_id)
+            .annotate(course_id=F("exam__course_id"))
+            .order_by("-status")
+            .only("id", "status")
+            .first()
+        )
+
+        if attempt is None:
+            # not pre-provisioned, create it now
+            exam = get_object_or_404(Exam, pk=exam_id)
+            self.check_enrollment(exam.course_id)
+            attempt, created = ExamAttempt.objects.get_or_create(
+                user=request.user,
+                exam=exam,
+                status=ExamAttempt.Status.IN_PROGRESS,
+                defaults={
+                    "full_mark": exam.question_marks_total,
+                    "user_mark": 0,
+                },
+            )
+        else:
+            self.check_enrollment(attempt.course_id)
 
         # BLOCK if already submitted
-        submitted = ExamAttempt.objects.filter(
-            user=request.user,
-            exam=exam,
-            status=ExamAttempt.Status.SUBMITTED
-        ).first()
+        if attempt.status == ExamAttempt.Status.SUBMITTED:
+            return redirect("exams:attempt_result", attempt_id=attempt.id)
 
-        if submitted:
-            return redirect("exams:attempt_result", attempt_id=submitted.id)
+        return redirect("exams:attempt_take", attempt_id=attempt.id)
 
-        # otherwise continue or resume
-        attempt, created = ExamAttempt.objects.get_or_create(
-            user=request.user,
-            exam=exam,
-            status=ExamAttempt.Status.IN_PROGRESS,
-            defaults={
-                "full_mark": exam.questions.aggregate(
-                    total=Sum("mark")
-                )["total"] or 0,
-                "user_mark": 0,
-            },
-        )
 
-        return redirect("exams:attempt_take", attempt_id=attempt.id)
+def page_number(value):
+    try:
+        return int(value or 1)
+    except (TypeError, ValueError):
+        return 1
+
 
+def take_url(attempt, page=None):
+    url = reverse("exams:attempt_take", args=[attempt.id])
+    return f"{url}?page={page}" if page else url
 
-class TakeExamView(LoginRequiredMixin, View):
+
+def page_is_stale(key, data):
+    """
+    True when a posted page was rendered from another content version: its
+    questions may have moved between pages since, and grading it against the
+    current layout would clear answers that moved onto it.
+    """
+    return data.get("version") != str(key.version)
+
+
+def take_context(attempt, key, answers_map, stale=False):
+    return {
+        "attempt": attempt,
+        "exam": attempt.exam,
+        "questions": key.questions,
+        "page": key if key.partial else None,
+        "answers_map": answers_map,
+        "seconds_left": seconds_left(attempt),
+        "stale": stale,
+    }
+
+
+class TakeExamView(EnrollmentRequiredMixin, View):
     template_name = "exams/attempt_take.html"
 
     def get(self, request, attempt_id):
         # fetches one ExamAttempt object belong the user
         attempt = get_object_or_404(
-            ExamAttempt,
+            ExamAttempt.objects.select_related("exam"),
             pk=attempt_id,
             user=request.user,
         )
 
+        self.check_enrollment(attempt.exam.course_id)
         if attempt.status == ExamAttempt.Status.SUBMITTED:
             return redirect("exams:attempt_result", attempt_id=attempt.id)
 
-        questions = attempt.exam.questions.prefetch_related("choices").all()
+        start_clock(attempt)
+        if time_is_up(attempt):
+            submit_attempt(attempt, get_compiled_exam(attempt.exam))
+            return redirect("exams:attempt_result", attempt_id=attempt.id)
 
-        answers_map = dict(
-            attempt.answers.values_list("question_id", "selected_choice_id")
-        )
+        if attempt.exam.questions_per_page:
+            key = get_compiled_page(attempt.exam, page_number(request.GET.get("page")))
+        else:
+            key = get_compiled_exam(attempt.exam)
+        return self.render_page(request, attempt, key)
 
-        return render(request, self.template_name, {
-            "attempt": attempt,
-            "exam": attempt.exam,
-            "questions": questions,
-            "answers_map": answers_map,
-        })
+    def render_page(self, request, attempt, key, stale=False):
+        answers = attempt.answers.all()
+        if key.partial:
+            answers = answers.filter(question_id__in=key.question_ids)
+        answers_map = dict(answers.values_list("question_id", "selected_choice_id"))
+        return render(request, self.template_name, take_context(attempt, key, answers_map, stale),
+                      status=409 if stale else 200)
 
     @transaction.atomic
     def post(self, request, attempt_id):
         attempt = get_object_or_404(
-            ExamAttempt,
+            ExamAttempt.objects.select_related("exam"),
             pk=attempt_id,
             user=request.user,
         )
 
+        self.check_enrollment(attempt.exam.course_id)
         if attempt.status == ExamAttempt.Status.SUBMITTED:
             return redirect("exams:attempt_result", attempt_id=attempt.id)
 
-        questions = attempt.exam.questions.prefetch_related("choices").all()
+        start_clock(attempt)
+        if time_is_up(attempt, grace=GRACE):
+            # too late to save anything, grade what was saved in time
+            submit_attempt(attempt, get_compiled_exam(attempt.exam))
+            return redirect("exams:attempt_result", attempt_id=attempt.id)
 
-        for q in questions:
-            key = f"q_{q.id}"
-            choice_id = request.POST.get(key)
+        # validate every choice in memory, then upsert all answers (of the page) at once
+        if attempt.exam.questions_per_page:
+            key = get_compiled_page(attempt.exam, page_number(request.POST.get("page")))
+            if page_is_stale(key, request.POST):
+                if time_is_up(attempt):
+                    submit_attempt(attempt, get_compiled_exam(attempt.exam))
+                    return redirect("exams:attempt_result", attempt_id=attempt.id)
+                return self.render_page(request, attempt, key, stale=True)
+            grade_answers(attempt, key, request.POST)
+            # the pager buttons save the page, then move to the page in "goto"
+            next_url = take_url(attempt, page_number(request.POST.get("goto") or key.number))
+        else:
+            grade_answers(attempt, get_compiled_exam(attempt.exam), request.POST)
+            next_url = take_url(attempt)
+
+        # the page's timer posts the form when it reaches zero
+        if time_is_up(attempt):
+            submit_attempt(attempt, get_compiled_exam(attempt.exam))
+            return redirect("exams:attempt_result", attempt_id=attempt.id)
 
-            if not choice_id:
-                AttemptAnswer.objects.update_or_create(
-                    attempt=attempt,
-                    question=q,
-                    defaults={
-                        "selected_choice": None,
-                        "is_correct": False,
-                        "earned_mark": 0,
-                    },
-                )
-                continue
+        return redirect(next_url)
 
-            choice = get_object_or_404(AnswerChoice, pk=choice_id, question=q)
 
-            is_correct = choice.is_correct
-            earned = q.mark if is_correct else 0
+class AutosaveAnswerView(EnrollmentRequiredMixin, View):
+    """Save one answer (question, choice) of an attempt; the mark stays hidden until submit."""
 
-            AttemptAnswer.objects.update_or_create(
-                attempt=attempt,
-                question=q,
-                defaults={
-                    "selected_choice": choice,
-                    "is_correct": is_correct,
-                    "earned_mark": earned,
-                },
-            )
+    @transaction.atomic
+    def post(self, request, attempt_id):
+        try:
+            question_id = int(request.POST.get("question"))
+        except (TypeError, ValueError):
+            return JsonResponse({"error": "Invalid question."}, status=400)
 
-        # update total ONCE
-        attempt.user_mark = attempt.answers.aggregate(total=Sum("earned_mark"))["total"] or 0
-        attempt.save(update_fields=["user_mark"])
+        attempt = get_object_or_404(
+            ExamAttempt.objects.select_related("exam"),
+            pk=attempt_id,
+            user=request.user,
+        )
 
-        return redirect("exams:attempt_take", attempt_id=attempt.id)
+        self.check_enrollment(attempt.exam.course_id)
+        if attempt.status == ExamAttempt.Status.SUBMITTED:
+            return JsonResponse({"error": "Attempt already submitted."}, status=409)
+        if time_is_up(attempt, grace=GRACE):
+            return JsonResponse({"error": "Time is up."}, status=409)
 
+        if attempt.exam.questions_per_page:
+            key = get_compiled_page(attempt.exam, page_number(request.POST.get("page")))
+        else:
+            key = get_compiled_exam(attempt.exam)
+        if question_id not in key.marks:
+            return JsonResponse({"error": "Invalid question."}, status=400)
 
-class SubmitAttemptView(LoginRequiredMixin, View):
+        choice_id = parse_choice(key, question_id, request.POST.get("choice"))
+        save_answer(attempt, key, question_id, choice_id)
+
+        # no mark in the reply: it would tell which choice is correct
+        return JsonResponse({"question": question_id, "choice": choice_id})
+
+
+class SubmitAttemptView(EnrollmentRequiredMixin, View):
     @transaction.atomic
     def post(self, request, attempt_id):
-        attempt = get_object_or_404(ExamAttempt, pk=attempt_id, user=request.user)
+        attempt = get_object_or_404(
+            ExamAttempt.objects.select_related("exam"),
+            pk=attempt_id,
+            user=request.user,
+        )
 
+        self.check_enrollment(attempt.exam.course_id)
         if attempt.status == ExamAttempt.Status.SUBMITTED:
             return redirect("exams:attempt_result", attempt_id=attempt.id)
 
-        total = attempt.answers.aggregate(total=Sum("earned_mark"))["total"] or 0
-
-        attempt.user_mark = total
-        attempt.status = ExamAttempt.Status.SUBMITTED
-        attempt.submitted_at = timezone.now()
-        attempt.save(update_fields=["user_mark", "status", "submitted_at"])
+        # past the deadline this grades only what was saved in time, since
+        # the take and autosave views refuse answers after it
+        submit_attempt(attempt, get_compiled_exam(attempt.exam))
 
         return redirect("exams:attempt_result", attempt_id=attempt.id)
 
 
+def result_etag(request, attempt, standing):
+    # a submitted attempt never changes, its standing does as others submit;
+    # the CSRF cookie is part of the tag because the page embeds a token (logout form)
+    csrf = request.COOKIES.get(settings.CSRF_COOKIE_NAME, "")
+    raw = f"{attempt.pk}:{attempt.submitted_at}:{standing.rank}:{standing.total}:{csrf}"
+    return quote_etag(hashlib.md5(raw.encode()).hexdigest())
+
+
+def result_response(request, template_name, attempt, standing, etag):
+    response = render(request, template_name, {
+        "attempt": attempt,
+        "exam": attempt.exam,
+        "questions": attempt.result["questions"],
+        "standing": standing,
+    })
+    response["ETag"] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
 class AttemptResultView(LoginRequiredMixin, View):
+    read_replica = True
     template_name = "exams/attempt_result.html"
 
     def get(self, request, attempt_id):
-        attempt = get_object_or_404(ExamAttempt, pk=attempt_id, user=request.user)
+        attempt = get_object_or_404(
+            ExamAttempt.objects.select_related("exam"),
+            pk=attempt_id,
+            user=request.user,
+        )
 
         if attempt.status != ExamAttempt.Status.SUBMITTED:
             return redirect("exams:attempt_take", attempt_id=attempt.id)
 
-        questions = attempt.exam.questions.prefetch_related("choices").all()
+        standing = ranking.standing(attempt.exam_id, attempt.user_mark)
+        etag = result_etag(request, attempt, standing)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            not_modified["ETag"] = etag
+            return not_modified
+
+        if attempt.result is None:
+            # submitted by the expiry sweep, or before snapshots existed
+            store_result(attempt, get_compiled_exam(attempt.exam))
+
+        return result_response(request, self.template_name, attempt, standing, etag)
 
-        answers = (
-            AttemptAnswer.objects
-            .filter(attempt=attempt)
-            .select_related("question", "selected_choice")
-        )
-        answers_map = {a.question_id: a for a in answers}
-
-        correct_map = {
-            q.id: next((c for c in q.choices.all() if c.is_correct), None)
-            for q in questions
-        }
-
-        return render(request, self.template_name, {
-            "attempt": attempt,
-            "exam": attempt.exam,
-            "questions": questions,
-            "answers_map": answers_map,
-            "correct_map": correct_map,
-        })
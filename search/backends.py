@@ -0,0 +1,149 @@
+"""
+Storage for the search index: an FTS5 virtual table on SQLite and a table
+with a generated tsvector column and a GIN index on PostgreSQL. Both expose
+the same small API (upsert / delete / clear / search) over rows of
+
+    (kind, object_id, parent_id, title, body)
+
+Snippets come back with the matched terms wrapped in MARK_START/MARK_END so
+the caller can HTML-escape the text before turning them into <mark> tags.
+"""
+import re
+
+from django.db import connection
+
+TABLE = "search_document"
+MARK_START = "\x02"
+MARK_END = "\x03"
+SNIPPET_WORDS = 16
+
+TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def scope_sql(scope):
+    """
+    SQL condition limiting hits to ``scope``, a {kind: parent ids} dict (kinds
+    left out are excluded), or None when ``scope`` allows nothing at all.
+    """
+    clauses, params = [], []
+    for kind, parent_ids in scope.items():
+        if parent_ids:
+            placeholders = ", ".join(["%s"] * len(parent_ids))
+            clauses.append(f"(kind = %s AND parent_id IN ({placeholders}))")
+            params += [kind, *parent_ids]
+    if not clauses:
+        return None
+    return " AND (" + " OR ".join(clauses) + ")", params
+
+
+class SQLiteBackend:
+    create_sql = [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+        "kind UNINDEXED, object_id UNINDEXED, parent_id UNINDEXED, title, body, "
+        "tokenize = 'unicode61 remove_diacritics 2')",
+    ]
+    drop_sql = [f"DROP TABLE IF EXISTS {TABLE}"]
+
+    def upsert(self, cursor, rows):
+        self.delete(cursor, [(kind, object_id) for kind, object_id, *_ in rows])
+        cursor.executemany(
+            f"INSERT INTO {TABLE} (kind, object_id, parent_id, title, body) VALUES (%s, %s, %s, %s, %s)",
+            rows,
+        )
+
+    def delete(self, cursor, keys):
+        cursor.executemany(f"DELETE FROM {TABLE} WHERE kind = %s AND object_id = %s", keys)
+
+    def clear(self, cursor):
+        cursor.execute(f"DELETE FROM {TABLE}")
+
+    def match(self, query):
+        # every term must match, each as a prefix; quoting neutralises FTS syntax
+        terms = TERM_RE.findall(query)
+        return " ".join(f'"{term}"*' for term in terms)
+
+    def search(self, cursor, query, limit, scope=None):
+        match = self.match(query)
+        if not match:
+            return []
+        where, params = "", []
+        if scope is not None:
+            if (restriction := scope_sql(scope)) is None:
+                return []
+            where, params = restriction
+        cursor.execute(
+            f"SELECT kind, object_id, parent_id, title, "
+            f"snippet({TABLE}, 4, %s, %s, '…', {SNIPPET_WORDS}), "
+            f"bm25({TABLE}, 0, 0, 0, 10.0, 1.0) AS rank "
+            f"FROM {TABLE} WHERE {TABLE} MATCH %s{where} ORDER BY rank LIMIT %s",
+            [MARK_START, MARK_END, match, *params, limit],
+        )
+        return cursor.fetchall()
+
+
+class PostgresBackend:
+    create_sql = [
+        f"CREATE TABLE IF NOT EXISTS {TABLE} ("
+        "kind varchar(20) NOT NULL, object_id bigint NOT NULL, parent_id bigint, "
+        "title text NOT NULL, body text NOT NULL, "
+        "document tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('simple', title), 'A') || setweight(to_tsvector('simple', body), 'B')"
+        ") STORED, PRIMARY KEY (kind, object_id))",
+        f"CREATE INDEX IF NOT EXISTS {TABLE}_document ON {TABLE} USING gin (document)",
+    ]
+    drop_sql = [f"DROP TABLE IF EXISTS {TABLE}"]
+
+    def upsert(self, cursor, rows):
+        cursor.executemany(
+            f"INSERT INTO {TABLE} (kind, object_id, parent_id, title, body) VALUES (%s, %s, %s, %s, %s) "
+            "ON CONFLICT (kind, object_id) DO UPDATE SET "
+            "parent_id = EXCLUDED.parent_id, title = EXCLUDED.title, body = EXCLUDED.body",
+            rows,
+        )
+
+    def delete(self, cursor, keys):
+        cursor.executemany(f"DELETE FROM {TABLE} WHERE kind = %s AND object_id = %s", keys)
+
+    def clear(self, cursor):
+        cursor.execute(f"TRUNCATE {TABLE}")
+
+    def match(self, query):
+        terms = TERM_RE.findall(query)
+        return " & ".join(f"{term}:*" for term in terms)
+
+    def search(self, cursor, query, limit, scope=None):
+        match = self.match(query)
+        if not match:
+            return []
+        where, params = "", []
+        if scope is not None:
+            if (restriction := scope_sql(scope)) is None:
+                return []
+            where, params = restriction
+        cursor.execute(
+            f"SELECT kind, object_id, parent_id, title, "
+            f"ts_headline('simple', body, q, %s), ts_rank(document, q) AS rank "
+            f"FROM {TABLE}, to_tsquery('simple', %s) q WHERE document @@ q{where} "
+            f"ORDER BY rank DESC LIMIT %s",
+            [
+                f"StartSel={MARK_START}, StopSel={MARK_END}, MaxWords={SNIPPET_WORDS}, MinWords=5",
+                match,
+                *params,
+                limit,
+            ],
+        )
+        return cursor.fetchall()
+
+
+BACKENDS = {
+    "sqlite": SQLiteBackend,
+    "postgresql": PostgresBackend,
+}
+
+
+def get_backend(conn=None):
+    vendor = (conn or connection).vendor
+    try:
+        return BACKENDS[vendor]()
+    except KeyError:
+        raise NotImplementedError(f"Full-text search is not available on {vendor}.")
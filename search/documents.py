@@ -0,0 +1,121 @@
+"""
+What goes into the search index, and the entry points used by the signal
+receivers, the rebuild command and the search view.
+"""
+from django.db import connection, transaction
+from django.urls import reverse
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from courses.models import Lesson, Unit, html_to_text
+from exams.models import Question
+
+from .backends import MARK_END, MARK_START, get_backend
+
+LESSON = "lesson"
+QUESTION = "question"
+BATCH_SIZE = 500
+
+
+def lesson_row(lesson_id, unit_id, title, content):
+    return (LESSON, lesson_id, unit_id, title, html_to_text(content))
+
+
+def question_row(question_id, exam_id, exam_title, order, text):
+    return (QUESTION, question_id, exam_id, f"{exam_title} — Q{order}", html_to_text(text))
+
+
+def lesson_rows(queryset, chunk_size=BATCH_SIZE):
+    values = queryset.values_list("id", "unit_id", "title", "content")
+    return (lesson_row(*row) for row in values.iterator(chunk_size=chunk_size))
+
+
+def question_rows(queryset, chunk_size=BATCH_SIZE):
+    values = queryset.values_list("id", "exam_id", "exam__title", "order", "text")
+    return (question_row(*row) for row in values.iterator(chunk_size=chunk_size))
+
+
+def index_rows(rows):
+    rows = list(rows)
+    if rows:
+        with connection.cursor() as cursor:
+            get_backend().upsert(cursor, rows)
+
+
+def remove(kind, object_ids):
+    with connection.cursor() as cursor:
+        get_backend().delete(cursor, [(kind, object_id) for object_id in object_ids])
+
+
+def index_lessons(queryset):
+    index_rows(lesson_rows(queryset))
+
+
+def index_questions(queryset):
+    index_rows(question_rows(queryset))
+
+
+def _batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def rebuild(batch_size=BATCH_SIZE):
+    """Re-index every lesson and question, streaming them in batches. Returns counts per kind."""
+    backend = get_backend()
+    sources = {
+        LESSON: lesson_rows(Lesson.objects.order_by("id"), batch_size),
+        QUESTION: question_rows(Question.objects.order_by("id"), batch_size),
+    }
+    counts = dict.fromkeys(sources, 0)
+
+    # searches keep seeing the old index until the new one is complete
+    with transaction.atomic(), connection.cursor() as cursor:
+        backend.clear(cursor)
+        for kind, rows in sources.items():
+            for batch in _batched(rows, batch_size):
+                backend.upsert(cursor, batch)
+                counts[kind] += len(batch)
+    return counts
+
+
+def highlight(snippet):
+    return mark_safe(escape(snippet).replace(MARK_START, "<mark>").replace(MARK_END, "</mark>"))
+
+
+def result_url(kind, parent_id):
+    if kind == LESSON:
+        return reverse("courses:lesson-list", args=[parent_id])
+    return reverse("exams:exam_detail", args=[parent_id])
+
+
+def search(query, limit=50, course_ids=None):
+    """
+    Ranked hits as dicts with kind, title, url and an HTML-safe snippet.
+
+    With ``course_ids`` (a student's enrolled courses, see
+    enrollments.access) only lessons of those courses are returned; exam
+    questions would give the answers away, so they are left out entirely.
+    """
+    scope = None
+    if course_ids is not None:
+        scope = {LESSON: list(Unit.objects.filter(course_id__in=course_ids).values_list("id", flat=True))}
+
+    with connection.cursor() as cursor:
+        rows = get_backend().search(cursor, query, limit, scope)
+    return [
+        {
+            "kind": kind,
+            "object_id": object_id,
+            "title": title,
+            "url": result_url(kind, parent_id),
+            "snippet": highlight(snippet),
+        }
+        for kind, object_id, parent_id, title, snippet, _ in rows
+    ]
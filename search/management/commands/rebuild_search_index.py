@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from search.documents import BATCH_SIZE, rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index over lessons and exam questions."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, batch_size, **options):
+        counts = rebuild(batch_size=batch_size)
+        summary = ", ".join(f"{count} {kind}(s)" for kind, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Indexed {summary}."))
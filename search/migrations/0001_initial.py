@@ -0,0 +1,24 @@
+from django.db import migrations
+
+from search.backends import get_backend
+
+
+def create_index(apps, schema_editor):
+    for sql in get_backend(schema_editor.connection).create_sql:
+        schema_editor.execute(sql)
+
+
+def drop_index(apps, schema_editor):
+    for sql in get_backend(schema_editor.connection).drop_sql:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,34 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from courses.models import Lesson
+from exams.models import Exam, Question
+
+from . import documents
+
+
+@receiver(post_save, sender=Lesson)
+def lesson_saved(sender, instance, **kwargs):
+    documents.index_lessons(Lesson.objects.filter(pk=instance.pk))
+
+
+@receiver(post_delete, sender=Lesson)
+def lesson_deleted(sender, instance, **kwargs):
+    documents.remove(documents.LESSON, [instance.pk])
+
+
+@receiver(post_save, sender=Question)
+def question_saved(sender, instance, **kwargs):
+    documents.index_questions(Question.objects.filter(pk=instance.pk))
+
+
+@receiver(post_delete, sender=Question)
+def question_deleted(sender, instance, **kwargs):
+    documents.remove(documents.QUESTION, [instance.pk])
+
+
+@receiver(post_save, sender=Exam)
+def exam_saved(sender, instance, created, **kwargs):
+    # question titles carry the exam title
+    if not created:
+        documents.index_questions(instance.questions.all())
@@ -0,0 +1,93 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from courses.models import Course, Unit, Lesson
+from enrollments.models import Enrollment
+from exams.models import Exam, Question
+
+from . import documents
+
+
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        course = Course.objects.create(name="Biology", grade=1)
+        unit = Unit.objects.create(course=course, title="Cells", order=1)
+        self.lesson = Lesson.objects.create(
+            unit=unit, title="Mitochondria", order=1, content="<p>The powerhouse of the <b>cell</b>.</p>",
+        )
+        self.exam = Exam.objects.create(course=course, title="Cells quiz")
+        self.question = Question.objects.create(exam=self.exam, text="Which organelle makes ATP?", mark=1, order=1)
+
+    def hits(self, query, **kwargs):
+        return [(hit["kind"], hit["object_id"]) for hit in documents.search(query, **kwargs)]
+
+    def test_lessons_and_questions_are_indexed_on_save(self):
+        self.assertEqual(self.hits("powerhouse"), [(documents.LESSON, self.lesson.pk)])
+        self.assertEqual(self.hits("organel"), [(documents.QUESTION, self.question.pk)])
+
+        hit = documents.search("powerhouse")[0]
+        self.assertIn("<mark>powerhouse</mark>", hit["snippet"])
+        self.assertEqual(hit["url"], reverse("courses:lesson-list", args=[self.lesson.unit_id]))
+
+    def test_title_matches_rank_first(self):
+        other = Lesson.objects.create(
+            unit=self.lesson.unit, title="Energy", order=2, content="<p>Mitochondria, mitochondria.</p>",
+        )
+        self.assertEqual(self.hits("mitochondria"), [(documents.LESSON, self.lesson.pk), (documents.LESSON, other.pk)])
+
+    def test_edits_and_deletes_update_the_index(self):
+        self.lesson.content = "<p>Where respiration happens.</p>"
+        self.lesson.save()
+        self.assertEqual(self.hits("powerhouse"), [])
+        self.assertEqual(self.hits("respiration"), [(documents.LESSON, self.lesson.pk)])
+
+        self.exam.title = "Organelles test"
+        self.exam.save()
+        self.assertEqual(documents.search("ATP")[0]["title"], "Organelles test — Q1")
+
+        self.lesson.delete()
+        self.question.delete()
+        self.assertEqual(self.hits("respiration"), [])
+        self.assertEqual(self.hits("ATP"), [])
+
+    def test_rebuild_restores_the_index(self):
+        documents.remove(documents.LESSON, [self.lesson.pk])
+        self.assertEqual(documents.rebuild(), {documents.LESSON: 1, documents.QUESTION: 1})
+        self.assertEqual(self.hits("powerhouse"), [(documents.LESSON, self.lesson.pk)])
+
+
+class SearchAccessTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        course = Course.objects.create(name="Enrolled", grade=1)
+        other_course = Course.objects.create(name="Other", grade=1)
+        Lesson.objects.create(
+            unit=Unit.objects.create(course=course, title="U", order=1), title="Photosynthesis", order=1, content="x",
+        )
+        Lesson.objects.create(
+            unit=Unit.objects.create(course=other_course, title="U", order=1), title="Photons", order=1, content="x",
+        )
+        exam = Exam.objects.create(course=course, title="Quiz")
+        Question.objects.create(exam=exam, text="Photosynthesis needs?", mark=1, order=1)
+
+        self.user = User.objects.create_user("student", password="pw")
+        Enrollment.objects.create(user=self.user, course=course)
+
+    def titles(self, response):
+        return [hit["title"] for hit in response.context["results"]]
+
+    def test_anonymous_users_are_redirected(self):
+        response = self.client.get(reverse("search:results"), {"q": "photo"})
+        self.assertEqual(response.status_code, 302)
+
+    def test_students_only_find_lessons_of_their_courses(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("search:results"), {"q": "photo"})
+        self.assertEqual(self.titles(response), ["Photosynthesis"])
+
+    def test_staff_find_everything(self):
+        self.client.force_login(User.objects.create_user("staff", is_staff=True))
+        response = self.client.get(reverse("search:results"), {"q": "photo"})
+        self.assertCountEqual(self.titles(response), ["Photosynthesis", "Photons", "Quiz — Q1"])
@@ -0,0 +1,16 @@
+from django.views.generic import TemplateView
+
+from enrollments.access import EnrollmentRequiredMixin
+
+from .documents import search
+
+
+class SearchView(EnrollmentRequiredMixin, TemplateView):
+    template_name = "search/results.html"
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        query = self.request.GET.get("q", "").strip()
+        ctx["query"] = query
+        ctx["results"] = search(query, course_ids=self.enrolled_course_ids()) if query else []
+        return ctx